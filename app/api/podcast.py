@@ -1,22 +1,77 @@
 import asyncio
+import json
 import logging
 import os
+import re
+import shutil
 import sys
 import tempfile
+import time
 import traceback
-from typing import Optional
+import weakref
+from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, Form, HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
-from app.utils.markdown_processor import split_markdown_advanced
+from app.utils.estimator import StageEstimator
+from app.utils.fingerprint import FingerprintIndex
+from app.utils.hedging import CancelSignal, HedgeBudget, HedgePolicy
+from app.utils.incremental import manifest_entry, plan_reuse
+from app.utils.job_registry import JobCancelled, JobRegistry, content_hash, join_key
+from app.utils.http_range import ranged_blob_response
+from app.utils.markdown_processor import chunk_title, split_markdown_advanced
+from app.utils.mp3 import encode_mp3_segment, encode_pool
 from app.utils.podcast_generator import PodcastGenerator
+from app.utils.records import Chunk, Segment
+from app.utils.scheduler import ChunkScheduler
+from app.utils.script_validator import InvalidScript, ValidationStats, generate_valid_script
+from app.utils.storage import storage_from_env
+from app.utils.tracing import JobTrace, trace_span
+from app.utils.upload import UnsupportedEncoding, UploadTooLarge, ingest_upload
 
 logger = logging.getLogger("app.api.podcast")
 
 router = APIRouter()
 
+# ステータス・最終音声・プレビューの保存先（STORAGE_BACKEND=s3 で複数ノードから読める。ジョブの実行状態はノードごと）
+storage = storage_from_env(os.path.join(os.path.dirname(__file__), "../../tmp"))
+
+job_registry = JobRegistry(recent_ttl=float(os.environ.get("DEDUP_WINDOW_SECONDS", "3600")))
+scheduler = ChunkScheduler(max_concurrency=int(os.environ.get("GEMINI_MAX_CONCURRENCY", "4")))
+# TTS_HEDGE_PERCENTILE を設定したときだけ遅いTTS呼び出しをヘッジする
+hedge_policy = (
+    HedgePolicy(
+        percentile=float(os.environ["TTS_HEDGE_PERCENTILE"]),
+        min_samples=int(os.environ.get("TTS_HEDGE_MIN_SAMPLES", "10")),
+    )
+    if os.environ.get("TTS_HEDGE_PERCENTILE")
+    else None
+)
+# 台本の検証: 修復できない台本はTTSに送らずに再生成する
+SCRIPT_MAX_ATTEMPTS = int(os.environ.get("SCRIPT_MAX_ATTEMPTS", "3"))
+SCRIPT_MAX_CHARS = int(os.environ.get("SCRIPT_MAX_CHARS", "8000"))
+# 完了したジョブのステージ所要時間から学習した処理速度（ETA・コスト見積もり用）
+estimator = StageEstimator(os.path.join(os.path.dirname(__file__), "../../tmp", "stage_estimates.json"))
+# 過去の号と似ているチャンク（冒頭の紹介文やフッターなど）の音声を再利用する。0で無効
+BOILERPLATE_SIMILARITY = float(os.environ.get("BOILERPLATE_SIMILARITY", "0.9"))
+# 最終音声の形式。mp3ではTTSが終わったセグメントからプロセスプールでエンコードし、フレーム単位で連結する
+OUTPUT_FORMAT = os.environ.get("OUTPUT_FORMAT", "wav").lower()
+if OUTPUT_FORMAT not in ("wav", "mp3"):
+    raise ValueError(f"Unsupported OUTPUT_FORMAT: {OUTPUT_FORMAT}")
+MP3_BITRATE = os.environ.get("MP3_BITRATE", "64k")
+# アップロードの上限サイズと同時に取り込むアップロード数（メモリ使用量を抑える）
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(5 * 1024 * 1024)))
+upload_semaphore = asyncio.Semaphore(int(os.environ.get("UPLOAD_MAX_CONCURRENCY", "4")))
+fingerprint_index = FingerprintIndex(os.path.join(os.path.dirname(__file__), "../../tmp", "fingerprint_index.json"))
+# ジョブごとのステータス書き込みの順序を保つロック（使われていないロックは自動的に消える）
+_status_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+# 実行中のジョブのトレース（終了するまではストレージに保存されないので、ここから返す）
+live_traces: Dict[str, JobTrace] = {}
+# generate_podcast が発行するジョブIDの形式（previous_job_id の検証用）
+JOB_ID_PATTERN = re.compile(r"job_[0-9a-f]{16}")
+
 
 class ProcessingStatus(BaseModel):
     """Model for podcast processing status."""
@@ -24,11 +79,21 @@ class ProcessingStatus(BaseModel):
     job_id: str
     status: str
     progress: float = 0.0
-    result_file: Optional[str] = None
+    result_file: Optional[str] = None  # 最終音声のストレージキー
     error: Optional[str] = None
     chunk_count: Optional[int] = None  # チャンク数
     script_done: Optional[int] = None  # スクリプト生成済み数
     tts_done: Optional[int] = None  # TTS生成済み数
+    content_hash: Optional[str] = None  # アップロード内容のハッシュ（重複検出用）
+    preview_file: Optional[str] = None  # プレビュー（STARTチャンク）の音声のストレージキー
+    previous_job_id: Optional[str] = None  # 差分再生成の元ジョブ
+    reused_chunks: Optional[int] = None  # 元ジョブから再利用したチャンク数
+    hedges_issued: Optional[int] = None  # 発行したTTSヘッジリクエスト数
+    hedge_wins: Optional[int] = None  # ヘッジ側が先に完了した数
+    estimate: Optional[Dict[str, Any]] = None  # アップロード時の見積もり（所要時間・API呼び出し数・トークン数・音声長）
+    eta_seconds: Optional[float] = None  # 完了までの推定残り時間（秒）
+    script_validation: Optional[Dict[str, int]] = None  # 台本検証の結果（valid/repaired/rejected/failed の件数）
+    boilerplate_reuse: Optional[List[Dict[str, Any]]] = None  # 過去の号から再利用したチャンクと類似度
 
 
 def get_gemini_api_key():
@@ -41,23 +106,72 @@ def get_gemini_api_key():
     return api_key
 
 
-def save_status_to_file(job_id: str, status: ProcessingStatus):
-    status_file = os.path.join(os.path.dirname(__file__), "../../tmp", f"{job_id}_status.json")
-    os.makedirs(os.path.dirname(status_file), exist_ok=True)
-    with open(status_file, "w", encoding="utf-8") as f:
-        f.write(status.json())
+def _status_lock(job_id: str) -> asyncio.Lock:
+    lock = _status_locks.get(job_id)
+    if lock is None:
+        lock = _status_locks[job_id] = asyncio.Lock()
+    return lock
+
+
+async def save_status_to_file(job_id: str, status: ProcessingStatus):
+    # チャンクごとの保存が並行するので、書き込みの順番が入れ替わらないようにジョブごとに直列化する
+    data = status.json().encode("utf-8")
+    async with _status_lock(job_id):
+        await asyncio.to_thread(storage.write_bytes, f"{job_id}_status.json", data)
+
+
+async def load_status_from_file(job_id: str) -> Optional[ProcessingStatus]:
+    data = await asyncio.to_thread(storage.read_bytes, f"{job_id}_status.json")
+    if data is None:
+        return None
+    return ProcessingStatus.parse_raw(data)
+
+
+async def save_trace_to_file(job_id: str, trace: JobTrace):
+    data = json.dumps(trace.to_chrome_trace(), ensure_ascii=False).encode("utf-8")
+    await asyncio.to_thread(storage.write_bytes, f"{job_id}_trace.json", data)
+
+
+async def load_trace_from_file(job_id: str) -> Optional[dict]:
+    data = await asyncio.to_thread(storage.read_bytes, f"{job_id}_trace.json")
+    if data is None:
+        return None
+    return json.loads(data)
+
+
+async def save_manifest_to_file(job_id: str, manifest: List[dict]):
+    data = json.dumps(manifest, ensure_ascii=False).encode("utf-8")
+    await asyncio.to_thread(storage.write_bytes, f"{job_id}_manifest.json", data)
 
 
-def load_status_from_file(job_id: str) -> Optional[ProcessingStatus]:
-    status_file = os.path.join(os.path.dirname(__file__), "../../tmp", f"{job_id}_status.json")
-    if not os.path.exists(status_file):
+async def load_manifest_from_file(job_id: str) -> Optional[List[dict]]:
+    data = await asyncio.to_thread(storage.read_bytes, f"{job_id}_manifest.json")
+    if data is None:
         return None
-    with open(status_file, "r", encoding="utf-8") as f:
-        data = f.read()
-        return ProcessingStatus.parse_raw(data)
+    return json.loads(data)
 
 
-async def process_podcast_background(job_id: str, markdown_content: str, output_dir: str, api_key: str):
+async def save_chapters_to_file(job_id: str, chapters: List[dict]):
+    data = json.dumps(chapters, ensure_ascii=False).encode("utf-8")
+    await asyncio.to_thread(storage.write_bytes, f"{job_id}_chapters.json", data)
+
+
+async def load_chapters_from_file(job_id: str) -> Optional[List[dict]]:
+    data = await asyncio.to_thread(storage.read_bytes, f"{job_id}_chapters.json")
+    if data is None:
+        return None
+    return json.loads(data)
+
+
+async def process_podcast_background(
+    job_id: str,
+    markdown_content: str,
+    output_dir: str,
+    api_key: str,
+    priority: int = 1,
+    preview: bool = False,
+    previous_job_id: Optional[str] = None,
+):
     """
     Process podcast generation in the background.
 
@@ -66,70 +180,378 @@ async def process_podcast_background(job_id: str, markdown_content: str, output_
         markdown_content: Markdown content to process
         output_dir: Directory to save output files
         api_key: Gemini API key
+        priority: Share of the Gemini concurrency slots relative to other jobs
+        preview: Generate the START chunk's script and audio ahead of all other work
+        previous_job_id: Job whose unchanged chunks are reused instead of regenerated
     """
+    trace = JobTrace(job_id)
+    live_traces[job_id] = trace
+    digest = content_hash(markdown_content)
+    succeeded = False
+    scheduler.set_priority(job_id, priority)
+    try:
+        with trace.span("job", "job", markdown_bytes=len(markdown_content.encode("utf-8")), priority=priority):
+            succeeded = await _run_podcast_job(job_id, markdown_content, output_dir, api_key, trace, preview, previous_job_id)
+    except JobCancelled:
+        status = await load_status_from_file(job_id) or ProcessingStatus(job_id=job_id, status="cancelled")
+        status.status = "cancelled"
+        await save_status_to_file(job_id, status)
+        logger.info(f"[Job {job_id}] Podcast generation cancelled")
+    except Exception as e:
+        tb = traceback.format_exc()
+        status = ProcessingStatus(job_id=job_id, status="failed", error=f"{e}\n{tb}", content_hash=digest)
+        await save_status_to_file(job_id, status)
+        logger.error(f"[Job {job_id}] Podcast生成失敗: {e}\n{tb}")
+    finally:
+        scheduler.remove_job(job_id)
+        job_registry.finish(job_id, succeeded)
+        await save_trace_to_file(job_id, trace)
+        live_traces.pop(job_id, None)
+
+
+async def _gather_or_cancel(coros) -> list:
+    """Run coroutines concurrently; on the first failure cancel the rest and re-raise it."""
+    tasks = [asyncio.ensure_future(c) for c in coros]
     try:
-        logger.info(f"[Job {job_id}] Podcast generation started")
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def _run_podcast_job(
+    job_id: str,
+    markdown_content: str,
+    output_dir: str,
+    api_key: str,
+    trace: JobTrace,
+    preview: bool = False,
+    previous_job_id: Optional[str] = None,
+) -> bool:
+    """
+    Run the split → script → TTS → concatenate stages of a job, recording a span per stage and chunk.
+
+    Every chunk goes through script generation and TTS on its own, with the
+    Gemini calls queued on the shared scheduler so that concurrent jobs are
+    interleaved fairly. The cancel flag is checked before every Gemini call.
+    When previous_job_id is given, chunks that are unchanged since that job
+    reuse its script and audio.
+
+    Returns:
+        True if the podcast was generated
+    """
+    logger.info(f"[Job {job_id}] Podcast generation started")
+    job_registry.raise_if_cancelled(job_id)
+    cancel_event = job_registry.cancel_event(job_id)
+    with trace.span("split_markdown", "stage"):
         chunk_dir = os.path.join("tmp", "chunks")
         chunks = split_markdown_advanced(markdown_content, save_dir=chunk_dir)
-        chunk_count = len(chunks)
-        status = ProcessingStatus(
-            job_id=job_id, status="processing", progress=0.0, chunk_count=chunk_count, script_done=0, tts_done=0
-        )
-        save_status_to_file(job_id, status)
-
-        generator = PodcastGenerator(api_key=api_key)
-        logger.info(f"[Job {job_id}] PodcastGenerator initialized")
-
-        # スクリプト生成
-        scripts = []
-        for i, chunk in enumerate(chunks):
-            script = await asyncio.to_thread(generator.generate_script, chunk)
-            scripts.append(script)
-            status.script_done = i + 1
-            status.progress = 0.1 + 0.3 * (i + 1) / chunk_count
-            save_status_to_file(job_id, status)
-
-        # TTS生成
-        audio_files = []
-        for i, script in enumerate(scripts):
-            temp_file = os.path.join("tmp/audio_chunks", f"chunk_{i}")
-            audio_file = await asyncio.to_thread(generator.generate_audio, script, temp_file)
+    chunk_count = len(chunks)
+    reuse_plan = [None] * chunk_count
+    if previous_job_id:
+        reuse_plan = plan_reuse(await load_manifest_from_file(previous_job_id) or [], chunks)
+    boilerplate_reuse = None
+    if BOILERPLATE_SIMILARITY > 0:
+        with trace.span("boilerplate_lookup", "stage", index_size=len(fingerprint_index)):
+            boilerplate_reuse = await asyncio.to_thread(_plan_boilerplate_reuse, chunks, reuse_plan, previous_job_id)
+    manifest: List[Optional[dict]] = [None] * chunk_count
+    content_chars = [len(chunk.content) for chunk in chunks]
+    script_chars: List[Optional[int]] = [None] * chunk_count
+    chunk_done = [False] * chunk_count
+    concurrency = scheduler.max_concurrency
+    previous_status = await load_status_from_file(job_id)
+    status = ProcessingStatus(
+        job_id=job_id,
+        status="processing",
+        progress=0.0,
+        chunk_count=chunk_count,
+        script_done=0,
+        tts_done=0,
+        content_hash=content_hash(markdown_content),
+        previous_job_id=previous_job_id,
+        reused_chunks=sum(1 for entry in reuse_plan if entry) if previous_job_id or boilerplate_reuse else None,
+        boilerplate_reuse=boilerplate_reuse,
+        estimate=previous_status.estimate if previous_status else None,
+        eta_seconds=round(estimator.remaining_seconds(content_chars, script_chars, concurrency), 1),
+    )
+    await save_status_to_file(job_id, status)
+
+    def update_progress() -> None:
+        # チャンクは並行して台本とTTSが進むので、両方の完了数から単調に増える値を出す
+        status.progress = 0.1 + 0.3 * status.script_done / chunk_count + 0.5 * status.tts_done / chunk_count
+        status.eta_seconds = round(estimator.remaining_seconds(content_chars, script_chars, concurrency, chunk_done), 1)
+
+    generator = PodcastGenerator(api_key=api_key)
+    logger.info(f"[Job {job_id}] PodcastGenerator initialized")
+    audio_chunks_dir = os.path.join(output_dir, "audio_chunks")
+    os.makedirs(audio_chunks_dir, exist_ok=True)
+    hedge_budget = HedgeBudget(int(os.environ.get("TTS_HEDGE_MAX_PER_JOB", "3")))
+    validation_stats = ValidationStats()
+
+    # Gemini呼び出しの実行時間を計測して見積もりの処理速度を更新する（待ち時間は含めない）
+    def request_script(chunk: Chunk) -> Optional[str]:
+        job_registry.raise_if_cancelled(job_id)
+        start = time.perf_counter()
+        script = generator.generate_script(chunk)
+        if script:
+            estimator.observe_script(len(chunk.content), len(script), time.perf_counter() - start)
+        return script
+
+    def generate_script(chunk: Chunk) -> str:
+        return generate_valid_script(lambda: request_script(chunk), validation_stats, SCRIPT_MAX_ATTEMPTS, SCRIPT_MAX_CHARS)
+
+    def call_tts(script: str, temp_file: str) -> Optional[str]:
+        if hedge_policy is None:
+            return generator.generate_audio(script, temp_file, cancel_event)
+
+        def attempt(signal: CancelSignal, name: str) -> Optional[str]:
+            # ヘッジ側は別ファイルに書き出し、負けた方のファイルは後で削除される
+            output_file = temp_file if name == "primary" else f"{temp_file}_hedge"
+            with trace_span("tts_attempt", "api", attempt=name):
+                return generator.generate_audio(script, output_file, signal)
+
+        return hedge_policy.call(attempt, len(script), hedge_budget, cancel_event, slots=scheduler)
+
+    def generate_audio(script: str, temp_file: str) -> Optional[str]:
+        start = time.perf_counter()
+        audio_file = call_tts(script, temp_file)
+        if audio_file and os.path.exists(audio_file):
+            estimator.observe_tts(len(script), time.perf_counter() - start, os.path.getsize(audio_file))
+        return audio_file
+
+    async def publish_preview(audio_file: str) -> None:
+        preview_key = f"{job_id}/preview{os.path.splitext(audio_file)[1]}"
+        await asyncio.to_thread(storage.put_file, preview_key, audio_file)
+        status.preview_file = preview_key
+        logger.info(f"[Job {job_id}] Preview ready: {preview_key}")
+
+    async def process_chunk(chunk: Chunk) -> Segment:
+        i = chunk.ordinal
+        # プレビューモードではSTARTチャンクを最優先で処理する
+        is_preview = preview and i == 0
+        content_bytes = len(chunk.content.encode("utf-8"))
+        with trace.span("chunk", "chunk", lane=i + 1, index=chunk.index, content_bytes=content_bytes):
+            temp_file = os.path.join(audio_chunks_dir, f"chunk_{i}")
+            reused = reuse_plan[i]
+            if reused:
+                # 変更のないチャンクは元ジョブの台本と音声をそのまま使う
+                audio_file = temp_file + os.path.splitext(reused["audio_file"])[1]
+                try:
+                    with trace.span("reuse", "stage", previous_index=reused["index"]):
+                        await asyncio.to_thread(shutil.copyfile, reused["audio_file"], audio_file)
+                except OSError as e:
+                    # 計画した後で元の音声が消えていたら、このチャンクは生成し直す
+                    logger.warning(f"[Job {job_id}] Cannot reuse audio for chunk {chunk.index}, regenerating: {e}")
+                    reuse_plan[i] = reused = None
+                    status.reused_chunks -= 1
+                    if status.boilerplate_reuse:
+                        status.boilerplate_reuse = [r for r in status.boilerplate_reuse if r["index"] != chunk.index]
+            if reused:
+                manifest[i] = manifest_entry(chunk, reused["script"], audio_file)
+                script_chars[i] = len(reused["script"])
+                chunk_done[i] = True
+                status.script_done += 1
+                status.tts_done += 1
+                update_progress()
+                if is_preview:
+                    await publish_preview(audio_file)
+                await save_status_to_file(job_id, status)
+                return Segment(i, 0, audio_file)
+
+            job_registry.raise_if_cancelled(job_id)
+            with trace.span("script", "stage") as span:
+                try:
+                    script = await scheduler.run(job_id, generate_script, chunk, preview=is_preview)
+                except InvalidScript as e:
+                    # TTSに失敗したチャンクと同じく、このチャンクだけ飛ばしてジョブは続ける
+                    logger.warning(f"[Job {job_id}] Skipping chunk {chunk.index}: {e}")
+                    span.set(error=str(e))
+                    chunk_done[i] = True
+                    status.script_done += 1
+                    status.tts_done += 1
+                    status.script_validation = validation_stats.as_dict()
+                    update_progress()
+                    await save_status_to_file(job_id, status)
+                    return Segment(i, 0, None)
+                span.set(script_bytes=len(script.encode("utf-8")))
+            script_chars[i] = len(script)
+            status.script_done += 1
+            status.script_validation = validation_stats.as_dict()
+            update_progress()
+            await save_status_to_file(job_id, status)
+
+            job_registry.raise_if_cancelled(job_id)
+            with trace.span("tts", "stage"):
+                audio_file = await scheduler.run(job_id, generate_audio, script, temp_file, preview=is_preview)
+            chunk_done[i] = True
+            status.tts_done += 1
+            update_progress()
             if audio_file:
-                audio_files.append(audio_file)
-            status.tts_done = i + 1
-            status.progress = 0.4 + 0.5 * (i + 1) / chunk_count
-            save_status_to_file(job_id, status)
-
-        # 連結
-        if audio_files:
-            final_podcast = os.path.join("tmp/final_audio", "final_podcast.wav")
-            await asyncio.to_thread(generator.concatenate_audio_files, audio_files, final_podcast)
-            status.status = "completed"
-            status.progress = 1.0
-            status.result_file = final_podcast
-            save_status_to_file(job_id, status)
-            logger.info(f"[Job {job_id}] Podcast generation completed: {final_podcast}")
+                manifest[i] = manifest_entry(chunk, script, audio_file)
+            if hedge_policy is not None:
+                status.hedges_issued = hedge_budget.issued
+                status.hedge_wins = hedge_budget.wins
+            if is_preview and audio_file:
+                await publish_preview(audio_file)
+            await save_status_to_file(job_id, status)
+            return Segment(i, 0, audio_file)
+
+    encoded: Dict[int, asyncio.Future] = {}
+
+    async def process_and_encode(chunk: Chunk) -> Segment:
+        segment = await process_chunk(chunk)
+        if segment.audio_file and OUTPUT_FORMAT == "mp3":
+            # 最後にまとめてエンコードせず、できたセグメントから並列にエンコードしておく
+            mp3_file = os.path.splitext(segment.audio_file)[0] + ".mp3"
+            encoded[segment.ordinal] = asyncio.get_running_loop().run_in_executor(
+                encode_pool(), encode_mp3_segment, segment.audio_file, mp3_file, MP3_BITRATE
+            )
+        return segment
+
+    for chunk in chunks:
+        trace.name_lane(chunk.ordinal + 1, f"chunk {chunk.index}")
+    with trace.span("chunks", "stage", chunk_count=chunk_count):
+        # gatherはチャンクの順に結果を返すので並べ直しは不要
+        segments = [s for s in await _gather_or_cancel(process_and_encode(chunk) for chunk in chunks) if s.audio_file]
+    audio_files = [segment.audio_file for segment in segments]
+    chapters = [{"index": chunks[s.ordinal].index, "title": chunk_title(chunks[s.ordinal].content)} for s in segments]
+    await save_manifest_to_file(job_id, [entry for entry in manifest if entry])
+    await save_trace_to_file(job_id, trace)
+
+    # 連結
+    job_registry.raise_if_cancelled(job_id)
+    if audio_files:
+        # 新たに生成したチャンクを次の号以降の再利用候補として登録する
+        if BOILERPLATE_SIMILARITY > 0:
+            await asyncio.to_thread(_index_generated_chunks, job_id, chunks, manifest, reuse_plan)
+        if OUTPUT_FORMAT == "mp3":
+            start = time.perf_counter()
+            with trace.span("encode_wait", "stage", file_count=len(encoded)):
+                segment_files = await asyncio.gather(*(encoded[segment.ordinal] for segment in segments))
+            final_podcast = os.path.join(output_dir, "final_podcast.mp3")
+            with trace.span("concatenate", "stage", file_count=len(segment_files), format="mp3"):
+                chapters = await asyncio.to_thread(
+                    generator.concatenate_mp3_with_chapters, segment_files, final_podcast, chapters
+                )
+            # 見積もりはPCMのバイト数で計算するので、エンコード待ちを含めた時間をWAVセグメントの合計サイズで割る
+            wav_bytes = sum(os.path.getsize(f) for f in audio_files)
+            estimator.observe_concat(wav_bytes, time.perf_counter() - start)
         else:
-            status.status = "failed"
-            status.error = "Failed to generate podcast"
-            save_status_to_file(job_id, status)
-            logger.error(f"[Job {job_id}] Podcast generation failed: No result file")
+            final_podcast = os.path.join(output_dir, "final_podcast.wav")
+            with trace.span("concatenate", "stage", file_count=len(audio_files)):
+                start = time.perf_counter()
+                chapters = await asyncio.to_thread(generator.concatenate_with_chapters, audio_files, final_podcast, chapters)
+                estimator.observe_concat(os.path.getsize(final_podcast), time.perf_counter() - start)
+        await save_chapters_to_file(job_id, chapters)
+        counts = validation_stats.as_dict()
+        scripts_accepted = counts["valid"] + counts["repaired"]
+        estimator.observe_calls(
+            script_chunks=scripts_accepted + counts["failed"],
+            script_calls=sum(counts.values()),
+            tts_chunks=scripts_accepted,
+            tts_calls=scripts_accepted + hedge_budget.issued,
+        )
+        await asyncio.to_thread(estimator.save)
+        result_key = f"{job_id}/{os.path.basename(final_podcast)}"
+        with trace.span("store_result", "stage"):
+            await asyncio.to_thread(storage.put_file, result_key, final_podcast)
+        os.remove(final_podcast)
+        # ここから先はキャンセルを受け付けない（完了の保存でキャンセルを上書きしないように）
+        job_registry.close(job_id)
+        status.status = "completed"
+        status.progress = 1.0
+        status.eta_seconds = 0.0
+        status.result_file = result_key
+        await save_status_to_file(job_id, status)
+        logger.info(f"[Job {job_id}] Podcast generation completed: {result_key}")
+        return True
+    else:
+        status.status = "failed"
+        status.error = "Failed to generate podcast"
+        await save_status_to_file(job_id, status)
+        logger.error(f"[Job {job_id}] Podcast generation failed: No result file")
+        return False
+
+
+def _plan_boilerplate_reuse(
+    chunks: List[Chunk], reuse_plan: List[Optional[dict]], previous_job_id: Optional[str]
+) -> List[Dict[str, Any]]:
+    """
+    Fill the reuse plan with near-duplicate chunks of past issues.
+
+    Chunks already reused from previous_job_id are left as they are, and that
+    job's chunks are never used as boilerplate, since chunks changed in a
+    revision have to be regenerated even if the change is small.
+
+    Returns:
+        Report of the reused chunks with their source and similarity
+    """
+    report = []
+    excluded = [previous_job_id] if previous_job_id else []
+    for i, chunk in enumerate(chunks):
+        if reuse_plan[i]:
+            continue
+        match = fingerprint_index.find(chunk, BOILERPLATE_SIMILARITY, excluded)
+        if not match:
+            continue
+        entry, similarity = match
+        reuse_plan[i] = entry
+        report.append(
+            {
+                "index": chunk.index,
+                "title": chunk_title(chunk.content),
+                "source_job_id": entry["job_id"],
+                "source_index": entry["index"],
+                "similarity": round(similarity, 3),
+            }
+        )
+    logger.info(f"Boilerplate plan: {len(report)} of {len(chunks)} chunks reused from past issues")
+    return report
 
-    except Exception as e:
-        tb = traceback.format_exc()
-        status = ProcessingStatus(job_id=job_id, status="failed", error=f"{e}\n{tb}")
-        save_status_to_file(job_id, status)
-        logger.error(f"[Job {job_id}] Podcast生成失敗: {e}\n{tb}")
+
+def _index_generated_chunks(
+    job_id: str, chunks: List[Chunk], manifest: List[Optional[dict]], reuse_plan: List[Optional[dict]]
+) -> None:
+    """Add the chunks a job generated itself (not reused ones) to the fingerprint index."""
+    for chunk, entry, reused in zip(chunks, manifest, reuse_plan):
+        if entry and not reused:
+            fingerprint_index.add(job_id, chunk, entry["script"], entry["audio_file"])
+    fingerprint_index.save()
+
+
+async def _find_joinable_job(key: str) -> Optional[ProcessingStatus]:
+    """Find an in-flight or recently completed job for the same join key whose result is still available."""
+    job_id = job_registry.find(key)
+    if not job_id:
+        return None
+    status = await load_status_from_file(job_id)
+    if not status or status.status in ("failed", "cancelled"):
+        return None
+    if status.status == "completed" and not await asyncio.to_thread(storage.exists, status.result_file):
+        return None
+    return status
 
 
 @router.post("/generate-podcast", response_model=ProcessingStatus)
-async def generate_podcast(background_tasks: BackgroundTasks, file: UploadFile, api_key: str = Depends(get_gemini_api_key)):
+async def generate_podcast(
+    background_tasks: BackgroundTasks,
+    file: UploadFile,
+    priority: int = Form(1, ge=1, le=10),
+    preview: bool = Form(False),
+    previous_job_id: Optional[str] = Form(None),
+    api_key: str = Depends(get_gemini_api_key),
+):
     """
     Generate a podcast from a markdown file.
 
     Args:
         background_tasks: FastAPI background tasks
         file: Uploaded markdown file
+        priority: Share of the Gemini concurrency slots relative to other jobs
+        preview: Generate the opening (START chunk) audio first
+        previous_job_id: Earlier job of the same issue; only chunks changed since then are regenerated
         api_key: Gemini API key
 
     Returns:
@@ -139,20 +561,68 @@ async def generate_podcast(background_tasks: BackgroundTasks, file: UploadFile,
         logger.error(f"File extension not supported: {file.filename}")
         raise HTTPException(status_code=400, detail="Only markdown files are supported")
 
-    content = await file.read()
-    markdown_content = content.decode("utf-8")
+    # 本文を受け取る前の上限と同時数の制限は UploadLimitMiddleware（app.main）で行う
+    try:
+        upload = await ingest_upload(file, MAX_UPLOAD_BYTES)
+    except UploadTooLarge as e:
+        logger.error(f"Upload rejected: {e}")
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedEncoding as e:
+        logger.error(f"Upload rejected: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    markdown_content = upload.text
+    logger.info(f"Upload ingested: {upload.size} bytes, encoding={upload.encoding}")
+
+    if previous_job_id and not JOB_ID_PATTERN.fullmatch(previous_job_id):
+        logger.error(f"Invalid previous job ID: {previous_job_id!r}")
+        raise HTTPException(status_code=400, detail="Invalid previous_job_id")
+    previous_manifest = await load_manifest_from_file(previous_job_id) if previous_job_id else None
+    if previous_job_id and previous_manifest is None:
+        logger.error(f"Previous job {previous_job_id} has no reusable results")
+        raise HTTPException(status_code=400, detail=f"Previous job {previous_job_id} has no reusable results")
+
+    digest = upload.digest
+    # 内容が同じでもオプションが違えば結果や進め方が変わるので、別のジョブにする
+    key = join_key(digest, preview=preview, priority=priority, previous_job_id=previous_job_id)
+    existing = await _find_joinable_job(key)
+    if existing:
+        logger.info(f"[Job {existing.job_id}] Identical upload joined existing job")
+        return existing
 
     job_id = f"job_{os.urandom(8).hex()}"
+    job_registry.register(key, job_id)
     logger.info(f"[Job {job_id}] New podcast generation job created")
 
     output_dir = os.path.join(tempfile.gettempdir(), job_id)
     os.makedirs(output_dir, exist_ok=True)
     logger.info(f"[Job {job_id}] Output directory created: {output_dir}")
 
-    background_tasks.add_task(process_podcast_background, job_id, markdown_content, output_dir, api_key)
-
-    status = ProcessingStatus(job_id=job_id, status="queued", progress=0.0)
-    save_status_to_file(job_id, status)
+    background_tasks.add_task(
+        process_podcast_background,
+        job_id,
+        markdown_content,
+        output_dir,
+        api_key,
+        priority=priority,
+        preview=preview,
+        previous_job_id=previous_job_id,
+    )
+
+    # アップロード時点で所要時間とAPI使用量を見積もる（前回のジョブから再利用するチャンクは除く）
+    chunks = split_markdown_advanced(markdown_content)
+    reused = [False] * len(chunks)
+    if previous_manifest is not None:
+        reused = [bool(entry) for entry in await asyncio.to_thread(plan_reuse, previous_manifest, chunks)]
+    estimate = estimator.estimate_job([len(chunk.content) for chunk in chunks], scheduler.max_concurrency, reused)
+    status = ProcessingStatus(
+        job_id=job_id,
+        status="queued",
+        progress=0.0,
+        content_hash=digest,
+        estimate=estimate,
+        eta_seconds=estimate["duration_seconds"],
+    )
+    await save_status_to_file(job_id, status)
     logger.info(f"[Job {job_id}] Job queued")
 
     return status
@@ -169,7 +639,7 @@ async def get_podcast_status(job_id: str):
     Returns:
         Processing status
     """
-    status = load_status_from_file(job_id)
+    status = await load_status_from_file(job_id)
     if not status:
         logger.error(f"Job {job_id} not found")
         sys.stdout.flush()
@@ -181,17 +651,23 @@ async def get_podcast_status(job_id: str):
 
 
 @router.get("/download-podcast/{job_id}")
-async def download_podcast(job_id: str):
+async def download_podcast(job_id: str, request: Request):
     """
     Download a generated podcast.
 
+    Supports byte-range requests (Range / If-Range with the ETag or
+    Last-Modified) so that clients can seek and resume downloads. The file is
+    streamed from the storage backend, so any node sharing the storage can
+    serve a finished job.
+
     Args:
         job_id: Job ID
+        request: Incoming request
 
     Returns:
         Podcast audio file
     """
-    status = load_status_from_file(job_id)
+    status = await load_status_from_file(job_id)
     if not status:
         logger.error(f"Job {job_id} not found")
         raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
@@ -200,9 +676,114 @@ async def download_podcast(job_id: str):
         logger.error(f"Podcast generation not completed for job {job_id}. Current status: {status.status}")
         raise HTTPException(status_code=400, detail=f"Podcast generation not completed. Current status: {status.status}")
 
-    if not status.result_file or not os.path.exists(status.result_file):
+    if not await asyncio.to_thread(storage.exists, status.result_file):
         logger.error(f"Podcast file not found for job {job_id}")
         raise HTTPException(status_code=404, detail="Podcast file not found")
 
     logger.info(f"[Job {job_id}] Podcast file download started: {status.result_file}")
-    return FileResponse(status.result_file, media_type="audio/mpeg", filename="podcast.mp3")
+    filename = "podcast" + os.path.splitext(status.result_file)[1]
+    return await asyncio.to_thread(ranged_blob_response, request, storage, status.result_file, filename)
+
+
+@router.get("/download-preview/{job_id}")
+async def download_preview(job_id: str, request: Request):
+    """
+    Download the opening segment of a podcast generated in preview mode.
+
+    Args:
+        job_id: Job ID
+        request: Incoming request
+
+    Returns:
+        Audio file of the START chunk
+    """
+    status = await load_status_from_file(job_id)
+    if not status:
+        logger.error(f"Job {job_id} not found")
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    if not await asyncio.to_thread(storage.exists, status.preview_file):
+        logger.error(f"Preview not available for job {job_id}")
+        raise HTTPException(status_code=404, detail="Preview not available")
+
+    logger.info(f"[Job {job_id}] Preview download started: {status.preview_file}")
+    filename = "preview" + os.path.splitext(status.preview_file)[1]
+    return await asyncio.to_thread(ranged_blob_response, request, storage, status.preview_file, filename)
+
+
+@router.get("/podcast-chapters/{job_id}")
+async def get_podcast_chapters(job_id: str):
+    """
+    Get the chapter index of a generated podcast.
+
+    There is one chapter per chunk, with its START/n/END index, its title
+    (article title or h2 heading) and its position in samples and milliseconds.
+    The same chapters are embedded in the WAV file as cue points.
+
+    Args:
+        job_id: Job ID
+
+    Returns:
+        List of chapters
+    """
+    chapters = await load_chapters_from_file(job_id)
+    if chapters is None:
+        logger.error(f"Chapters for job {job_id} not found")
+        raise HTTPException(status_code=404, detail=f"Chapters for job {job_id} not found")
+
+    logger.info(f"[Job {job_id}] Chapters requested")
+    return JSONResponse(chapters)
+
+
+@router.post("/cancel-podcast/{job_id}", response_model=ProcessingStatus)
+async def cancel_podcast(job_id: str):
+    """
+    Cancel a queued or running podcast generation job.
+
+    The job stops issuing new Gemini calls as soon as the call in flight returns.
+
+    Args:
+        job_id: Job ID
+
+    Returns:
+        Processing status
+    """
+    status = await load_status_from_file(job_id)
+    if not status:
+        logger.error(f"Job {job_id} not found")
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    if not job_registry.cancel(job_id):
+        logger.error(f"Job {job_id} cannot be cancelled. Current status: {status.status}")
+        raise HTTPException(status_code=400, detail=f"Job cannot be cancelled. Current status: {status.status}")
+    scheduler.cancel_job(job_id)
+
+    status.status = "cancelled"
+    await save_status_to_file(job_id, status)
+    logger.info(f"[Job {job_id}] Job cancelled")
+    return status
+
+
+@router.get("/jobs/{job_id}/trace")
+async def get_job_trace(job_id: str):
+    """
+    Get the timeline of a podcast generation job.
+
+    The trace is in the Chrome trace event format and can be loaded into
+    chrome://tracing or https://ui.perfetto.dev. While the job is running, the
+    spans still in progress (e.g. a stuck TTS call) are included up to now.
+
+    Args:
+        job_id: Job ID
+
+    Returns:
+        Trace event JSON
+    """
+    live_trace = live_traces.get(job_id)
+    trace = live_trace.to_chrome_trace() if live_trace else await load_trace_from_file(job_id)
+    if trace is None:
+        logger.error(f"Trace for job {job_id} not found")
+        raise HTTPException(status_code=404, detail=f"Trace for job {job_id} not found")
+
+    logger.info(f"[Job {job_id}] Trace requested")
+    return JSONResponse(trace)
@@ -1,4 +1,5 @@
 import logging
+import os
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request
@@ -7,7 +8,9 @@ from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
+from app.api.podcast import MAX_UPLOAD_BYTES, upload_semaphore
 from app.api.podcast import router as podcast_router
+from app.utils.upload import UploadLimitMiddleware
 
 load_dotenv()
 
@@ -20,6 +23,9 @@ app = FastAPI(
     version="0.1.0",
 )
 
+# アップロードの上限サイズと同時数は、FastAPIが本文を読み込む前に制限する
+app.add_middleware(UploadLimitMiddleware, path="/api/generate-podcast", max_bytes=MAX_UPLOAD_BYTES, semaphore=upload_semaphore)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Allow all origins
@@ -28,9 +34,11 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+# どのディレクトリから起動しても見つかるように、このファイルからの相対パスで指定する
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+app.mount("/static", StaticFiles(directory=os.path.join(APP_DIR, "static")), name="static")
 
-templates = Jinja2Templates(directory="app/templates")
+templates = Jinja2Templates(directory=os.path.join(APP_DIR, "templates"))
 
 app.include_router(podcast_router, prefix="/api", tags=["podcast"])
 
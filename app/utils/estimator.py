@@ -0,0 +1,194 @@
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 日本語テキストのおおよそのトークン換算（Geminiでは1トークン≒1〜1.5文字）
+CHARS_PER_TOKEN = 1.2
+
+# 台本生成プロンプトの固定部分の長さ（チャンク内容以外）
+SCRIPT_PROMPT_CHARS = 2200
+
+DEFAULT_RATES = {
+    "script_seconds_per_char": 0.01,  # 台本生成: 入力チャンク1文字あたりの秒数
+    "script_chars_per_char": 1.5,  # 台本の文字数 / 入力チャンクの文字数
+    "tts_seconds_per_char": 0.03,  # TTS: 台本1文字あたりの秒数
+    "audio_seconds_per_char": 0.15,  # 音声の長さ: 台本1文字あたりの秒数
+    "concat_bytes_per_second": 200_000_000.0,  # 連結のスループット（PCMに換算したバイト数）
+    "script_calls_per_chunk": 1.0,  # 台本生成: 検証に落ちた台本の再生成を含むチャンクあたりの呼び出し数
+    "tts_calls_per_chunk": 1.0,  # TTS: ヘッジを含むチャンクあたりの呼び出し数
+}
+
+# 24kHz 16bit モノラル（Gemini TTSの出力）
+AUDIO_BYTES_PER_SECOND = 48000
+
+
+class StageEstimator:
+    """
+    Learns stage timings from completed work and predicts job duration and API volume.
+
+    Each rate is an exponentially weighted moving average over observed calls,
+    persisted to a JSON file so that estimates improve across restarts.
+    """
+
+    def __init__(self, path: Optional[str] = None, alpha: float = 0.2):
+        """
+        Args:
+            path: JSON file the learned rates are loaded from and saved to
+            alpha: Weight of the newest observation in the moving averages
+        """
+        self.path = path
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self.rates: Dict[str, float] = dict(DEFAULT_RATES)
+        self.samples: Dict[str, int] = {name: 0 for name in DEFAULT_RATES}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.rates.update({k: float(v) for k, v in data.get("rates", {}).items() if k in DEFAULT_RATES})
+                self.samples.update({k: int(v) for k, v in data.get("samples", {}).items() if k in DEFAULT_RATES})
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to load stage estimates from {path}: {e}")
+
+    def _update(self, name: str, value: float) -> None:
+        with self._lock:
+            # 最初の観測はデフォルト値を置き換える
+            if self.samples[name] == 0:
+                self.rates[name] = value
+            else:
+                self.rates[name] += self.alpha * (value - self.rates[name])
+            self.samples[name] += 1
+
+    def observe_script(self, content_chars: int, script_chars: int, seconds: float) -> None:
+        """Record a script generation call."""
+        if content_chars <= 0:
+            return
+        self._update("script_seconds_per_char", seconds / content_chars)
+        self._update("script_chars_per_char", script_chars / content_chars)
+
+    def observe_tts(self, script_chars: int, seconds: float, audio_bytes: int = 0) -> None:
+        """Record a TTS call."""
+        if script_chars <= 0:
+            return
+        self._update("tts_seconds_per_char", seconds / script_chars)
+        if audio_bytes:
+            self._update("audio_seconds_per_char", audio_bytes / AUDIO_BYTES_PER_SECOND / script_chars)
+
+    def observe_concat(self, output_bytes: int, seconds: float) -> None:
+        """Record an audio concatenation (output_bytes is the size of the audio as PCM WAV)."""
+        if output_bytes > 0 and seconds > 0:
+            self._update("concat_bytes_per_second", output_bytes / seconds)
+
+    def observe_calls(self, script_chunks: int, script_calls: int, tts_chunks: int, tts_calls: int) -> None:
+        """
+        Record how many Gemini calls a job needed per generated chunk.
+
+        Args:
+            script_chunks: Chunks whose script was generated
+            script_calls: Script requests, re-requests of invalid scripts included
+            tts_chunks: Chunks sent to TTS
+            tts_calls: TTS requests, hedged requests included
+        """
+        if script_chunks > 0:
+            self._update("script_calls_per_chunk", script_calls / script_chunks)
+        if tts_chunks > 0:
+            self._update("tts_calls_per_chunk", tts_calls / tts_chunks)
+
+    def save(self) -> None:
+        """Persist the learned rates."""
+        if not self.path:
+            return
+        with self._lock:
+            data = json.dumps({"rates": dict(self.rates), "samples": dict(self.samples)})
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # 書きかけのファイルを読むと学習した値がすべてデフォルトに戻るので、一時ファイルに書いてからリネームする
+        temp_path = f"{self.path}.{os.urandom(4).hex()}.part"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(temp_path, self.path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def estimate_job(
+        self, content_chars: List[int], concurrency: int = 1, reused: Optional[List[bool]] = None
+    ) -> Dict[str, float]:
+        """
+        Predict duration, API calls and token/audio volume of a job before it starts.
+
+        Reused chunks cost no Gemini calls, but their audio is still part of
+        the podcast. Re-requested scripts and hedged TTS requests are counted
+        at the rates learned from past jobs.
+
+        Args:
+            content_chars: Length of each chunk's markdown
+            concurrency: Number of Gemini calls that run in parallel
+            reused: Whether each chunk reuses a previous script and audio
+
+        Returns:
+            Dictionary with duration_seconds, api_calls, input_tokens,
+            output_tokens and audio_seconds
+        """
+        rates = self.rates
+        reused = reused or [False] * len(content_chars)
+        script_chars = [c * rates["script_chars_per_char"] for c in content_chars]
+        audio_seconds = sum(script_chars) * rates["audio_seconds_per_char"]
+        generated = [(c, s) for c, s, r in zip(content_chars, script_chars, reused) if not r]
+        script_calls = rates["script_calls_per_chunk"]
+        tts_calls = rates["tts_calls_per_chunk"]
+        # 台本生成はプロンプト＋チャンクを入力に台本を出力し、TTSは台本を入力にする
+        prompt_chars = sum(SCRIPT_PROMPT_CHARS + c for c, _ in generated)
+        generated_script_chars = sum(s for _, s in generated)
+        input_chars = script_calls * prompt_chars + tts_calls * generated_script_chars
+        output_chars = script_calls * generated_script_chars
+        duration = self.remaining_seconds(content_chars, [None] * len(content_chars), concurrency, reused)
+        return {
+            "duration_seconds": round(duration, 1),
+            "api_calls": round(len(generated) * (script_calls + tts_calls)),
+            "input_tokens": int(input_chars / CHARS_PER_TOKEN),
+            "output_tokens": int(output_chars / CHARS_PER_TOKEN),
+            "audio_seconds": round(audio_seconds, 1),
+        }
+
+    def remaining_seconds(
+        self,
+        content_chars: List[int],
+        script_chars: List[Optional[int]],
+        concurrency: int = 1,
+        done: Optional[List[bool]] = None,
+    ) -> float:
+        """
+        Predict the time left for a job.
+
+        Args:
+            content_chars: Length of each chunk's markdown
+            script_chars: Length of each chunk's script, None if not generated yet
+            concurrency: Number of Gemini calls that run in parallel
+            done: Whether each chunk's audio is finished
+
+        Returns:
+            Seconds until the podcast is expected to be ready
+        """
+        rates = self.rates
+        done = done or [False] * len(content_chars)
+        chunk_seconds = []
+        total_script_chars = 0.0
+        for content, script, finished in zip(content_chars, script_chars, done):
+            expected_script = script if script is not None else content * rates["script_chars_per_char"]
+            total_script_chars += expected_script
+            if finished:
+                continue
+            seconds = expected_script * rates["tts_seconds_per_char"]
+            if script is None:
+                seconds += content * rates["script_seconds_per_char"] * rates["script_calls_per_chunk"]
+            chunk_seconds.append(seconds)
+
+        # 並列実行: 総作業量を並列数で割った値と、最も遅いチャンクの長い方
+        work = max(sum(chunk_seconds) / max(concurrency, 1), max(chunk_seconds, default=0.0))
+        output_bytes = total_script_chars * rates["audio_seconds_per_char"] * AUDIO_BYTES_PER_SECOND
+        return work + output_bytes / rates["concat_bytes_per_second"]
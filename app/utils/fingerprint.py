@@ -0,0 +1,185 @@
+import hashlib
+import heapq
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.utils.incremental import chunk_role, manifest_entry
+from app.utils.records import Chunk
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_SIZE = 5  # 日本語は単語区切りがないので文字単位のシングル
+SKETCH_SIZE = 128  # bottom-k MinHash のスケッチサイズ
+MAX_CANDIDATES = 20
+
+
+def normalize_chunk_text(content: str) -> str:
+    """
+    Normalize chunk markdown so that recurring blocks compare equal across issues.
+
+    Applies NFKC, lower-cases, replaces numbers (dates, issue numbers) with 0
+    and collapses whitespace and markdown markup.
+    """
+    text = unicodedata.normalize("NFKC", content).lower()
+    text = re.sub(r"\d+", "0", text)
+    return re.sub(r"[\s#*_>`|-]+", " ", text).strip()
+
+
+def chunk_numbers(content: str) -> List[str]:
+    """Digit sequences of a chunk (dates, issue numbers), which must match before audio is reused."""
+    return re.findall(r"\d+", unicodedata.normalize("NFKC", content))
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """Character n-grams of a text (the text itself if it is shorter than size)."""
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i : i + size] for i in range(len(text) - size + 1)}
+
+
+def chunk_sketch(content: str, size: int = SKETCH_SIZE) -> List[int]:
+    """
+    Compute the bottom-k MinHash sketch of a chunk.
+
+    Each shingle is hashed once and the size smallest hash values are kept,
+    which estimates Jaccard similarity like a MinHash signature with a single
+    hash function.
+
+    Args:
+        content: Chunk markdown
+        size: Number of hash values to keep
+
+    Returns:
+        Sorted hash values
+    """
+    hashes = {
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+        for s in shingles(normalize_chunk_text(content))
+    }
+    return sorted(heapq.nsmallest(size, hashes))
+
+
+def estimate_similarity(a: List[int], b: List[int], size: int = SKETCH_SIZE) -> float:
+    """Estimate the Jaccard similarity of two chunks from their sketches."""
+    set_a, set_b = set(a), set(b)
+    union = heapq.nsmallest(size, set_a | set_b)
+    if not union:
+        return 0.0
+    return sum(1 for h in union if h in set_a and h in set_b) / len(union)
+
+
+class FingerprintIndex:
+    """
+    Index of chunks generated by past jobs, searchable by near-duplicate content.
+
+    Entries are manifest entries (script and audio file) with the job id, the
+    chunk sketch and the chunk's numbers. The sketch ignores numbers so that a
+    recurring block scores high across issues, but an entry is only returned
+    when its numbers match exactly, since its audio reads them out. Candidates
+    are found through an inverted index from hash values to entries, then
+    scored by estimated similarity.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 2000):
+        """
+        Args:
+            path: JSON file the index is loaded from and saved to
+            max_entries: Number of entries kept; the oldest are dropped first
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: List[Dict[str, Any]] = []
+        self._postings: Dict[int, List[int]] = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to load fingerprint index from {path}: {e}")
+        self._rebuild()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _rebuild(self) -> None:
+        self._entries = [e for e in self._entries if os.path.exists(e["audio_file"])][-self.max_entries :]
+        self._postings = {}
+        for position, entry in enumerate(self._entries):
+            for h in entry["sketch"]:
+                self._postings.setdefault(h, []).append(position)
+
+    def find(
+        self, chunk: Chunk, threshold: float, exclude_job_ids: Iterable[str] = ()
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        Find the most similar past chunk with the same role.
+
+        Args:
+            chunk: Chunk to find a match for
+            threshold: Minimum estimated Jaccard similarity (0-1)
+            exclude_job_ids: Jobs whose chunks must not be reused
+
+        Returns:
+            (entry, similarity) of the best match, or None
+        """
+        sketch = chunk_sketch(chunk.content)
+        numbers = chunk_numbers(chunk.content)
+        role = chunk_role(chunk.index)
+        excluded = set(exclude_job_ids)
+
+        def usable(entry: Dict[str, Any]) -> bool:
+            return entry["role"] == role and entry["job_id"] not in excluded and entry.get("numbers") == numbers
+
+        with self._lock:
+            counts = Counter(p for h in sketch for p in self._postings.get(h, ()))
+            # 役割・除外ジョブ・数字で絞ってから上位を取る（使えない同じ内容のエントリで候補枠が埋まらないように）
+            eligible = Counter({p: n for p, n in counts.items() if usable(self._entries[p])})
+            best = None
+            for position, _ in eligible.most_common(MAX_CANDIDATES):
+                entry = self._entries[position]
+                if not os.path.exists(entry["audio_file"]):
+                    continue
+                similarity = estimate_similarity(sketch, entry["sketch"])
+                if similarity >= threshold and (best is None or similarity > best[1]):
+                    best = (entry, similarity)
+        return best
+
+    def add(self, job_id: str, chunk: Chunk, script: str, audio_file: str) -> None:
+        """Add a generated chunk to the index."""
+        entry = {
+            **manifest_entry(chunk, script, audio_file),
+            "job_id": job_id,
+            "sketch": chunk_sketch(chunk.content),
+            "numbers": chunk_numbers(chunk.content),
+        }
+        with self._lock:
+            self._entries.append(entry)
+            if len(self._entries) > self.max_entries:
+                self._rebuild()
+            else:
+                for h in entry["sketch"]:
+                    self._postings.setdefault(h, []).append(len(self._entries) - 1)
+
+    def save(self) -> None:
+        """Persist the index."""
+        if not self.path:
+            return
+        with self._lock:
+            data = json.dumps(self._entries, ensure_ascii=False)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # 複数のジョブが同時に保存するので、一時ファイルに書いてからリネームする
+        temp_path = f"{self.path}.{os.urandom(4).hex()}.part"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(temp_path, self.path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
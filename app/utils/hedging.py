@@ -0,0 +1,191 @@
+import concurrent.futures
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Callable, Optional, TypeVar
+
+if TYPE_CHECKING:
+    from app.utils.scheduler import ChunkScheduler
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# primary/hedge の試行を走らせるスレッド（呼び出し元スレッドは結果待ちに使う）
+_attempt_pool = concurrent.futures.ThreadPoolExecutor(max_workers=64, thread_name_prefix="hedge-attempt")
+
+
+class CancelSignal:
+    """Cancel flag of a single attempt that is also set when any parent event is set."""
+
+    def __init__(self, *parents: Optional[threading.Event]):
+        self._event = threading.Event()
+        self._parents = [p for p in parents if p is not None]
+
+    def set(self) -> None:
+        self._event.set()
+
+    def is_set(self) -> bool:
+        return self._event.is_set() or any(p.is_set() for p in self._parents)
+
+
+class HedgeBudget:
+    """Per-job cap on hedged requests, with hedge and win counters."""
+
+    def __init__(self, max_hedges: int):
+        self.max_hedges = max_hedges
+        self.issued = 0
+        self.wins = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.issued >= self.max_hedges:
+                return False
+            self.issued += 1
+            return True
+
+    def record_win(self) -> None:
+        with self._lock:
+            self.wins += 1
+
+
+class HedgePolicy:
+    """
+    Fires a duplicate request when a call is slower than a latency percentile.
+
+    Latencies are tracked per unit of request size (e.g. seconds per script
+    character), so the hedge threshold scales with the size of each call.
+    """
+
+    def __init__(self, percentile: float = 95.0, min_samples: int = 10, window: int = 200):
+        """
+        Args:
+            percentile: Latency percentile after which a hedge is fired
+            min_samples: Calls to observe before hedging starts
+            window: Number of recent calls the percentile is computed over
+        """
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, size: int) -> None:
+        """Record the latency of a successful call."""
+        with self._lock:
+            self._samples.append(seconds / max(size, 1))
+
+    def threshold(self, size: int) -> Optional[float]:
+        """
+        Get the hedge delay for a call of the given size.
+
+        Returns:
+            Seconds to wait before hedging, or None while there are too few samples
+        """
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        rank = min(len(ordered) - 1, max(0, int(round(self.percentile / 100 * len(ordered))) - 1))
+        return ordered[rank] * max(size, 1)
+
+    def call(
+        self,
+        fn: Callable[[CancelSignal, str], Optional[T]],
+        size: int,
+        budget: HedgeBudget,
+        cancel_event: Optional[threading.Event] = None,
+        slots: Optional["ChunkScheduler"] = None,
+    ) -> Optional[T]:
+        """
+        Run a blocking call, hedging it if it is slower than the percentile.
+
+        fn is called with a cancel signal and the attempt name ("primary" or
+        "hedge"); it should stop early and return None once the signal is set.
+        The first attempt to return a result wins and the other is cancelled.
+
+        Args:
+            fn: Blocking call to run
+            size: Request size used to scale the threshold
+            budget: Hedge budget of the job
+            cancel_event: Job cancel event, propagated to every attempt
+            slots: Scheduler the primary call runs in; a hedge is only fired
+                when it can borrow an idle slot, so hedges count against the
+                scheduler's max_concurrency
+
+        Returns:
+            Result of the winning attempt, or None if every attempt returned None
+        """
+        signals = {}
+        durations = {}
+
+        def timed(signal: CancelSignal, attempt: str, borrowed: bool) -> Optional[T]:
+            start = time.monotonic()
+            try:
+                return fn(signal, attempt)
+            finally:
+                durations[attempt] = time.monotonic() - start
+                if borrowed:
+                    slots.give_back()
+
+        def submit(attempt: str, borrowed: bool = False) -> concurrent.futures.Future:
+            signal = CancelSignal(cancel_event)
+            future = _attempt_pool.submit(contextvars.copy_context().run, timed, signal, attempt, borrowed)
+            signals[future] = (signal, attempt)
+            return future
+
+        primary = submit("primary")
+        delay = self.threshold(size)
+        if delay is not None:
+            done, _ = concurrent.futures.wait([primary], timeout=delay)
+            if not done and not (cancel_event and cancel_event.is_set()):
+                # 空きスロットがなければヘッジしない（同時実行数の上限を超えない）
+                borrowed = slots is not None and slots.try_borrow()
+                if (slots is None or borrowed) and budget.try_acquire():
+                    logger.info(f"Hedging slow call after {delay:.1f}s (size {size})")
+                    submit("hedge", borrowed)
+                elif borrowed:
+                    slots.give_back()
+
+        pending = set(signals)
+        errors = []
+        winner = None
+        while pending and winner is None:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    errors.append(future.exception())
+                elif future.result() is not None and winner is None:
+                    winner = future
+
+        for future in pending:
+            signals[future][0].set()
+            future.add_done_callback(_discard_result(winner.result() if winner else None))
+
+        if winner is None:
+            if errors:
+                raise errors[0]
+            return None
+
+        # 勝った試行そのものの所要時間を記録する（ヘッジの待ち時間を含めると閾値が膨らむ）
+        self.record(durations[signals[winner][1]], size)
+        if signals[winner][1] == "hedge":
+            budget.record_win()
+            logger.info("Hedged call won")
+        return winner.result()
+
+
+def _discard_result(winning_result):
+    """Build a callback that removes files written by a losing attempt."""
+
+    def callback(future: concurrent.futures.Future) -> None:
+        if future.exception() is not None:
+            return
+        result = future.result()
+        if isinstance(result, str) and result != winning_result and os.path.exists(result):
+            os.remove(result)
+
+    return callback
@@ -0,0 +1,115 @@
+import logging
+import mimetypes
+import os
+from email.utils import formatdate
+from typing import Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+from app.utils.storage import BlobStorage
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPES = {".wav": "audio/wav", ".mp3": "audio/mpeg"}
+
+
+class RangeNotSatisfiable(ValueError):
+    """The requested byte range lies outside the file."""
+
+
+def parse_range_header(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single byte range of a Range header.
+
+    Multiple ranges are not supported; they are ignored so that the whole
+    file is served, which RFC 9110 allows.
+
+    Args:
+        range_header: Value of the Range header (e.g. "bytes=0-1023")
+        size: File size in bytes
+
+    Returns:
+        Inclusive (start, end) byte positions, or None to serve the whole file
+
+    Raises:
+        RangeNotSatisfiable: If the range starts beyond the end of the file
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_str, sep, end_str = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        first = int(start_str) if start_str.strip() else None
+        last = int(end_str) if end_str.strip() else None
+    except ValueError:
+        return None
+    if first is None:
+        # "bytes=-500" は末尾500バイト
+        if last is None:
+            return None
+        if last == 0:
+            raise RangeNotSatisfiable(range_header)
+        start, end = max(0, size - last), size - 1
+    else:
+        start, end = first, last if last is not None else size - 1
+    if start >= size:
+        raise RangeNotSatisfiable(range_header)
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def ranged_blob_response(
+    request: Request, storage: BlobStorage, key: str, filename: str, media_type: Optional[str] = None
+) -> Response:
+    """
+    Serve a stored blob with support for byte-range requests.
+
+    Honors Range (single range) and If-Range, so clients can seek and resume
+    interrupted downloads; If-Range accepts either the ETag or Last-Modified.
+    The body is streamed from the storage backend.
+
+    Args:
+        request: Incoming request
+        storage: Storage backend holding the blob
+        key: Key of the blob
+        filename: Download file name
+        media_type: Content type, guessed from the extension if omitted
+
+    Returns:
+        200, 206 or 416 response
+    """
+    info = storage.stat(key)
+    size = info.size
+    etag = info.etag
+    last_modified = formatdate(info.last_modified, usegmt=True)
+    ext = os.path.splitext(key)[1].lower()
+    media_type = media_type or MEDIA_TYPES.get(ext) or mimetypes.guess_type(key)[0] or "application/octet-stream"
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() in (etag, last_modified)):
+        try:
+            byte_range = parse_range_header(range_header, size)
+        except RangeNotSatisfiable:
+            logger.info(f"Unsatisfiable range {range_header} for {key} ({size} bytes)")
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if byte_range:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(
+                storage.iter_range(key, start, end), status_code=206, media_type=media_type, headers=headers
+            )
+
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(storage.iter_range(key), media_type=media_type, headers=headers)
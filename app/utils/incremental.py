@@ -0,0 +1,88 @@
+import hashlib
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from app.utils.records import Chunk
+
+logger = logging.getLogger(__name__)
+
+
+def chunk_role(index: str) -> str:
+    """
+    Get the role of a chunk in the programme from its index.
+
+    The script prompt only depends on whether a chunk is the opening, the
+    ending or somewhere in between, so middle chunks whose number shifts
+    (e.g. "3" → "4" after an article is inserted) keep the same role.
+
+    Args:
+        index: Chunk index ("START", "END" or a number)
+
+    Returns:
+        "START", "END" or "MIDDLE"
+    """
+    if index in ("START", "END"):
+        return index
+    return "MIDDLE"
+
+
+def chunk_content_hash(content: str) -> str:
+    """
+    Hash chunk content, ignoring differences in line endings and trailing whitespace.
+
+    Args:
+        content: Chunk markdown
+
+    Returns:
+        Hex encoded SHA-256 digest
+    """
+    normalized = "\n".join(line.rstrip() for line in content.replace("\r\n", "\n").strip().split("\n"))
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def manifest_entry(chunk: Chunk, script: str, audio_file: str) -> Dict[str, Any]:
+    """
+    Build the manifest record of a generated chunk.
+
+    Args:
+        chunk: Generated chunk
+        script: Generated script
+        audio_file: Generated audio file
+
+    Returns:
+        Manifest entry
+    """
+    return {
+        "index": chunk.index,
+        "role": chunk_role(chunk.index),
+        "content_hash": chunk_content_hash(chunk.content),
+        "script": script,
+        "audio_file": audio_file,
+    }
+
+
+def plan_reuse(previous_manifest: List[Dict[str, Any]], chunks: List[Chunk]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Match the chunks of a revised newsletter against a previous job's manifest.
+
+    A chunk can reuse a previous script and audio only if both its content and
+    its role are unchanged: when an article is appended, the old END chunk
+    becomes a middle chunk and has to be regenerated without the closing talk,
+    and the new last chunk needs one.
+
+    Args:
+        previous_manifest: Manifest entries of the previous job
+        chunks: Chunks of the new markdown
+
+    Returns:
+        For each chunk, the reusable manifest entry or None if it must be regenerated
+    """
+    reusable = {}
+    for entry in previous_manifest:
+        if entry.get("audio_file") and os.path.exists(entry["audio_file"]):
+            reusable.setdefault((entry["role"], entry["content_hash"]), entry)
+
+    plan = [reusable.get((chunk_role(c.index), chunk_content_hash(c.content))) for c in chunks]
+    logger.info(f"Incremental plan: {sum(1 for p in plan if p)} of {len(chunks)} chunks reusable")
+    return plan
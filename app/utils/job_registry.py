@@ -0,0 +1,172 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once it has been cancelled."""
+
+
+def content_hash(markdown_content: str) -> str:
+    """
+    Compute the content hash used to detect identical uploads.
+
+    Args:
+        markdown_content: Uploaded markdown text
+
+    Returns:
+        Hex encoded SHA-256 digest
+    """
+    return hashlib.sha256(markdown_content.encode("utf-8")).hexdigest()
+
+
+def join_key(digest: str, **options: Any) -> str:
+    """
+    Build the key identical uploads join on.
+
+    Two uploads only share a job when the content and the options that change
+    the result or how the job runs (preview, priority, previous job) match.
+
+    Args:
+        digest: Content hash of the upload
+        **options: Job options
+
+    Returns:
+        Join key
+    """
+    return digest + "".join(f"|{name}={options[name]}" for name in sorted(options))
+
+
+class JobRegistry:
+    """
+    In-process registry of podcast jobs.
+
+    Maps join keys to the job generating them so identical uploads can join
+    an in-flight or recently finished job, and holds a cancel flag per job.
+    """
+
+    def __init__(self, recent_ttl: float = 3600.0):
+        """
+        Args:
+            recent_ttl: Seconds a finished job stays joinable
+        """
+        self.recent_ttl = recent_ttl
+        self._lock = threading.Lock()
+        self._job_by_hash: Dict[str, str] = {}
+        self._finished_at: Dict[str, float] = {}
+        self._cancel_events: Dict[str, threading.Event] = {}
+
+    def register(self, digest: str, job_id: str) -> threading.Event:
+        """
+        Register a new job for a join key.
+
+        Args:
+            digest: Join key of the upload (see join_key)
+            job_id: Job ID
+
+        Returns:
+            The job's cancel event
+        """
+        with self._lock:
+            self._job_by_hash[digest] = job_id
+            self._finished_at.pop(job_id, None)
+            return self._cancel_events.setdefault(job_id, threading.Event())
+
+    def cancel_event(self, job_id: str) -> threading.Event:
+        """Get the event that is set when the job is cancelled."""
+        with self._lock:
+            return self._cancel_events.setdefault(job_id, threading.Event())
+
+    def find(self, digest: str) -> Optional[str]:
+        """
+        Find an in-flight or recently finished job for a join key.
+
+        Args:
+            digest: Join key of the upload (see join_key)
+
+        Returns:
+            Job ID, or None if there is no joinable job
+        """
+        with self._lock:
+            self._expire()
+            return self._job_by_hash.get(digest)
+
+    def finish(self, job_id: str, succeeded: bool) -> None:
+        """
+        Mark a job as finished.
+
+        Failed and cancelled jobs are forgotten at once so that a re-upload
+        starts a fresh job; successful ones stay joinable for recent_ttl.
+
+        Args:
+            job_id: Job ID
+            succeeded: Whether the job produced a podcast
+        """
+        with self._lock:
+            if succeeded:
+                self._finished_at[job_id] = time.monotonic()
+            else:
+                self._forget(job_id)
+            self._cancel_events.pop(job_id, None)
+
+    def close(self, job_id: str) -> None:
+        """
+        Stop accepting cancellation of a job that is about to complete.
+
+        Called right before the job saves its completed status, so a cancel
+        request either lands before this (and the job raises JobCancelled) or
+        is refused, instead of being overwritten by the completed status.
+
+        Args:
+            job_id: Job ID
+
+        Raises:
+            JobCancelled: If the job was cancelled before it was closed
+        """
+        with self._lock:
+            event = self._cancel_events.pop(job_id, None)
+        if event is not None and event.is_set():
+            raise JobCancelled(f"Job {job_id} was cancelled")
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Request cancellation of a running job.
+
+        Args:
+            job_id: Job ID
+
+        Returns:
+            True if the job was running and is now flagged as cancelled
+        """
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+            if event is None:
+                return False
+            event.set()
+            self._forget(job_id)
+        logger.info(f"[Job {job_id}] Cancellation requested")
+        return True
+
+    def is_cancelled(self, job_id: str) -> bool:
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+        return event is not None and event.is_set()
+
+    def raise_if_cancelled(self, job_id: str) -> None:
+        """Raise JobCancelled if the job has been cancelled."""
+        if self.is_cancelled(job_id):
+            raise JobCancelled(f"Job {job_id} was cancelled")
+
+    def _forget(self, job_id: str) -> None:
+        for digest in [d for d, j in self._job_by_hash.items() if j == job_id]:
+            del self._job_by_hash[digest]
+        self._finished_at.pop(job_id, None)
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for job_id in [j for j, t in self._finished_at.items() if now - t > self.recent_ttl]:
+            self._forget(job_id)
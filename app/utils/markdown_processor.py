@@ -1,12 +1,14 @@
 import logging
 import os
 import re
-from typing import Any, Dict, List
+from typing import List
+
+from app.utils.records import Chunk
 
 logger = logging.getLogger(__name__)
 
 
-def split_markdown_advanced(markdown_content: str, save_dir: str = None) -> List[Dict[str, Any]]:
+def split_markdown_advanced(markdown_content: str, save_dir: str = None) -> List[Chunk]:
     """
     「今週のざっくばらん」はh2ごとにchunk分割。
     「私の目に止まった記事」はリンク行ごとにchunk分割（リンク＋コメントのセットでchunk化）。
@@ -24,7 +26,7 @@ def split_markdown_advanced(markdown_content: str, save_dir: str = None) -> List
             for i, chunk in enumerate(chunks):
                 fname = os.path.join(save_dir, f"chunk_{i}.txt")
                 with open(fname, "w", encoding="utf-8") as f:
-                    f.write(chunk["content"])
+                    f.write(chunk.content)
         return chunks
 
     zakkubaran_start = zakkubaran_header.start()
@@ -37,7 +39,7 @@ def split_markdown_advanced(markdown_content: str, save_dir: str = None) -> List
     zakkubaran_chunks = split_markdown_by_h2(zakkubaran_section)
 
     # 記事セクションはリンク行ごとにchunk
-    article_chunks = []
+    article_contents = []
     lines = articles_section.splitlines(keepends=True)
     i = 0
     while i < len(lines):
@@ -50,37 +52,30 @@ def split_markdown_advanced(markdown_content: str, save_dir: str = None) -> List
             while j < len(lines) and not re.match(r"^\s*\[.*?\]\(.*?\)\s*$", lines[j]) and not re.match(r"^# ", lines[j]):
                 chunk_lines.append(lines[j])
                 j += 1
-            article_chunks.append({"index": f"ARTICLE_{len(article_chunks)}", "content": "".join(chunk_lines)})
+            article_contents.append("".join(chunk_lines))
             i = j
         else:
             i += 1
     # もしリンク行が1つもなければ、セクション全体を1chunkに
-    if not article_chunks:
-        article_chunks.append({"index": "ARTICLE_0", "content": articles_section})
+    if not article_contents:
+        article_contents.append(articles_section)
     # index命名規則を統一して通し番号にする
-    all_chunks = zakkubaran_chunks + article_chunks
-    n = len(all_chunks)
+    contents = [chunk.content for chunk in zakkubaran_chunks] + article_contents
+    n = len(contents)
     unified_chunks = []
-    if n == 1:
-        unified_chunks.append({"index": "START", "content": all_chunks[0]["content"]})
-    elif n == 2:
-        unified_chunks.append({"index": "START", "content": all_chunks[0]["content"]})
-        unified_chunks.append({"index": "END", "content": all_chunks[1]["content"]})
-    else:
-        unified_chunks.append({"index": "START", "content": all_chunks[0]["content"]})
-        for i in range(1, n - 1):
-            unified_chunks.append({"index": str(i), "content": all_chunks[i]["content"]})
-        unified_chunks.append({"index": "END", "content": all_chunks[-1]["content"]})
+    for i, content in enumerate(contents):
+        index = "START" if i == 0 else "END" if i == n - 1 else str(i)
+        unified_chunks.append(Chunk(i, index, content))
     if save_dir:
         os.makedirs(save_dir, exist_ok=True)
         for i, chunk in enumerate(unified_chunks):
             fname = os.path.join(save_dir, f"chunk_{i}.txt")
             with open(fname, "w", encoding="utf-8") as f:
-                f.write(f"[index: {chunk['index']}]\n{chunk['content']}")
+                f.write(f"[index: {chunk.index}]\n{chunk.content}")
     return unified_chunks
 
 
-def split_markdown_by_h2(markdown_content: str) -> List[Dict[str, Any]]:
+def split_markdown_by_h2(markdown_content: str) -> List[Chunk]:
     """
     Split markdown content by h2 headers.
 
@@ -92,7 +87,7 @@ def split_markdown_by_h2(markdown_content: str) -> List[Dict[str, Any]]:
         markdown_content: The markdown content to split
 
     Returns:
-        List of dictionaries with 'index' and 'content' keys
+        List of chunks in programme order
     """
     logger.info("Splitting markdown content by h2 headers")
     h2_pattern = r"^## .*$"
@@ -100,35 +95,62 @@ def split_markdown_by_h2(markdown_content: str) -> List[Dict[str, Any]]:
 
     if not h2_matches:
         logger.info("No h2 headers found in markdown content")
-        return [{"index": "START", "content": markdown_content}]
+        return [Chunk(0, "START", markdown_content)]
 
     chunks = []
 
     if len(h2_matches) > 1:
         first_chunk_end = h2_matches[1].start()
         first_chunk = markdown_content[:first_chunk_end]
-        chunks.append({"index": "START", "content": first_chunk})
+        chunks.append(Chunk(0, "START", first_chunk))
         logger.info(f"First chunk created, length: {len(first_chunk)}")
 
         for i in range(1, len(h2_matches) - 1):
             chunk_start = h2_matches[i].start()
             chunk_end = h2_matches[i + 1].start()
             chunk = markdown_content[chunk_start:chunk_end]
-            chunks.append({"index": str(i), "content": chunk})
+            chunks.append(Chunk(i, str(i), chunk))
             logger.info(f"Chunk {i} created, length: {len(chunk)}")
 
         last_chunk_start = h2_matches[-1].start()
         last_chunk = markdown_content[last_chunk_start:]
-        chunks.append({"index": "END", "content": last_chunk})
+        chunks.append(Chunk(len(chunks), "END", last_chunk))
         logger.info(f"Last chunk created, length: {len(last_chunk)}")
     else:
         first_chunk = markdown_content[: h2_matches[0].start()]
         if first_chunk.strip():  # Only add if not empty
-            chunks.append({"index": "START", "content": first_chunk})
+            chunks.append(Chunk(0, "START", first_chunk))
             logger.info(f"First chunk created, length: {len(first_chunk)}")
 
         last_chunk = markdown_content[h2_matches[0].start() :]
-        chunks.append({"index": "END", "content": last_chunk})
+        chunks.append(Chunk(len(chunks), "END", last_chunk))
         logger.info(f"Last chunk created, length: {len(last_chunk)}")
 
     return chunks
+
+
+def chunk_title(content: str, max_length: int = 80) -> str:
+    """
+    Get a short title for a chunk, used as its chapter name.
+
+    The link text of an article chunk, otherwise the first h2 heading (or
+    any heading), otherwise the first non-empty line.
+
+    Args:
+        content: Chunk markdown
+        max_length: Maximum title length
+
+    Returns:
+        Chapter title
+    """
+    link_match = re.match(r"^\s*\[(.+?)\]\(.*?\)\s*$", content.lstrip("\n").split("\n", 1)[0])
+    heading_match = re.search(r"^## +(.+?)\s*$", content, re.MULTILINE) or re.search(
+        r"^#{1,6} +(.+?)\s*$", content, re.MULTILINE
+    )
+    if link_match:
+        title = link_match.group(1)
+    elif heading_match:
+        title = heading_match.group(1)
+    else:
+        title = next((line.strip() for line in content.splitlines() if line.strip()), "")
+    return title[:max_length]
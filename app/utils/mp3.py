@@ -0,0 +1,302 @@
+import logging
+import multiprocessing
+import os
+import struct
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from pydub import AudioSegment
+
+logger = logging.getLogger(__name__)
+
+# Layer III のビットレート（kbps）
+MPEG1_BITRATES = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+MPEG2_BITRATES = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+# バージョンビット → サンプリングレート（3: MPEG1, 2: MPEG2, 0: MPEG2.5）
+SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+ENCODER_TAGS = (b"LAME", b"Lavf", b"Lavc")
+
+_encode_pool: Optional[ProcessPoolExecutor] = None
+_encode_pool_lock = threading.Lock()
+
+
+class FrameHeader(NamedTuple):
+    """Fields of an MPEG audio Layer III frame header."""
+
+    version: int  # 3: MPEG1, 2: MPEG2, 0: MPEG2.5
+    sample_rate: int
+    mono: bool
+    bitrate: int
+    padding: int
+    size: int  # ヘッダを含むフレームのバイト数
+    samples: int  # 1フレームのサンプル数
+    side_info: int  # サイド情報のバイト数
+
+    @property
+    def format(self) -> Tuple[int, int, bool]:
+        return self.version, self.sample_rate, self.mono
+
+
+class Mp3Segment(NamedTuple):
+    """Audio frames of an MP3 file, with the encoder delay and padding from its LAME tag."""
+
+    data: bytes
+    header: FrameHeader  # 最初の音声フレームのヘッダ
+    start: int  # 最初の音声フレームのオフセット
+    frame_ends: List[int]  # 各音声フレームの終端オフセット
+    delay: int
+    padding: int
+
+
+def parse_frame_header(header: bytes) -> Optional[FrameHeader]:
+    """
+    Parse an MPEG audio frame header.
+
+    Args:
+        header: At least 4 bytes starting at the frame sync
+
+    Returns:
+        FrameHeader, or None if the bytes are not a valid Layer III header
+    """
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = (MPEG1_BITRATES if mpeg1 else MPEG2_BITRATES)[bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 0x01
+    mono = header[3] >> 6 == 3
+    if mpeg1:
+        side_info = 17 if mono else 32
+    else:
+        side_info = 9 if mono else 17
+    size = (144 if mpeg1 else 72) * bitrate // sample_rate + padding
+    return FrameHeader(version, sample_rate, mono, bitrate, padding, size, 1152 if mpeg1 else 576, side_info)
+
+
+def _id3v2_size(data: bytes) -> int:
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = 0
+    for b in data[6:10]:
+        size = (size << 7) | (b & 0x7F)
+    # フッタ付き（v2.4）のタグはさらに10バイト
+    return 10 + size + (10 if data[5] & 0x10 else 0)
+
+
+def _read_info_tag(frame: bytes, header: FrameHeader) -> Optional[Tuple[int, int]]:
+    """Read the encoder delay and padding from a Xing/Info frame, or None if the frame carries audio."""
+    offset = 4 + header.side_info
+    if frame[offset : offset + 4] not in (b"Xing", b"Info"):
+        return None
+    flags = struct.unpack(">I", frame[offset + 4 : offset + 8])[0]
+    pos = offset + 8 + (4 if flags & 1 else 0) + (4 if flags & 2 else 0) + (100 if flags & 4 else 0) + (4 if flags & 8 else 0)
+    # LAME拡張: エンコーダ名9バイト、…、21バイト目からdelay(12bit)とpadding(12bit)
+    if frame[pos : pos + 4] in ENCODER_TAGS and len(frame) >= pos + 24:
+        d = frame[pos + 21 : pos + 24]
+        return (d[0] << 4) | (d[1] >> 4), ((d[1] & 0x0F) << 8) | d[2]
+    return 0, 0
+
+
+def read_mp3_segment(path: str) -> Optional[Mp3Segment]:
+    """
+    Locate the audio frames of an MP3 file, skipping ID3/APE tags and the Xing/Info frame.
+
+    Args:
+        path: MP3 file
+
+    Returns:
+        Mp3Segment, or None if the file has no Layer III frames of a single format
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    pos = _id3v2_size(data)
+    end = len(data) - (128 if data[-128:-125] == b"TAG" else 0)
+    header = None
+    start = pos
+    frame_ends = []
+    delay = padding = 0
+    while pos + 4 <= end:
+        frame_header = parse_frame_header(data[pos : pos + 4])
+        if frame_header is None or pos + frame_header.size > end:
+            # APEタグなど、フレーム以外のデータで終わる
+            break
+        if header is None:
+            info = _read_info_tag(data[pos : pos + frame_header.size], frame_header)
+            if info is not None:
+                delay, padding = info
+                pos += frame_header.size
+                start = pos
+                continue
+            header = frame_header
+        elif frame_header.format != header.format:
+            logger.info(f"MP3 format changes within {path}")
+            return None
+        pos += frame_header.size
+        frame_ends.append(pos)
+    if header is None:
+        return None
+    return Mp3Segment(data, header, start, frame_ends, delay, padding)
+
+
+def _crc16(data: bytes) -> int:
+    """CRC-16 (polynomial 0x8005, reflected) used by the LAME tag."""
+    crc = 0
+    for b in data:
+        crc ^= b
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+def _info_frame(first_frame: bytes, header: FrameHeader, frame_count: int, byte_count: int, delay: int, padding: int) -> bytes:
+    """Build a CBR Info frame with a LAME tag carrying the gapless delay and padding of the whole file."""
+    frame_header = bytearray(first_frame[:4])
+    frame_header[1] |= 0x01  # CRCなし
+    frame_header[2] &= ~0x02 & 0xFF  # パディングなし
+    size = header.size - header.padding
+    frame = bytearray(size)
+    frame[:4] = frame_header
+    offset = 4 + header.side_info
+    frame[offset : offset + 4] = b"Info"
+    struct.pack_into(">III", frame, offset + 4, 0x03, frame_count, byte_count + size)
+    lame = offset + 16
+    if size >= lame + 36:
+        frame[lame : lame + 9] = b"LAME3.100"
+        delay, padding = min(delay, 0xFFF), min(padding, 0xFFF)
+        frame[lame + 21 : lame + 24] = bytes([delay >> 4, ((delay & 0x0F) << 4) | (padding >> 8), padding & 0xFF])
+        struct.pack_into(">H", frame, lame + 34, _crc16(bytes(frame[: lame + 34])))
+    return bytes(frame)
+
+
+def _id3_frame(frame_id: bytes, body: bytes) -> bytes:
+    return frame_id + struct.pack(">I", len(body)) + b"\x00\x00" + body
+
+
+def _id3_chapter_tag(chapters: List[Dict[str, Any]]) -> bytes:
+    """Build an ID3v2.3 tag with a table of contents (CTOC) and one CHAP frame per chapter."""
+    ids = [f"chp{i}".encode("ascii") for i in range(len(chapters))]
+    toc_ids = ids[:255]
+    frames = _id3_frame(b"CTOC", b"toc\x00" + bytes([0x03, len(toc_ids)]) + b"".join(i + b"\x00" for i in toc_ids))
+    for element_id, chapter in zip(ids, chapters):
+        title = f"{chapter['index']} {chapter['title']}".strip()
+        # ID3v2.3はUTF-8を扱えないのでUTF-16（BOM付き）で書く
+        tit2 = _id3_frame(b"TIT2", b"\x01\xff\xfe" + title.encode("utf-16-le") + b"\x00\x00")
+        times = struct.pack(">IIII", chapter["start_ms"], chapter["end_ms"], 0xFFFFFFFF, 0xFFFFFFFF)
+        frames += _id3_frame(b"CHAP", element_id + b"\x00" + times + tit2)
+    size = len(frames)
+    syncsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    return b"ID3\x03\x00\x00" + syncsafe + frames
+
+
+def concatenate_mp3_files(
+    mp3_files: List[str], output_file: str, chapters: Optional[List[Dict[str, Any]]] = None
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Concatenate MP3 files encoded with identical settings by copying their frames, without re-encoding.
+
+    Per-file tags and Info frames are dropped and a single Info frame is
+    written with the encoder delay of the first file and the padding of the
+    last one, so players that support gapless playback trim both ends of the
+    file. The seams are not gapless: at each seam, trailing frames that hold
+    only encoder padding are dropped (every file starts with a fresh bit
+    reservoir, so no frame refers to data of a dropped one), but the next
+    file's encoder delay cannot be cut without re-encoding, because its
+    first frames carry the start of the audio. A seam therefore keeps that
+    delay plus less than one frame of padding (about 50-70 ms at 24 kHz),
+    which the chapter positions account for. Chapters are written as ID3
+    CHAP frames.
+
+    Args:
+        mp3_files: MP3 files to concatenate
+        output_file: Path of the concatenated MP3 file
+        chapters: Optional chapter info per file ('index' and 'title' keys)
+
+    Returns:
+        Chapters with start/end positions in samples and milliseconds, or
+        None if the inputs are not Layer III files with identical formats
+    """
+    segments = []
+    for path in mp3_files:
+        segment = read_mp3_segment(path)
+        if segment is None or (segments and segment.header.format != segments[0].header.format):
+            logger.info(f"Cannot concatenate MP3 frames: {path}")
+            return None
+        segments.append(segment)
+
+    first = segments[0]
+    frame_samples = first.header.samples
+    sample_rate = first.header.sample_rate
+    parts = []
+    result = []
+    position = 0
+    for i, segment in enumerate(segments):
+        frame_ends = segment.frame_ends
+        padding = segment.padding
+        if i < len(segments) - 1:
+            drop = min(padding // frame_samples, len(frame_ends) - 1)
+            frame_ends = frame_ends[: len(frame_ends) - drop]
+            padding -= drop * frame_samples
+        parts.append((segment.data, segment.start, frame_ends[-1], padding))
+
+        # 位置は先頭のエンコーダ遅延を除いた再生時間上のサンプル数
+        start = max(0, position + segment.delay - first.delay)
+        position += len(frame_ends) * frame_samples
+        end = max(start, position - padding - first.delay)
+        meta = chapters[i] if chapters else {"index": str(i), "title": ""}
+        result.append(
+            {
+                "index": meta["index"],
+                "title": meta["title"],
+                "start_sample": start,
+                "end_sample": end,
+                "start_ms": start * 1000 // sample_rate,
+                "end_ms": end * 1000 // sample_rate,
+            }
+        )
+
+    frame_count = position // frame_samples
+    byte_count = sum(end - start for _, start, end, _ in parts)
+    with open(output_file, "wb") as out:
+        if chapters:
+            out.write(_id3_chapter_tag(result))
+        first_frame = first.data[first.start : first.start + 4]
+        out.write(_info_frame(first_frame, first.header, frame_count, byte_count, first.delay, parts[-1][3]))
+        for data, start, end, _ in parts:
+            out.write(data[start:end])
+
+    logger.info(f"Concatenated {len(mp3_files)} MP3 files without re-encoding: {output_file}")
+    return result
+
+
+def encode_mp3_segment(wav_file: str, mp3_file: str, bitrate: str = "64k") -> str:
+    """
+    Encode an audio segment to constant-bitrate MP3 (runs in a worker process).
+
+    Args:
+        wav_file: Source audio file
+        mp3_file: Path of the MP3 file
+        bitrate: Constant bitrate passed to the encoder
+
+    Returns:
+        Path of the MP3 file
+    """
+    AudioSegment.from_file(wav_file).export(mp3_file, format="mp3", bitrate=bitrate)
+    return mp3_file
+
+
+def encode_pool() -> ProcessPoolExecutor:
+    """Get the process pool shared by all jobs for segment encoding (ENCODE_WORKERS, default: CPU count)."""
+    global _encode_pool
+    with _encode_pool_lock:
+        if _encode_pool is None:
+            workers = int(os.environ.get("ENCODE_WORKERS", "0")) or os.cpu_count()
+            # APIサーバーはスレッド（to_threadのワーカーなど）を抱えているので、forkではなくspawnで起動する
+            _encode_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _encode_pool
@@ -3,12 +3,19 @@ import logging
 import mimetypes
 import os
 import struct
-from typing import Any, Dict, List
+import threading
+from typing import Any, Dict, List, Optional
 
 from google import genai
 from google.genai import types
 from pydub import AudioSegment
 
+from app.utils.mp3 import concatenate_mp3_files
+from app.utils.records import Chunk, Script, Segment
+from app.utils.script_validator import InvalidScript, generate_valid_script
+from app.utils.tracing import trace_span
+from app.utils.wav import concatenate_wav_files
+
 PODCAST_SCRIPT_PROMPT = """
 エンジニアの中島聡さんのメルマガ「週刊Life is beautiful」からポッドキャスト用の台本を作成したいです。
 以下のルールに従ってPodCast用の台本を生成してください 
@@ -215,30 +222,35 @@ class PodcastGenerator:
         
         return chunks
 
-    def generate_script(self, chunk: Dict[str, Any]) -> str:
+    def generate_script(self, chunk: Chunk) -> str:
         """
         Generate a podcast script from a markdown chunk.
 
         Args:
-            chunk: Dictionary with 'index' and 'content' keys
+            chunk: Chunk to talk about
 
         Returns:
             Generated podcast script
         """
-        prompt = PODCAST_SCRIPT_PROMPT.format(index=chunk["index"], content=chunk["content"])
-        logger.info(f"Generating script for chunk index: {chunk['index']}")
+        prompt = PODCAST_SCRIPT_PROMPT.format(index=chunk.index, content=chunk.content)
+        logger.info(f"Generating script for chunk index: {chunk.index}")
         model = "gemini-2.5-flash-preview-05-20"
-        response = self.client.models.generate_content(model=model, contents=[types.Content(parts=[types.Part(text=prompt)])])
-        logger.info(f"Script generated for chunk index: {chunk['index']}")
+        with trace_span("generate_content", "api", model=model, prompt_bytes=len(prompt.encode("utf-8"))) as span:
+            response = self.client.models.generate_content(
+                model=model, contents=[types.Content(parts=[types.Part(text=prompt)])]
+            )
+            span.set(response_bytes=len((response.text or "").encode("utf-8")))
+        logger.info(f"Script generated for chunk index: {chunk.index}")
         return response.text
 
-    def generate_audio(self, script: str, output_file: str) -> str:
+    def generate_audio(self, script: str, output_file: str, cancel_event: Optional[threading.Event] = None) -> str:
         """
         Generate audio from a podcast script using Gemini TTS.
 
         Args:
             script: The podcast script
             output_file: Path to save the audio file
+            cancel_event: When set, stop reading the response stream and return None
 
         Returns:
             Path to the generated audio file
@@ -285,26 +297,37 @@ class PodcastGenerator:
         )
 
         logger.info("Generating audio for podcast script")
-        for chunk in self.client.models.generate_content_stream(
-            model=model, contents=contents, config=generate_content_config
-        ):
-            if chunk.candidates is None or chunk.candidates[0].content is None or chunk.candidates[0].content.parts is None:
-                continue
-
-            if chunk.candidates[0].content.parts[0].inline_data:
-                inline_data = chunk.candidates[0].content.parts[0].inline_data
-                data_buffer = inline_data.data
-                file_extension = mimetypes.guess_extension(inline_data.mime_type)
-
-                if file_extension is None:
-                    file_extension = ".wav"
-                    data_buffer = convert_to_wav(inline_data.data, inline_data.mime_type)
-
-                save_binary_file(f"{output_file}{file_extension}", data_buffer)
-                logger.info(f"Audio file generated: {output_file}{file_extension}")
-                return f"{output_file}{file_extension}"
-            else:
-                logger.info(f"Text chunk: {chunk.text}")
+        with trace_span("generate_content_stream", "api", model=model, prompt_bytes=len(prompt.encode("utf-8"))) as span:
+            for chunk in self.client.models.generate_content_stream(
+                model=model, contents=contents, config=generate_content_config
+            ):
+                if cancel_event is not None and cancel_event.is_set():
+                    logger.info("Audio generation cancelled")
+                    span.set(cancelled=True)
+                    return None
+
+                if (
+                    chunk.candidates is None
+                    or chunk.candidates[0].content is None
+                    or chunk.candidates[0].content.parts is None
+                ):
+                    continue
+
+                if chunk.candidates[0].content.parts[0].inline_data:
+                    inline_data = chunk.candidates[0].content.parts[0].inline_data
+                    data_buffer = inline_data.data
+                    file_extension = mimetypes.guess_extension(inline_data.mime_type)
+
+                    if file_extension is None:
+                        file_extension = ".wav"
+                        data_buffer = convert_to_wav(inline_data.data, inline_data.mime_type)
+
+                    span.set(audio_bytes=len(data_buffer))
+                    save_binary_file(f"{output_file}{file_extension}", data_buffer)
+                    logger.info(f"Audio file generated: {output_file}{file_extension}")
+                    return f"{output_file}{file_extension}"
+                else:
+                    logger.info(f"Text chunk: {chunk.text}")
 
         logger.error("Audio generation failed: No audio data returned")
         return None
@@ -324,23 +347,101 @@ class PodcastGenerator:
             logger.error("No audio files provided for concatenation")
             return None
 
+        self.concatenate_with_chapters(audio_files, output_file)
+        return output_file
+
+    def concatenate_with_chapters(
+        self, audio_files: List[str], output_file: str, chapters: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Concatenate audio files into one WAV file and compute a chapter per input file.
+
+        PCM WAV inputs (what Gemini TTS returns) are joined by copying samples,
+        and the chapters are embedded as cue points; other formats are decoded
+        with pydub.
+
+        Args:
+            audio_files: List of audio file paths
+            output_file: Path to save the concatenated audio file
+            chapters: Optional chapter info per file ('index' and 'title' keys)
+
+        Returns:
+            Chapters with start/end positions in samples and milliseconds
+        """
         logger.info(f"Concatenating {len(audio_files)} audio files")
-        combined = AudioSegment.from_file(audio_files[0])
+        with trace_span("concatenate_audio", "audio", file_count=len(audio_files)) as span:
+            result = concatenate_wav_files(audio_files, output_file, chapters)
+            span.set(decoded=result is None)
+            if result is None:
+                result = self._concatenate_decoded(audio_files, output_file, chapters)
+            span.set(output_bytes=os.path.getsize(output_file))
+        logger.info(f"Concatenated audio file saved: {output_file}")
+        return result
 
-        for audio_file in audio_files[1:]:
-            sound = AudioSegment.from_file(audio_file)
-            combined += sound
+    def concatenate_mp3_with_chapters(
+        self, mp3_files: List[str], output_file: str, chapters: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Concatenate MP3 segments into one MP3 file and compute a chapter per segment.
 
-        combined.export(output_file, format="wav")
+        Segments encoded with identical settings are joined frame by frame
+        with the chapters written as ID3 CHAP frames; otherwise they are
+        decoded and re-encoded with pydub.
+
+        Args:
+            mp3_files: List of MP3 segment paths
+            output_file: Path to save the concatenated MP3 file
+            chapters: Optional chapter info per file ('index' and 'title' keys)
+
+        Returns:
+            Chapters with start/end positions in samples and milliseconds
+        """
+        logger.info(f"Concatenating {len(mp3_files)} MP3 segments")
+        with trace_span("concatenate_audio", "audio", file_count=len(mp3_files), format="mp3") as span:
+            result = concatenate_mp3_files(mp3_files, output_file, chapters)
+            span.set(decoded=result is None)
+            if result is None:
+                result = self._concatenate_decoded(mp3_files, output_file, chapters, format="mp3")
+            span.set(output_bytes=os.path.getsize(output_file))
         logger.info(f"Concatenated audio file saved: {output_file}")
-        return output_file
+        return result
+
+    def _concatenate_decoded(
+        self, audio_files: List[str], output_file: str, chapters: Optional[List[Dict[str, Any]]], format: str = "wav"
+    ) -> List[Dict[str, Any]]:
+        combined = None
+        result = []
+        position = 0
+        for i, audio_file in enumerate(audio_files):
+            sound = AudioSegment.from_file(audio_file)
+            if combined is None:
+                combined = sound
+            else:
+                sound = sound.set_frame_rate(combined.frame_rate)
+                combined += sound
+            frames = int(sound.frame_count())
+            meta = chapters[i] if chapters else {"index": str(i), "title": ""}
+            result.append(
+                {
+                    "index": meta["index"],
+                    "title": meta["title"],
+                    "start_sample": position,
+                    "end_sample": position + frames,
+                    "start_ms": position * 1000 // combined.frame_rate,
+                    "end_ms": (position + frames) * 1000 // combined.frame_rate,
+                }
+            )
+            position += frames
 
-    def process_markdown_chunks(self, chunks: List[Dict[str, Any]]) -> str:
+        combined.export(output_file, format=format)
+        return result
+
+    def process_markdown_chunks(self, chunks: List[Chunk]) -> str:
         """
         Process markdown chunks to generate a complete podcast.
 
         Args:
-            chunks: List of dictionaries with 'index' and 'content' keys
+            chunks: Chunks in programme order
 
         Returns:
             Path to the final podcast file
@@ -354,50 +455,37 @@ class PodcastGenerator:
         os.makedirs(final_audio_dir, exist_ok=True)
 
         # スクリプト生成も並列でやる！
-        def script_task(args):
-            i, chunk = args
-            script = self.generate_script(chunk)
-            
-            # スクリプトを分割
-            script_chunks = self.split_script(script)
-            
-            # 分割されたスクリプトをファイル保存
-            saved_scripts = []
-            for j, script_chunk in enumerate(script_chunks):
-                if len(script_chunks) == 1:
-                    script_file = os.path.join(scripts_dir, f"chunk_{i}.txt")
-                else:
-                    script_file = os.path.join(scripts_dir, f"chunk_{i}_{j+1}.txt")
-                    
-                with open(script_file, "w", encoding="utf-8") as f:
-                    f.write(script_chunk)
-                saved_scripts.append((f"{i}_{j+1}" if len(script_chunks) > 1 else str(i), script_chunk))
-            
-            return saved_scripts
+        def script_task(chunk: Chunk) -> List[Script]:
+            # 話者ラベルなどを修復し、使えない台本はTTSの前に再生成する
+            try:
+                script = generate_valid_script(lambda: self.generate_script(chunk))
+            except InvalidScript as e:
+                # 音声を生成できなかったチャンクと同じく、このチャンクだけ飛ばす
+                logger.warning(f"Skipping chunk {chunk.index}: {e}")
+                return []
+
+            # スクリプトを分割してファイル保存
+            parts = self.split_script(script)
+            scripts = [Script(chunk.ordinal, j + 1 if len(parts) > 1 else 0, part) for j, part in enumerate(parts)]
+            for script in scripts:
+                with open(os.path.join(scripts_dir, f"{script.name}.txt"), "w", encoding="utf-8") as f:
+                    f.write(script.text)
+            return scripts
 
         with concurrent.futures.ThreadPoolExecutor() as executor:
-            script_results = list(executor.map(script_task, [(i, chunk) for i, chunk in enumerate(chunks)]))
-        
-        # フラットな結果リストに変換
-        all_scripts = []
-        for result_list in script_results:
-            all_scripts.extend(result_list)
-        
-        # インデックス順に並べ直す
-        all_scripts.sort(key=lambda x: x[0])
-        scripts = [s for _, s in all_scripts]
+            script_results = list(executor.map(script_task, chunks))
+
+        # executor.mapはチャンクの順に結果を返すので、並べ直さずにつなげるだけで(ordinal, part)順になる
+        scripts = [script for result in script_results for script in result]
 
         # TTS（音声生成）も並列でやる！
-        def tts_task(args):
-            index, script = args
-            temp_file = os.path.join(audio_chunks_dir, f"chunk_{index}")
-            return (index, self.generate_audio(script, temp_file))
+        def tts_task(script: Script) -> Segment:
+            temp_file = os.path.join(audio_chunks_dir, script.name)
+            return Segment(script.ordinal, script.part, self.generate_audio(script.text, temp_file))
 
         with concurrent.futures.ThreadPoolExecutor() as executor:
-            audio_results = list(executor.map(tts_task, [(all_scripts[i][0], scripts[i]) for i in range(len(scripts))]))
-        # インデックス順に並べ直す
-        audio_results.sort(key=lambda x: x[0])
-        audio_files = [f for _, f in audio_results if f]
+            segments = list(executor.map(tts_task, scripts))
+        audio_files = [segment.audio_file for segment in segments if segment.audio_file]
 
         if audio_files:
             final_podcast = os.path.join(final_audio_dir, "final_podcast.wav")
@@ -0,0 +1,83 @@
+from typing import Optional, Tuple
+
+
+class _Record:
+    """
+    Base of the small pipeline records.
+
+    Records use __slots__ so a job with hundreds of chunks does not carry a
+    dict per chunk.
+    """
+
+    __slots__ = ()
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class Chunk(_Record):
+    """A markdown chunk of a newsletter, in programme order."""
+
+    __slots__ = ("ordinal", "index", "content")
+
+    def __init__(self, ordinal: int, index: str, content: str):
+        """
+        Args:
+            ordinal: Position in the programme (0 for the START chunk)
+            index: Label used in the prompt and chapters ("START", "1", ..., "END")
+            content: Chunk markdown
+        """
+        self.ordinal = ordinal
+        self.index = index
+        self.content = content
+
+
+class Script(_Record):
+    """One TTS-sized part of the script generated for a chunk."""
+
+    __slots__ = ("ordinal", "part", "text")
+
+    def __init__(self, ordinal: int, part: int, text: str):
+        """
+        Args:
+            ordinal: Ordinal of the chunk the script belongs to
+            part: Part number when the script was split for TTS (1-based; 0 if not split)
+            text: Script text
+        """
+        self.ordinal = ordinal
+        self.part = part
+        self.text = text
+
+    @property
+    def order(self) -> Tuple[int, int]:
+        return (self.ordinal, self.part)
+
+    @property
+    def name(self) -> str:
+        """File name stem, e.g. "chunk_3" or "chunk_3_2"."""
+        return f"chunk_{self.ordinal}" if self.part == 0 else f"chunk_{self.ordinal}_{self.part}"
+
+
+class Segment(_Record):
+    """Audio generated for a chunk (or one part of its script)."""
+
+    __slots__ = ("ordinal", "part", "audio_file")
+
+    def __init__(self, ordinal: int, part: int, audio_file: Optional[str]):
+        """
+        Args:
+            ordinal: Ordinal of the chunk
+            part: Part number of the script (0 if not split)
+            audio_file: Generated audio file, or None if TTS failed
+        """
+        self.ordinal = ordinal
+        self.part = part
+        self.audio_file = audio_file
+
+    @property
+    def order(self) -> Tuple[int, int]:
+        return (self.ordinal, self.part)
@@ -0,0 +1,193 @@
+import asyncio
+import contextvars
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+from app.utils.job_registry import JobCancelled
+
+logger = logging.getLogger(__name__)
+
+
+class _Task:
+    __slots__ = ("job_id", "fn", "args", "future", "context")
+
+    def __init__(self, job_id: str, fn: Callable[..., Any], args: tuple, future: asyncio.Future):
+        self.job_id = job_id
+        self.fn = fn
+        self.args = args
+        self.future = future
+        self.context = contextvars.copy_context()
+
+
+class ChunkScheduler:
+    """
+    Runs blocking Gemini calls with bounded concurrency shared by all jobs.
+
+    Each job has its own FIFO queue. When a slot frees up the next job is chosen
+    by smooth weighted round robin, so one large newsletter cannot monopolize
+    the slots, and a job's priority is its weight. Tasks submitted with
+    preview=True go to a separate lane that is always served first.
+    """
+
+    def __init__(self, max_concurrency: int = 4):
+        """
+        Args:
+            max_concurrency: Maximum number of calls running at once
+        """
+        self.max_concurrency = max_concurrency
+        self._queues: "OrderedDict[str, Deque[_Task]]" = OrderedDict()
+        self._preview: Deque[_Task] = deque()
+        self._weights: Dict[str, int] = {}
+        self._current: Dict[str, int] = {}
+        self._cancelled: set = set()
+        self._running = 0
+        # 借りたスロット（ヘッジ）はワーカースレッドから増減するのでロックで守る
+        self._slot_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def set_priority(self, job_id: str, priority: int) -> None:
+        """
+        Set the weight of a job in the round robin.
+
+        Args:
+            job_id: Job ID
+            priority: Relative share of slots (1 = normal)
+        """
+        self._weights[job_id] = max(1, priority)
+
+    async def run(self, job_id: str, fn: Callable[..., Any], *args: Any, preview: bool = False) -> Any:
+        """
+        Queue a blocking call and wait for its result.
+
+        The call runs in a worker thread with the caller's context variables.
+
+        Args:
+            job_id: Job the call belongs to
+            fn: Blocking function to call
+            *args: Arguments for fn
+            preview: Serve the call before all non-preview work
+
+        Returns:
+            The return value of fn
+
+        Raises:
+            JobCancelled: If the job was cancelled before the call started
+        """
+        if job_id in self._cancelled:
+            raise JobCancelled(f"Job {job_id} was cancelled")
+        self._loop = asyncio.get_running_loop()
+        task = _Task(job_id, fn, args, asyncio.get_running_loop().create_future())
+        if preview:
+            self._preview.append(task)
+        else:
+            self._queues.setdefault(job_id, deque()).append(task)
+        self._dispatch()
+        return await task.future
+
+    def try_borrow(self) -> bool:
+        """
+        Take an idle slot for a call made outside the queues, e.g. a hedged request.
+
+        Thread-safe. The slot is only lent when no queued call is waiting for it,
+        so borrowed calls never delay queued work or exceed max_concurrency.
+
+        Returns:
+            True if a slot was taken; it must be returned with give_back()
+        """
+        with self._slot_lock:
+            if self._loop is None or self._running >= self.max_concurrency or self._preview or self._queues:
+                return False
+            self._running += 1
+            return True
+
+    def give_back(self) -> None:
+        """Return a slot taken with try_borrow(). Thread-safe."""
+        with self._slot_lock:
+            self._running -= 1
+        self._loop.call_soon_threadsafe(self._dispatch)
+
+    def cancel_job(self, job_id: str) -> int:
+        """
+        Drop the queued calls of a job and reject new ones.
+
+        Calls already running are left to finish.
+
+        Args:
+            job_id: Job ID
+
+        Returns:
+            Number of queued calls dropped
+        """
+        self._cancelled.add(job_id)
+        dropped = [t for t in self._queues.pop(job_id, ())] + [t for t in self._preview if t.job_id == job_id]
+        self._preview = deque(t for t in self._preview if t.job_id != job_id)
+        self._current.pop(job_id, None)
+        for task in dropped:
+            if not task.future.done():
+                task.future.set_exception(JobCancelled(f"Job {job_id} was cancelled"))
+        if dropped:
+            logger.info(f"[Job {job_id}] Dropped {len(dropped)} queued calls")
+        return len(dropped)
+
+    def remove_job(self, job_id: str) -> None:
+        """Forget a finished job, dropping anything it left queued."""
+        self.cancel_job(job_id)
+        self._cancelled.discard(job_id)
+        self._weights.pop(job_id, None)
+
+    def _next_task(self) -> Optional[_Task]:
+        while self._preview:
+            task = self._preview.popleft()
+            if not task.future.done():
+                return task
+
+        while self._queues:
+            # Smooth weighted round robin (as in nginx upstream balancing)
+            total = 0
+            chosen = None
+            for job_id in self._queues:
+                weight = self._weights.get(job_id, 1)
+                self._current[job_id] = self._current.get(job_id, 0) + weight
+                total += weight
+                if chosen is None or self._current[job_id] > self._current[chosen]:
+                    chosen = job_id
+            self._current[chosen] -= total
+
+            queue = self._queues[chosen]
+            task = queue.popleft()
+            if not queue:
+                del self._queues[chosen]
+                self._current.pop(chosen, None)
+            if not task.future.done():
+                return task
+        return None
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._slot_lock:
+                if self._running >= self.max_concurrency:
+                    return
+                task = self._next_task()
+                if task is None:
+                    return
+                self._running += 1
+            asyncio.get_running_loop().create_task(self._execute(task), context=task.context)
+
+    async def _execute(self, task: _Task) -> None:
+        try:
+            result = await asyncio.to_thread(task.fn, *task.args)
+            if not task.future.done():
+                task.future.set_result(result)
+        except Exception as e:
+            if not task.future.done():
+                task.future.set_exception(e)
+        finally:
+            with self._slot_lock:
+                self._running -= 1
+            self._dispatch()
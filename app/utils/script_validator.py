@@ -0,0 +1,178 @@
+import logging
+import re
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from app.utils.tracing import trace_span
+
+logger = logging.getLogger(__name__)
+
+SPEAKERS = ("Minami", "Nakajima")
+
+# モデルが出力しがちな表記ゆれ（小文字化して照合する）
+SPEAKER_ALIASES = {
+    "minami": "Minami",
+    "ミナミ": "Minami",
+    "みなみ": "Minami",
+    "南": "Minami",
+    "アナウンサー": "Minami",
+    "nakajima": "Nakajima",
+    "ナカジマ": "Nakajima",
+    "なかじま": "Nakajima",
+    "中島": "Nakajima",
+    "中島聡": "Nakajima",
+    "中島さん": "Nakajima",
+    "中島聡さん": "Nakajima",
+}
+
+# 行頭の話者ラベル（"Minami:"、"**Minami**:"、"**Minami:**"、"Minami（アナウンサー）:"、全角コロンなど）
+SPEAKER_LABEL_PATTERN = re.compile(
+    r"^\s*(?:[-*]\s+)?\**\s*([^\s:：*\[\]（(]{1,20}(?: \d+)?)\s*(?:[（(][^）)]*[）)])?\s*\**\s*[:：]\s*\**\s*(.*)$"
+)
+# 台本本文の「ポイント：」などと区別するため、未知の話者として扱うのは英字のラベル（Host:、Speaker 1: など）だけ
+UNKNOWN_SPEAKER_PATTERN = re.compile(r"^[A-Za-z][A-Za-z0-9_.-]*(?: \d+)?$")
+FENCE_PATTERN = re.compile(r"^\s*(```|~~~)")
+HEADING_PATTERN = re.compile(r"^\s*#{1,6}\s")
+
+DEFAULT_MAX_CHARS = 8000
+
+
+class InvalidScript(ValueError):
+    """A script could not be repaired and kept failing validation."""
+
+
+class ScriptValidation(NamedTuple):
+    """Outcome of validating one script."""
+
+    script: str  # 修復後の台本
+    problems: List[str]  # 再生成が必要な問題（empty, oversized, unknown_speaker:<label>）
+    repairs: List[str]  # 自動修復した内容（speaker_label, fence, heading）
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+
+def normalize_speaker(label: str) -> Optional[str]:
+    """Map a speaker label to Minami/Nakajima, or None if it is not one of them."""
+    label = label.strip()
+    if label in SPEAKERS:
+        return label
+    return SPEAKER_ALIASES.get(label.lower())
+
+
+def validate_script(script: Optional[str], max_chars: int = DEFAULT_MAX_CHARS) -> ScriptValidation:
+    """
+    Repair what can be fixed locally in a script and report what cannot.
+
+    Markdown fences and headings are dropped and speaker labels are normalized
+    to "Minami:" / "Nakajima:". Scripts that end up empty, exceed max_chars or
+    contain other speakers are reported as problems, since sending them to TTS
+    produces unusable audio.
+
+    Args:
+        script: Script returned by the model
+        max_chars: Maximum length of a script sent to TTS
+
+    Returns:
+        ScriptValidation with the repaired script
+    """
+    problems: List[str] = []
+    repairs: List[str] = []
+    lines = []
+    has_dialogue = False
+    for line in (script or "").splitlines():
+        if FENCE_PATTERN.match(line):
+            repairs.append("fence")
+            continue
+        if HEADING_PATTERN.match(line):
+            repairs.append("heading")
+            continue
+        match = SPEAKER_LABEL_PATTERN.match(line)
+        if match and not match.group(1).lower().startswith("http"):
+            label, text = match.groups()
+            speaker = normalize_speaker(label)
+            if speaker is None:
+                if UNKNOWN_SPEAKER_PATTERN.match(label):
+                    problems.append(f"unknown_speaker:{label}")
+            else:
+                normalized = f"{speaker}: {text.rstrip('*').strip()}"
+                if normalized != line.rstrip():
+                    repairs.append("speaker_label")
+                line = normalized
+                has_dialogue = True
+        lines.append(line.rstrip())
+
+    repaired = "\n".join(lines).strip()
+    if not has_dialogue:
+        problems.append("empty")
+    elif len(repaired) > max_chars:
+        problems.append("oversized")
+    return ScriptValidation(repaired, list(dict.fromkeys(problems)), list(dict.fromkeys(repairs)))
+
+
+class ValidationStats:
+    """Thread-safe counters of script validation outcomes."""
+
+    FIELDS = ("valid", "repaired", "rejected", "failed")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {name: 0 for name in self.FIELDS}
+
+    def increment(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def as_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+def generate_valid_script(
+    generate: Callable[[], Optional[str]],
+    stats: Optional[ValidationStats] = None,
+    max_attempts: int = 3,
+    max_chars: int = DEFAULT_MAX_CHARS,
+) -> str:
+    """
+    Generate a script and re-request it until it passes validation.
+
+    Counters: "valid" and "repaired" count accepted scripts (repaired when a
+    local fix was applied), "rejected" counts re-requested scripts and
+    "failed" counts scripts that were still invalid after max_attempts.
+    Each request is traced as a "script_attempt" span with its attempt number,
+    its problems and, for re-requests, the problems that caused them.
+
+    Args:
+        generate: Function that requests one script from the model
+        stats: Counters to update
+        max_attempts: Maximum number of script requests
+        max_chars: Maximum length of a script sent to TTS
+
+    Returns:
+        Validated (and possibly repaired) script
+
+    Raises:
+        InvalidScript: If no valid script was produced within max_attempts
+    """
+    stats = stats or ValidationStats()
+    reason: List[str] = []
+    for attempt in range(1, max_attempts + 1):
+        # トレースで再生成とその理由（前の台本の問題）が分かるように、1回ごとにスパンを開く
+        with trace_span("script_attempt", "api", attempt=attempt) as span:
+            if reason:
+                span.set(retry_reason=reason)
+            result = validate_script(generate(), max_chars)
+            span.set(problems=result.problems, repairs=result.repairs)
+        reason = result.problems
+        if result.ok:
+            stats.increment("repaired" if result.repairs else "valid")
+            if result.repairs:
+                logger.info(f"Script repaired: {', '.join(result.repairs)}")
+            return result.script
+        if attempt < max_attempts:
+            stats.increment("rejected")
+            logger.warning(f"Script rejected ({', '.join(result.problems)}), re-requesting ({attempt}/{max_attempts})")
+    stats.increment("failed")
+    raise InvalidScript(f"Script still invalid after {max_attempts} attempts: {', '.join(result.problems)}")
@@ -0,0 +1,267 @@
+import logging
+import os
+import shutil
+from contextlib import contextmanager
+from typing import Any, Iterator, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 64 * 1024
+# S3のマルチパートアップロードは最後以外のパートが5MiB以上である必要がある
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class BlobInfo(NamedTuple):
+    """Size and validators of a stored blob."""
+
+    size: int
+    etag: str  # 強いETag（引用符付き）
+    last_modified: float  # UNIX時刻
+
+
+class BlobStorage:
+    """
+    Key-value store for job artifacts (status records, final podcasts, previews).
+
+    Keys are "/"-separated relative paths. Writes and ranged reads are
+    streamed, so no implementation holds a whole file in memory.
+    """
+
+    def open_write(self, key: str):
+        """Context manager yielding a binary writer; the blob appears only when the block exits normally."""
+        raise NotImplementedError
+
+    def iter_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Yield the bytes start..end (inclusive; end None for the rest) of a blob in chunks."""
+        raise NotImplementedError
+
+    def stat(self, key: str) -> Optional[BlobInfo]:
+        """Get the size and validators of a blob, or None if it does not exist."""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        """Delete a blob if it exists."""
+        raise NotImplementedError
+
+    def exists(self, key: Optional[str]) -> bool:
+        return bool(key) and self.stat(key) is not None
+
+    def write_bytes(self, key: str, data: bytes) -> None:
+        with self.open_write(key) as f:
+            f.write(data)
+
+    def read_bytes(self, key: str) -> Optional[bytes]:
+        if not self.exists(key):
+            return None
+        return b"".join(self.iter_range(key))
+
+    def put_file(self, key: str, path: str) -> None:
+        """Stream a local file into the store."""
+        with open(path, "rb") as src, self.open_write(key) as dst:
+            shutil.copyfileobj(src, dst, READ_CHUNK_SIZE)
+
+    def get_file(self, key: str, path: str) -> None:
+        """Stream a blob into a local file."""
+        with open(path, "wb") as dst:
+            for buf in self.iter_range(key):
+                dst.write(buf)
+
+
+class LocalStorage(BlobStorage):
+    """Blob storage on the local filesystem (a single node, or a shared volume)."""
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root: Directory the keys are relative to
+        """
+        self.root = os.path.abspath(root)
+
+    def path(self, key: str) -> str:
+        """Resolve a key to a file path, rejecting keys that escape the root."""
+        path = os.path.abspath(os.path.join(self.root, key))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    @contextmanager
+    def open_write(self, key: str):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 書き込み途中のファイルを読まれないように一時ファイルからリネームする
+        temp_path = f"{path}.{os.urandom(4).hex()}.part"
+        try:
+            with open(temp_path, "wb") as f:
+                yield f
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def iter_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        with open(self.path(key), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                buf = f.read(READ_CHUNK_SIZE if remaining is None else min(READ_CHUNK_SIZE, remaining))
+                if not buf:
+                    break
+                if remaining is not None:
+                    remaining -= len(buf)
+                yield buf
+
+    def stat(self, key: str) -> Optional[BlobInfo]:
+        try:
+            st = os.stat(self.path(key))
+        except (FileNotFoundError, ValueError):
+            return None
+        return BlobInfo(st.st_size, f'"{st.st_size:x}-{st.st_mtime_ns:x}"', st.st_mtime)
+
+    def delete(self, key: str) -> None:
+        path = self.path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class _MultipartWriter:
+    """Buffers at most one part and uploads it with the S3 multipart API."""
+
+    def __init__(self, client: Any, bucket: str, key: str, part_size: int):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.buffer = bytearray()
+        self.upload_id: Optional[str] = None
+        self.parts = []
+
+    def write(self, data: bytes) -> int:
+        self.buffer += data
+        while len(self.buffer) >= self.part_size:
+            self._upload_part(bytes(self.buffer[: self.part_size]))
+            del self.buffer[: self.part_size]
+        return len(data)
+
+    def _upload_part(self, data: bytes) -> None:
+        if self.upload_id is None:
+            self.upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key)["UploadId"]
+        number = len(self.parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, PartNumber=number, Body=data
+        )
+        self.parts.append({"ETag": response["ETag"], "PartNumber": number})
+
+    def close(self) -> None:
+        if self.upload_id is None:
+            # 1パートに満たない小さなファイルは通常のPUTで送る
+            self.client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer))
+            return
+        if self.buffer:
+            self._upload_part(bytes(self.buffer))
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, MultipartUpload={"Parts": self.parts}
+        )
+
+    def abort(self) -> None:
+        if self.upload_id is not None:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+
+def _is_not_found(error: Exception) -> bool:
+    code = getattr(error, "response", {}).get("Error", {}).get("Code")
+    return code in ("404", "NoSuchKey", "NotFound")
+
+
+class S3Storage(BlobStorage):
+    """Blob storage in an S3-compatible object store (AWS S3, MinIO, ...)."""
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        client: Any = None,
+        endpoint_url: Optional[str] = None,
+        part_size: int = 8 * 1024 * 1024,
+    ):
+        """
+        Args:
+            bucket: Bucket name
+            prefix: Prefix prepended to every key
+            client: boto3 S3 client; created from the environment if omitted
+            endpoint_url: Endpoint of an S3-compatible server such as MinIO
+            part_size: Size of the parts of multipart uploads
+        """
+        if client is None:
+            try:
+                import boto3
+            except ImportError as e:
+                raise ImportError("S3 storage requires boto3: pip install boto3") from e
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.part_size = max(part_size, MIN_PART_SIZE)
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    @contextmanager
+    def open_write(self, key: str):
+        writer = _MultipartWriter(self.client, self.bucket, self._key(key), self.part_size)
+        try:
+            yield writer
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+
+    def iter_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        byte_range = f"bytes={start}-{'' if end is None else end}"
+        body = self.client.get_object(Bucket=self.bucket, Key=self._key(key), Range=byte_range)["Body"]
+        try:
+            while True:
+                buf = body.read(READ_CHUNK_SIZE)
+                if not buf:
+                    break
+                yield buf
+        finally:
+            body.close()
+
+    def stat(self, key: str) -> Optional[BlobInfo]:
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except Exception as e:
+            if _is_not_found(e):
+                return None
+            raise
+        etag = head["ETag"] if head["ETag"].startswith('"') else f'"{head["ETag"]}"'
+        return BlobInfo(head["ContentLength"], etag, head["LastModified"].timestamp())
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+
+def storage_from_env(default_root: str) -> BlobStorage:
+    """
+    Create the storage backend selected by the environment.
+
+    STORAGE_BACKEND=s3 uses S3_BUCKET, S3_PREFIX and S3_ENDPOINT_URL (for
+    MinIO and other S3-compatible servers; credentials come from the usual
+    AWS_* variables). Otherwise files are stored under STORAGE_ROOT.
+
+    Args:
+        default_root: Local directory used when STORAGE_ROOT is not set
+
+    Returns:
+        Storage backend
+    """
+    backend = os.environ.get("STORAGE_BACKEND", "local").lower()
+    if backend == "s3":
+        bucket = os.environ.get("S3_BUCKET")
+        if not bucket:
+            raise ValueError("S3_BUCKET must be set when STORAGE_BACKEND=s3")
+        logger.info(f"Using S3 storage: bucket={bucket}")
+        return S3Storage(bucket, prefix=os.environ.get("S3_PREFIX", ""), endpoint_url=os.environ.get("S3_ENDPOINT_URL"))
+    if backend != "local":
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+    return LocalStorage(os.environ.get("STORAGE_ROOT", default_root))
@@ -0,0 +1,156 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List, Optional
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """A single timed section of a job (job, stage, chunk or API call)."""
+
+    def __init__(self, trace: "JobTrace", span_id: int, name: str, category: str, parent_id: Optional[int], lane: int):
+        self.trace = trace
+        self.span_id = span_id
+        self.name = name
+        self.category = category
+        self.parent_id = parent_id
+        self.lane = lane
+        self.args: Dict[str, Any] = {}
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+
+    def set(self, **args: Any) -> None:
+        """Attach extra attributes (payload sizes, results...) to the span."""
+        self.args.update(args)
+
+
+class _NullSpan:
+    """Stand-in returned by trace_span() when no trace is active."""
+
+    def set(self, **args: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class JobTrace:
+    """
+    Collects the span tree of a single podcast generation job.
+
+    Spans are nested through a context variable, so spans opened inside
+    asyncio.to_thread() calls are attached to the span that was active
+    when the thread was started.
+    """
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.wall_start = time.time()
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._spans: List[Span] = []
+        self._lane_names: Dict[int, str] = {0: "job"}
+
+    def name_lane(self, lane: int, name: str) -> None:
+        """Give a display name to a lane (a thread row in trace viewers)."""
+        with self._lock:
+            self._lane_names[lane] = name
+
+    @contextmanager
+    def span(self, name: str, category: str, lane: Optional[int] = None, **args: Any):
+        """
+        Open a span as a child of the currently active span.
+
+        Args:
+            name: Span name
+            category: Span category (job, stage, chunk, api...)
+            lane: Lane to draw the span in. Defaults to the parent's lane.
+            **args: Attributes recorded with the span
+
+        Yields:
+            The opened span
+        """
+        parent = _current_span.get()
+        if parent is not None and parent.trace is not self:
+            parent = None
+        if lane is None:
+            lane = parent.lane if parent else 0
+        with self._lock:
+            span = Span(self, len(self._spans), name, category, parent.span_id if parent else None, lane)
+            self._spans.append(span)
+        span.set(**args)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=repr(e))
+            raise
+        finally:
+            span.end = time.perf_counter()
+            _current_span.reset(token)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """
+        Export the spans in the Chrome trace event format.
+
+        The result can be loaded into chrome://tracing or ui.perfetto.dev.
+        Spans that are still running are exported up to the current time.
+
+        Returns:
+            Trace event JSON object
+        """
+        now = time.perf_counter()
+        with self._lock:
+            spans = list(self._spans)
+            lane_names = dict(self._lane_names)
+
+        events: List[Dict[str, Any]] = [
+            {"name": "process_name", "ph": "M", "pid": 1, "tid": 0, "args": {"name": self.job_id}},
+        ]
+        for lane, lane_name in sorted(lane_names.items()):
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": lane, "args": {"name": lane_name}})
+            events.append({"name": "thread_sort_index", "ph": "M", "pid": 1, "tid": lane, "args": {"sort_index": lane}})
+
+        for span in spans:
+            end = span.end if span.end is not None else now
+            args = dict(span.args, span_id=span.span_id, parent_id=span.parent_id)
+            if span.end is None:
+                args["in_progress"] = True
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": round((span.start - self._origin) * 1_000_000, 3),
+                    "dur": round((end - span.start) * 1_000_000, 3),
+                    "pid": 1,
+                    "tid": span.lane,
+                    "args": args,
+                }
+            )
+
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"job_id": self.job_id, "wall_start": self.wall_start},
+        }
+
+
+def trace_span(name: str, category: str, **args: Any):
+    """
+    Open a span in the active job trace, or do nothing if no trace is active.
+
+    Args:
+        name: Span name
+        category: Span category
+        **args: Attributes recorded with the span
+
+    Returns:
+        Context manager yielding the span (or a no-op span)
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return nullcontext(_NULL_SPAN)
+    return parent.trace.span(name, category, **args)
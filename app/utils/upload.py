@@ -0,0 +1,288 @@
+import asyncio
+import codecs
+import hashlib
+import logging
+import tempfile
+import unicodedata
+from typing import BinaryIO, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 64 * 1024
+# マルチパートの区切りや他のフォーム項目の分として、ファイルの上限に足して許すバイト数
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+# これを超えたアップロードはメモリではなく一時ファイルに置く
+SPOOL_MEMORY_BYTES = 1024 * 1024
+# UTF-8として読めなかったときに試す日本語のエンコーディング（バックナンバーの古い号など）
+FALLBACK_ENCODINGS = ("cp932", "euc_jp", "iso2022_jp")
+BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload exceeds the configured maximum size."""
+
+
+class UnsupportedEncoding(ValueError):
+    """Raised when an upload cannot be decoded with any supported encoding."""
+
+
+class IngestedUpload(NamedTuple):
+    """Decoded and normalized upload."""
+
+    text: str
+    digest: str  # 正規化後のテキストのSHA-256（job_registry.content_hash と同じ値）
+    encoding: str
+    size: int  # アップロードされたバイト数
+
+
+class TextNormalizer:
+    """
+    Incrementally normalizes decoded text and hashes the result.
+
+    Text is emitted line by line so NFKC never sees a split character
+    sequence and a CRLF split across two chunks still becomes one newline.
+    The normalized text is grown in place rather than kept as a list of
+    pieces to join, so only one copy of the text is held in memory.
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._text = ""
+        self._hash = hashlib.sha256()
+
+    def feed(self, text: str) -> None:
+        text = self._pending + text
+        cut = text.rfind("\n") + 1
+        self._pending = text[cut:]
+        if cut:
+            self._emit(text[:cut])
+
+    def _emit(self, text: str) -> None:
+        text = unicodedata.normalize("NFKC", text.replace("\r\n", "\n").replace("\r", "\n"))
+        self._hash.update(text.encode("utf-8"))
+        # CPythonは参照がローカル変数1つだけの文字列への += をその場で伸ばすので、全文のコピーが2つできない
+        normalized = self._text
+        self._text = ""
+        normalized += text
+        self._text = normalized
+
+    def finish(self) -> Tuple[str, str]:
+        """Flush the last line and return the normalized text and its hex digest."""
+        self._emit(self._pending)
+        self._pending = ""
+        text, self._text = self._text, ""
+        return text, self._hash.hexdigest()
+
+
+def _japanese_score(text: str) -> int:
+    """Score how plausible decoded text is as Japanese (mis-decoded bytes tend to give half-width kana)."""
+    score = 0
+    for ch in text:
+        code = ord(ch)
+        if 0x3040 <= code <= 0x309F:  # ひらがな
+            score += 3
+        elif 0x30A0 <= code <= 0x30FF or 0x4E00 <= code <= 0x9FFF or 0x3000 <= code <= 0x303F:
+            score += 1
+        elif 0xFF61 <= code <= 0xFF9F or 0xE000 <= code <= 0xF8FF or 0x80 <= code <= 0x9F:  # 半角カナ・私用領域・C1制御文字
+            score -= 3
+    return score
+
+
+def _iter_spool(spool: BinaryIO):
+    spool.seek(0)
+    while True:
+        data = spool.read(READ_CHUNK_SIZE)
+        if not data:
+            break
+        yield data
+
+
+def _decode_spool(spool: BinaryIO, encoding: str, normalizer: Optional[TextNormalizer] = None) -> int:
+    """Decode the spooled bytes, feeding the normalizer; returns the Japanese score or raises UnicodeDecodeError."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    score = 0
+    for data in _iter_spool(spool):
+        text = decoder.decode(data)
+        score += _japanese_score(text)
+        if normalizer is not None:
+            normalizer.feed(text)
+    text = decoder.decode(b"", final=True)
+    if normalizer is not None:
+        normalizer.feed(text)
+    return score + _japanese_score(text)
+
+
+def detect_encoding(spool: BinaryIO) -> str:
+    """
+    Pick the fallback encoding that decodes the spooled bytes as the most plausible Japanese text.
+
+    Args:
+        spool: File holding the raw upload
+
+    Returns:
+        Encoding name
+
+    Raises:
+        UnsupportedEncoding: If no candidate decodes the bytes
+    """
+    best = None
+    for encoding in FALLBACK_ENCODINGS:
+        try:
+            score = _decode_spool(spool, encoding)
+        except UnicodeDecodeError:
+            continue
+        # cp932はほとんどのバイト列を（私用領域などとして）デコードできてしまうので、日本語らしくないものは採らない
+        if score > 0 and (best is None or score > best[0]):
+            best = (score, encoding)
+    if best is None:
+        raise UnsupportedEncoding(f"Could not decode the upload as any of utf-8, {', '.join(FALLBACK_ENCODINGS)}")
+    return best[1]
+
+
+async def ingest_upload(file, max_bytes: int) -> IngestedUpload:
+    """
+    Stream an upload into a spooled temporary file, decode and normalize it.
+
+    The upload is decoded while it is read, as UTF-8 or as the encoding
+    announced by a BOM. When an invalid UTF-8 sequence or an ISO-2022-JP escape
+    shows up, the spooled bytes are decoded again with the detected Japanese
+    encoding. The text is NFKC-normalized with "\\n" line endings and hashed
+    incrementally.
+
+    Args:
+        file: FastAPI UploadFile (anything with an async read(size))
+        max_bytes: Maximum accepted upload size
+
+    Returns:
+        Normalized text, its digest, the detected encoding and the raw size
+
+    Raises:
+        UploadTooLarge: If the upload exceeds max_bytes
+        UnsupportedEncoding: If the upload cannot be decoded
+    """
+    known_size = getattr(file, "size", None)
+    if known_size is not None and known_size > max_bytes:
+        raise UploadTooLarge(f"Upload is {known_size} bytes; the limit is {max_bytes}")
+
+    encoding = "utf-8"
+    decoder = codecs.getincrementaldecoder(encoding)()
+    normalizer = TextNormalizer()
+    streaming = True  # 読みながらデコードできている間はTrue
+    size = 0
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES) as spool:
+        while True:
+            data = await file.read(READ_CHUNK_SIZE)
+            if not data:
+                break
+            if size == 0:
+                encoding = next((name for bom, name in BOMS if data.startswith(bom)), encoding)
+                decoder = codecs.getincrementaldecoder(encoding)()
+            size += len(data)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds the limit of {max_bytes} bytes")
+            spool.write(data)
+            if not streaming:
+                continue
+            if encoding == "utf-8" and (b"\x1b$" in data or b"\x1b(" in data):
+                # ISO-2022-JPは7ビットなのでUTF-8としても読めてしまう
+                streaming = False
+                continue
+            try:
+                normalizer.feed(decoder.decode(data))
+            except UnicodeDecodeError:
+                streaming = False
+
+        if streaming:
+            try:
+                normalizer.feed(decoder.decode(b"", final=True))
+            except UnicodeDecodeError:
+                streaming = False
+        if not streaming:
+            if encoding != "utf-8":
+                # BOMで宣言されたエンコーディングで読めないものは推測しない
+                raise UnsupportedEncoding(f"Upload is not valid {encoding}")
+            encoding = detect_encoding(spool)
+            normalizer = TextNormalizer()
+            _decode_spool(spool, encoding, normalizer)
+            logger.info(f"Decoded upload as {encoding}")
+
+    text, digest = normalizer.finish()
+    return IngestedUpload(text, digest, encoding, size)
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware that caps the size and concurrency of uploads before the body is parsed.
+
+    FastAPI parses the whole multipart body (spooling the file) before the
+    endpoint runs, so the limits are enforced here: a request whose
+    Content-Length is over the limit is refused at once, a body without one is
+    cut off as soon as it grows past the limit, and only as many uploads as
+    the semaphore allows are received at a time. The exact file size is still
+    checked by ingest_upload.
+    """
+
+    def __init__(self, app, path: str, max_bytes: int, semaphore: asyncio.Semaphore):
+        """
+        Args:
+            app: ASGI application
+            path: Path of the upload endpoint
+            max_bytes: Maximum accepted file size (MULTIPART_OVERHEAD_BYTES are allowed on top for the framing)
+            semaphore: Limits the number of uploads being received at once
+        """
+        self.app = app
+        self.path = path
+        self.max_bytes = max_bytes
+        self.semaphore = semaphore
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.max_bytes + MULTIPART_OVERHEAD_BYTES
+        detail = f"Upload exceeds the limit of {self.max_bytes} bytes"
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > limit:
+            logger.error(f"Upload rejected: Content-Length {int(content_length)} is over {limit} bytes")
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    logger.error(f"Upload rejected: body is over {limit} bytes")
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        # 応答を始めた時点（本文は受け取り済み）で枠を返す。バックグラウンドのジョブの間は持たない
+        await self.semaphore.acquire()
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self.semaphore.release()
+
+        async def releasing_send(message) -> None:
+            if message["type"] == "http.response.start":
+                release()
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, releasing_send)
+        finally:
+            release()
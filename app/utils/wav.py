@@ -0,0 +1,164 @@
+import logging
+import struct
+from typing import Any, BinaryIO, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class WavInfo(NamedTuple):
+    """Format and data location of a PCM WAV file."""
+
+    channels: int
+    sample_rate: int
+    bits_per_sample: int
+    data_offset: int
+    data_size: int
+
+    @property
+    def block_align(self) -> int:
+        return self.channels * self.bits_per_sample // 8
+
+    @property
+    def frames(self) -> int:
+        return self.data_size // self.block_align
+
+
+def read_wav_info(f: BinaryIO) -> Optional[WavInfo]:
+    """
+    Read the format and data chunk position of a PCM WAV file without decoding it.
+
+    Args:
+        f: Binary file object positioned at the start of the file
+
+    Returns:
+        WavInfo, or None if the file is not an uncompressed PCM WAV
+    """
+    header = f.read(12)
+    if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        return None
+
+    fmt = None
+    offset = 12
+    while True:
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            return None
+        chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+        offset += 8
+        if chunk_id == b"data":
+            if fmt is None:
+                return None
+            # ストリーミング出力ではdataサイズが不正なことがあるので実サイズで切り詰める
+            file_size = f.seek(0, 2)
+            return WavInfo(*fmt, data_offset=offset, data_size=min(chunk_size, file_size - offset))
+        if chunk_id == b"fmt ":
+            data = f.read(chunk_size)
+            audio_format, channels, sample_rate, _, _, bits_per_sample = struct.unpack("<HHIIHH", data[:16])
+            if audio_format != 1:
+                return None
+            fmt = (channels, sample_rate, bits_per_sample)
+        else:
+            f.seek(chunk_size, 1)
+        # RIFFチャンクは偶数バイト境界に揃えられている
+        if chunk_size & 1:
+            f.seek(1, 1)
+        offset += chunk_size + (chunk_size & 1)
+
+
+def _cue_chunks(chapters: List[Dict[str, Any]]) -> bytes:
+    """Build the "cue " and LIST/adtl chunks that embed chapter markers in a WAV file."""
+    cue = struct.pack("<I", len(chapters))
+    labels = b""
+    for cue_id, chapter in enumerate(chapters, start=1):
+        cue += struct.pack("<II4sIII", cue_id, chapter["start_sample"], b"data", 0, 0, chapter["start_sample"])
+        text = f"{chapter['index']} {chapter['title']}".strip().encode("utf-8") + b"\x00"
+        labl = struct.pack("<I", cue_id) + text
+        labels += struct.pack("<4sI", b"labl", len(labl)) + labl + (b"\x00" if len(labl) & 1 else b"")
+    adtl = b"adtl" + labels
+    return struct.pack("<4sI", b"cue ", len(cue)) + cue + struct.pack("<4sI", b"LIST", len(adtl)) + adtl
+
+
+def concatenate_wav_files(
+    audio_files: List[str], output_file: str, chapters: Optional[List[Dict[str, Any]]] = None
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Concatenate PCM WAV files by copying their sample data, without decoding.
+
+    Chapter offsets are computed from the sample counts in each file's header,
+    and written into the output as cue points with labels.
+
+    Args:
+        audio_files: WAV files to concatenate
+        output_file: Path of the concatenated WAV file
+        chapters: Optional chapter info per file ('index' and 'title' keys)
+
+    Returns:
+        Chapters with start/end positions in samples and milliseconds,
+        or None if the inputs are not PCM WAV files with identical formats
+    """
+    infos = []
+    for path in audio_files:
+        with open(path, "rb") as f:
+            info = read_wav_info(f)
+        if info is None or (infos and info[:3] != infos[0][:3]):
+            logger.info(f"Cannot concatenate without decoding: {path}")
+            return None
+        infos.append(info)
+
+    first = infos[0]
+    total_size = sum(info.frames * first.block_align for info in infos)
+    result = []
+    position = 0
+    for i, info in enumerate(infos):
+        meta = chapters[i] if chapters else {"index": str(i), "title": ""}
+        result.append(
+            {
+                "index": meta["index"],
+                "title": meta["title"],
+                "start_sample": position,
+                "end_sample": position + info.frames,
+                "start_ms": position * 1000 // first.sample_rate,
+                "end_ms": (position + info.frames) * 1000 // first.sample_rate,
+            }
+        )
+        position += info.frames
+
+    trailer = _cue_chunks(result) if chapters else b""
+    pad = b"\x00" if total_size & 1 else b""
+    byte_rate = first.sample_rate * first.block_align
+    with open(output_file, "wb") as out:
+        out.write(struct.pack("<4sI4s", b"RIFF", 4 + 24 + 8 + total_size + len(pad) + len(trailer), b"WAVE"))
+        out.write(
+            struct.pack(
+                "<4sIHHIIHH",
+                b"fmt ",
+                16,
+                1,
+                first.channels,
+                first.sample_rate,
+                byte_rate,
+                first.block_align,
+                first.bits_per_sample,
+            )
+        )
+        out.write(struct.pack("<4sI", b"data", total_size))
+        for path, info in zip(audio_files, infos):
+            with open(path, "rb") as f:
+                f.seek(info.data_offset)
+                _copy_bytes(f, out, info.frames * first.block_align)
+        out.write(pad + trailer)
+
+    logger.info(f"Concatenated {len(audio_files)} WAV files without decoding: {output_file}")
+    return result
+
+
+def _copy_bytes(src: BinaryIO, dst: BinaryIO, length: int) -> None:
+    remaining = length
+    while remaining > 0:
+        buf = src.read(min(COPY_BUFFER_SIZE, remaining))
+        if not buf:
+            raise ValueError("WAV data chunk is shorter than its header says")
+        dst.write(buf)
+        remaining -= len(buf)
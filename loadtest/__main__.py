@@ -0,0 +1,29 @@
+import argparse
+import json
+import logging
+import sys
+
+from loadtest.harness import format_report, load_scenario, run_scenario
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load-test the podcast API with a fake Gemini client")
+    parser.add_argument("scenarios", nargs="+", help="Scenario files or names in loadtest/scenarios")
+    parser.add_argument("--json", help="Write the reports to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    reports = []
+    for path in args.scenarios:
+        report = run_scenario(load_scenario(path))
+        print(format_report(report), end="\n\n")
+        reports.append(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+    # しきい値を超えたシナリオがあればデプロイ前のチェックを失敗させる
+    return 1 if any(report["violations"] for report in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
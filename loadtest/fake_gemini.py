@@ -0,0 +1,48 @@
+import random
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+# Gemini TTSと同じ 24kHz・16bit・モノラルのPCM
+SAMPLE_RATE = 24000
+SCRIPT = "Minami: 今週のメルマガを紹介します。[pause 0.6sec]\nNakajima: よろしくお願いします。[pause 1.0sec]"
+
+
+class FakeModels:
+    """Stand-in for client.models returning canned scripts and silent audio after a simulated latency."""
+
+    def __init__(self, script_latency: float, tts_latency: float, audio_seconds: float, jitter: float):
+        self.script_latency = script_latency
+        self.tts_latency = tts_latency
+        self.audio_seconds = audio_seconds
+        self.jitter = jitter
+
+    def _sleep(self, seconds: float) -> None:
+        time.sleep(max(0.0, seconds * random.uniform(1 - self.jitter, 1 + self.jitter)))
+
+    def generate_content(self, model, contents, config=None):
+        self._sleep(self.script_latency)
+        return SimpleNamespace(text=SCRIPT)
+
+    def generate_content_stream(self, model, contents, config=None):
+        self._sleep(self.tts_latency)
+        data = b"\x00\x00" * int(SAMPLE_RATE * self.audio_seconds)
+        part = SimpleNamespace(inline_data=SimpleNamespace(data=data, mime_type=f"audio/L16;rate={SAMPLE_RATE}"))
+        yield SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))], text=None)
+
+
+def fake_gemini(script_latency: float = 0.2, tts_latency: float = 0.5, audio_seconds: float = 1.0, jitter: float = 0.3):
+    """
+    Patch the Gemini client used by PodcastGenerator with a local stand-in.
+
+    Args:
+        script_latency: Mean seconds per script generation call
+        tts_latency: Mean seconds per TTS call
+        audio_seconds: Length of the silent audio returned by TTS
+        jitter: Relative spread of the latencies (0.3 = ±30%)
+
+    Returns:
+        Patcher usable as a context manager
+    """
+    models = FakeModels(script_latency, tts_latency, audio_seconds, jitter)
+    return mock.patch("app.utils.podcast_generator.genai.Client", lambda api_key=None: SimpleNamespace(models=models))
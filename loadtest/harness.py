@@ -0,0 +1,367 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIO_DIR = os.path.join(os.path.dirname(__file__), "scenarios")
+DEFAULT_SCENARIO: Dict[str, Any] = {
+    "name": "unnamed",
+    "uploaders": 4,  # 同時にアップロードするクライアント数
+    "uploads_per_uploader": 1,
+    "ramp_up_seconds": 0.0,  # アップロードの開始をこの秒数に分散させる
+    "pollers": 20,  # 他人のジョブのステータスを取得し続けるクライアント数
+    "poll_interval": 0.2,
+    "articles_per_issue": 4,
+    "job_timeout": 120.0,
+    "gemini_max_concurrency": 4,
+    "upload_max_concurrency": 4,
+    "fake_gemini": {},
+    "thresholds": {},
+}
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+# 負荷をかける側のイベントループがこれ以上遅れたら、計測値にクライアント側の待ち時間が混ざっている
+CLIENT_LAG_WARNING_MS = 50.0
+
+
+def load_scenario(path: str) -> Dict[str, Any]:
+    """
+    Load a scenario file, filling in the defaults.
+
+    Args:
+        path: JSON file, or the name of a file in loadtest/scenarios
+
+    Returns:
+        Scenario settings
+    """
+    if not os.path.exists(path):
+        path = os.path.join(SCENARIO_DIR, path if path.endswith(".json") else f"{path}.json")
+    with open(path, "r", encoding="utf-8") as f:
+        return {**DEFAULT_SCENARIO, **json.load(f)}
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile, or None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+        "max_ms": max(values) if values else None,
+    }
+
+
+def issue_markdown(number: int, articles: int) -> str:
+    """Build a newsletter with the usual sections; the number keeps every upload distinct."""
+    lines = [f"# 週刊 Life is Beautiful 第{number}号\n", "# 今週のざっくばらん\n"]
+    for topic in range(2):
+        lines.append(f"## トピック{topic + 1}（第{number}号）\n")
+        lines.append("エンジニアの働き方とAIの関係について考えます。" * 5 + "\n")
+    lines.append("# 私の目に止まった記事\n")
+    for article in range(articles):
+        lines.append(f"[記事{article + 1}](https://example.com/{number}/{article})\n")
+        lines.append("この記事についてのコメントです。" * 3 + "\n")
+    return "\n".join(lines)
+
+
+class Recorder:
+    """Collects the latency and outcome of every request, per endpoint."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+
+    async def request(
+        self, client: httpx.AsyncClient, endpoint: str, method: str, url: str, **kwargs
+    ) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            logger.warning(f"{endpoint} failed: {e!r}")
+            response = None
+        self.latencies[endpoint].append((time.perf_counter() - start) * 1000)
+        if response is None or response.status_code >= 400:
+            self.errors[endpoint] += 1
+        return response
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            result[endpoint] = {
+                "requests": len(values),
+                "errors": self.errors[endpoint],
+                "error_rate": self.errors[endpoint] / len(values),
+                **summarize(values),
+            }
+        return result
+
+
+class LoopLagProbe:
+    """Measures how late an event loop wakes up from a short sleep."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+
+    async def run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, (time.perf_counter() - start - self.interval) * 1000))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServerProcess:
+    """
+    Runs app.main:app in one uvicorn server in a subprocess, as a single worker would in production.
+
+    The server gets its own process (and GIL), so the load generator does not
+    slow it down, and the event loop lag is measured inside it.
+    """
+
+    def __init__(self, scenario: Dict[str, Any], workdir: str):
+        workdir = os.path.abspath(workdir)
+        self.port = _free_port()
+        self.lag_file = os.path.join(workdir, "event_loop_lag.json")
+        env = {
+            **os.environ,
+            "GEMINI_API_KEY": "loadtest",
+            "STORAGE_BACKEND": "local",
+            "STORAGE_ROOT": workdir,
+            "GEMINI_MAX_CONCURRENCY": str(scenario["gemini_max_concurrency"]),
+            "UPLOAD_MAX_CONCURRENCY": str(scenario["upload_max_concurrency"]),
+            "PYTHONPATH": os.pathsep.join(p for p in (ROOT_DIR, os.environ.get("PYTHONPATH")) if p),
+        }
+        command = [
+            sys.executable,
+            "-m",
+            "loadtest.server",
+            "--port",
+            str(self.port),
+            "--workdir",
+            workdir,
+            "--lag-file",
+            self.lag_file,
+            "--fake-gemini",
+            json.dumps(scenario["fake_gemini"]),
+        ]
+        # サーバーはカレントディレクトリの tmp/ にチャンクや台本を書き出すので、リポジトリではなく作業ディレクトリで動かす
+        self.process = subprocess.Popen(command, cwd=workdir, env=env)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def wait_ready(self, timeout: float = 30.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Load test server exited with code {self.process.returncode}")
+            try:
+                if httpx.get(f"{self.url}/health", timeout=1.0).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.1)
+        raise RuntimeError("Load test server did not start")
+
+    def stop(self) -> List[float]:
+        """Stop the server and return its event loop lag samples."""
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        if not os.path.exists(self.lag_file):
+            return []
+        with open(self.lag_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+async def _uploader(
+    client: httpx.AsyncClient, recorder: Recorder, scenario: Dict[str, Any], number: int, job_ids: List[str], jobs: Counter
+) -> None:
+    await asyncio.sleep(scenario["ramp_up_seconds"] * number / max(1, scenario["uploaders"]))
+    for k in range(scenario["uploads_per_uploader"]):
+        issue = number * scenario["uploads_per_uploader"] + k + 1
+        markdown = issue_markdown(issue, scenario["articles_per_issue"])
+        response = await recorder.request(
+            client,
+            "POST /api/generate-podcast",
+            "POST",
+            "/api/generate-podcast",
+            files={"file": (f"issue_{issue}.md", markdown.encode("utf-8"), "text/markdown")},
+        )
+        if response is None or response.status_code != 200:
+            jobs["rejected"] += 1
+            continue
+        job_id = response.json()["job_id"]
+        job_ids.append(job_id)
+
+        # 自分のジョブが終わるまでポーリングしてからダウンロードする
+        status = "timeout"
+        deadline = time.monotonic() + scenario["job_timeout"]
+        while time.monotonic() < deadline:
+            await asyncio.sleep(scenario["poll_interval"])
+            response = await recorder.request(
+                client, "GET /api/podcast-status/{job_id}", "GET", f"/api/podcast-status/{job_id}"
+            )
+            if response is not None and response.status_code == 200 and response.json()["status"] in TERMINAL_STATUSES:
+                status = response.json()["status"]
+                break
+        jobs[status] += 1
+        if status == "completed":
+            await recorder.request(client, "GET /api/download-podcast/{job_id}", "GET", f"/api/download-podcast/{job_id}")
+
+
+async def _poller(
+    client: httpx.AsyncClient, recorder: Recorder, scenario: Dict[str, Any], job_ids: List[str], stop: asyncio.Event
+) -> None:
+    # 開始時刻をずらしてポーリングが同じ瞬間に集中しないようにする
+    await asyncio.sleep(random.uniform(0, scenario["poll_interval"]))
+    while not stop.is_set():
+        if job_ids:
+            job_id = random.choice(job_ids)
+            await recorder.request(client, "GET /api/podcast-status/{job_id}", "GET", f"/api/podcast-status/{job_id}")
+        else:
+            await recorder.request(client, "GET /health", "GET", "/health")
+        await asyncio.sleep(scenario["poll_interval"])
+
+
+async def _drive(base_url: str, scenario: Dict[str, Any], recorder: Recorder, jobs: Counter, probe: LoopLagProbe) -> None:
+    probe_task = asyncio.create_task(probe.run())
+    limits = httpx.Limits(max_connections=scenario["uploaders"] + scenario["pollers"] + 10)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        job_ids: List[str] = []
+        stop = asyncio.Event()
+        pollers = [asyncio.create_task(_poller(client, recorder, scenario, job_ids, stop)) for _ in range(scenario["pollers"])]
+        await asyncio.gather(*(_uploader(client, recorder, scenario, n, job_ids, jobs) for n in range(scenario["uploaders"])))
+        stop.set()
+        await asyncio.gather(*pollers)
+    probe_task.cancel()
+
+
+def run_scenario(scenario: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run a scenario against app.main:app served by one uvicorn server with a fake Gemini client.
+
+    Args:
+        scenario: Scenario settings (see load_scenario)
+
+    Returns:
+        Report with per-endpoint latency percentiles and error rates, the event
+        loop lag, job outcomes and threshold violations
+    """
+    recorder = Recorder()
+    jobs: Counter = Counter()
+    client_probe = LoopLagProbe()
+    with tempfile.TemporaryDirectory() as workdir:
+        server = ServerProcess(scenario, workdir)
+        try:
+            server.wait_ready()
+            start = time.perf_counter()
+            asyncio.run(_drive(server.url, scenario, recorder, jobs, client_probe))
+            duration = time.perf_counter() - start
+        finally:
+            lag_samples = server.stop()
+
+    report = {
+        "scenario": scenario["name"],
+        "duration_seconds": round(duration, 2),
+        "endpoints": recorder.summary(),
+        "event_loop_lag": summarize(lag_samples),
+        "client_loop_lag": summarize(client_probe.samples),
+        "jobs": dict(jobs),
+    }
+    report["violations"] = check_thresholds(report, scenario["thresholds"])
+    return report
+
+
+def check_thresholds(report: Dict[str, Any], thresholds: Dict[str, Any]) -> List[str]:
+    """
+    Compare a report with the thresholds of its scenario.
+
+    Args:
+        report: Report returned by run_scenario
+        thresholds: {"endpoints": {endpoint: {"p95_ms": ..., "max_error_rate": ...}},
+            "event_loop_lag": {"p99_ms": ...}, "max_unfinished_jobs": ...}
+
+    Returns:
+        Human-readable violations; empty if the run passed
+    """
+    violations = []
+    limits = [
+        (f"event loop lag {key}", report["event_loop_lag"].get(key), limit)
+        for key, limit in thresholds.get("event_loop_lag", {}).items()
+    ]
+    for endpoint, endpoint_limits in thresholds.get("endpoints", {}).items():
+        stats = report["endpoints"].get(endpoint)
+        if stats is None:
+            violations.append(f"{endpoint}: no requests were made")
+            continue
+        for key, limit in endpoint_limits.items():
+            value = stats["error_rate"] if key == "max_error_rate" else stats.get(key)
+            limits.append((f"{endpoint} {key}", value, limit))
+    if "max_unfinished_jobs" in thresholds:
+        unfinished = sum(count for status, count in report["jobs"].items() if status != "completed")
+        limits.append(("unfinished jobs", unfinished, thresholds["max_unfinished_jobs"]))
+    for name, value, limit in limits:
+        if value is not None and value > limit:
+            violations.append(f"{name}: {value:.3f} > {limit}")
+    return violations
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Render a report as a plain-text table."""
+
+    def ms(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.1f}"
+
+    lines = [f"scenario: {report['scenario']} ({report['duration_seconds']}s)", ""]
+    lines.append(f"{'endpoint':<36} {'reqs':>6} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for endpoint, stats in report["endpoints"].items():
+        lines.append(
+            f"{endpoint:<36} {stats['requests']:>6} {stats['error_rate'] * 100:>6.1f} {ms(stats['p50_ms']):>8} "
+            f"{ms(stats['p95_ms']):>8} {ms(stats['p99_ms']):>8} {ms(stats['max_ms']):>8}"
+        )
+    lag = report["event_loop_lag"]
+    lines.append(
+        f"{'event loop lag':<36} {'':>6} {'':>6} {ms(lag['p50_ms']):>8} {ms(lag['p95_ms']):>8} "
+        f"{ms(lag['p99_ms']):>8} {ms(lag['max_ms']):>8}"
+    )
+    client_lag = report["client_loop_lag"]["p99_ms"]
+    if client_lag is not None and client_lag > CLIENT_LAG_WARNING_MS:
+        lines.append(
+            f"warning: the load generator's own event loop lagged {client_lag:.0f} ms (p99); "
+            "latencies include client-side queueing"
+        )
+    lines.append("")
+    lines.append("jobs: " + ", ".join(f"{status}={count}" for status, count in sorted(report["jobs"].items())))
+    lines.append("result: " + ("PASS" if not report["violations"] else "FAIL"))
+    lines.extend(f"  - {violation}" for violation in report["violations"])
+    return "\n".join(lines)
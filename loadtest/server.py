@@ -0,0 +1,56 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+
+import uvicorn
+
+from loadtest.fake_gemini import fake_gemini
+from loadtest.harness import LoopLagProbe
+
+
+async def serve(port: int, workdir: str, lag_file: str) -> None:
+    """Serve app.main:app with one uvicorn server and write the event loop lag samples on shutdown."""
+    from app.api import podcast
+    from app.main import app
+    from app.utils.estimator import StageEstimator
+    from app.utils.fingerprint import FingerprintIndex
+
+    # app.main はINFOでログを出すので、リクエストごとのログ出力が計測に混ざらないようにする
+    logging.getLogger().setLevel(logging.WARNING)
+    # フェイクの処理速度を学習したり、過去の号の再利用候補に混ざったりしないようにする
+    podcast.estimator = StageEstimator(os.path.join(workdir, "stage_estimates.json"))
+    podcast.fingerprint_index = FingerprintIndex(os.path.join(workdir, "fingerprint_index.json"))
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    probe = LoopLagProbe()
+    task = asyncio.create_task(probe.run())
+    try:
+        await server.serve()
+    finally:
+        task.cancel()
+        with open(lag_file, "w", encoding="utf-8") as f:
+            json.dump(probe.samples, f)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the podcast API with a fake Gemini client for load tests")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--workdir", required=True, help="Scratch directory for job state")
+    parser.add_argument("--lag-file", required=True, help="Where to write the event loop lag samples")
+    parser.add_argument("--fake-gemini", default="{}", help="JSON keyword arguments of fake_gemini()")
+    args = parser.parse_args()
+
+    # uvicornはSIGTERMでも正常終了する（ラグの記録を書き出してから終わる）
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    with fake_gemini(**json.loads(args.fake_gemini)):
+        try:
+            asyncio.run(serve(args.port, args.workdir, args.lag_file))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from app.utils.estimator import AUDIO_BYTES_PER_SECOND, DEFAULT_RATES, StageEstimator
+
+
+class TestStageEstimator(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "stage_estimates.json")
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_first_observation_replaces_default(self):
+        """The first sample overrides the built-in rate, later ones are averaged in."""
+        estimator = StageEstimator(alpha=0.5)
+        estimator.observe_tts(100, 2.0)
+        self.assertAlmostEqual(estimator.rates["tts_seconds_per_char"], 0.02)
+        estimator.observe_tts(100, 4.0)
+        self.assertAlmostEqual(estimator.rates["tts_seconds_per_char"], 0.03)
+
+    def test_audio_length_is_learned_from_tts_output(self):
+        estimator = StageEstimator()
+        estimator.observe_tts(100, 1.0, audio_bytes=AUDIO_BYTES_PER_SECOND * 20)
+        self.assertAlmostEqual(estimator.rates["audio_seconds_per_char"], 0.2)
+
+    def test_rates_persist_across_instances(self):
+        estimator = StageEstimator(self.path)
+        estimator.observe_script(1000, 1500, 5.0)
+        estimator.save()
+
+        reloaded = StageEstimator(self.path)
+        self.assertAlmostEqual(reloaded.rates["script_seconds_per_char"], 0.005)
+        self.assertEqual(reloaded.samples["script_seconds_per_char"], 1)
+        self.assertEqual(reloaded.rates["tts_seconds_per_char"], DEFAULT_RATES["tts_seconds_per_char"])
+
+    def test_estimate_job(self):
+        """Calls, tokens and duration follow from the chunk sizes and learned rates."""
+        estimator = StageEstimator()
+        estimator.rates.update(
+            script_seconds_per_char=0.01, script_chars_per_char=2.0, tts_seconds_per_char=0.01, audio_seconds_per_char=0.1
+        )
+        estimator.rates["concat_bytes_per_second"] = float("inf")
+        estimate = estimator.estimate_job([100, 100, 100, 100], concurrency=2)
+
+        self.assertEqual(estimate["api_calls"], 8)
+        self.assertEqual(estimate["audio_seconds"], 80.0)
+        # 1チャンク = 台本1秒 + TTS2秒、4チャンクを2並列
+        self.assertEqual(estimate["duration_seconds"], 6.0)
+        self.assertGreater(estimate["input_tokens"], estimate["output_tokens"])
+
+    def test_save_is_atomic(self):
+        """Saving goes through a temporary file, so a crash never leaves a truncated rates file."""
+        estimator = StageEstimator(self.path)
+        estimator.observe_tts(100, 2.0)
+        estimator.save()
+        estimator.save()
+        self.assertEqual(os.listdir(self.test_dir), ["stage_estimates.json"])
+        self.assertAlmostEqual(StageEstimator(self.path).rates["tts_seconds_per_char"], 0.02)
+
+    def test_reused_chunks_cost_no_calls(self):
+        """Chunks reused from a previous job add audio but no calls, tokens or generation time."""
+        estimator = StageEstimator()
+        estimator.rates["concat_bytes_per_second"] = float("inf")
+        full = estimator.estimate_job([100, 100, 100, 100], concurrency=1)
+        revised = estimator.estimate_job([100, 100, 100, 100], concurrency=1, reused=[True, True, True, False])
+
+        self.assertEqual(revised["api_calls"], 2)
+        self.assertAlmostEqual(revised["duration_seconds"], full["duration_seconds"] / 4, places=1)
+        self.assertLess(revised["input_tokens"], full["input_tokens"] / 3)
+        self.assertLess(revised["output_tokens"], full["output_tokens"] / 3)
+        self.assertEqual(revised["audio_seconds"], full["audio_seconds"])
+
+    def test_re_requests_and_hedges_are_counted(self):
+        """Learned calls per chunk scale the call count, tokens and script time."""
+        estimator = StageEstimator()
+        before = estimator.estimate_job([100, 100], concurrency=1)
+        # 台本10件のうち5件を再生成し、TTS10件のうち2件をヘッジした
+        estimator.observe_calls(script_chunks=10, script_calls=15, tts_chunks=10, tts_calls=12)
+        after = estimator.estimate_job([100, 100], concurrency=1)
+
+        self.assertEqual(after["api_calls"], round(2 * (1.5 + 1.2)))
+        self.assertGreater(after["input_tokens"], before["input_tokens"])
+        self.assertAlmostEqual(after["output_tokens"], before["output_tokens"] * 1.5, delta=1)
+        self.assertGreater(after["duration_seconds"], before["duration_seconds"])
+
+    def test_remaining_seconds_shrinks_as_chunks_finish(self):
+        estimator = StageEstimator()
+        content = [100, 100]
+        before = estimator.remaining_seconds(content, [None, None])
+        scripted = estimator.remaining_seconds(content, [150, None])
+        finished = estimator.remaining_seconds(content, [150, 150], done=[True, True])
+        self.assertLess(scripted, before)
+        self.assertLess(finished, scripted)
+
+    def test_slowest_chunk_bounds_parallel_work(self):
+        """With spare concurrency the ETA is the slowest chunk, not the average."""
+        estimator = StageEstimator()
+        estimator.rates["concat_bytes_per_second"] = float("inf")
+        one = estimator.remaining_seconds([1000], [None], concurrency=4)
+        both = estimator.remaining_seconds([1000, 10], [None, None], concurrency=4)
+        self.assertAlmostEqual(one, both)
+
+
+if __name__ == "__main__":
+    unittest.main()
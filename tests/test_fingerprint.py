@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from app.utils.fingerprint import MAX_CANDIDATES, FingerprintIndex, chunk_sketch, estimate_similarity, normalize_chunk_text
+from app.utils.records import Chunk
+
+FOOTER = (
+    "## 購読について\n"
+    "このメルマガは毎週火曜日に配信しています。バックナンバーはウェブサイトから購入できます。\n"
+    "ご意見・ご感想は返信でお送りください。配信停止は登録したサイトのマイページから行えます。\n"
+    "発行：シンギュラリティ・ソサエティ"
+)
+
+
+class TestSimilarity(unittest.TestCase):
+    def test_normalization_ignores_numbers_width_and_markup(self):
+        self.assertEqual(
+            normalize_chunk_text("## 第１２３号\n**2025年6月3日**"), normalize_chunk_text("# 第45号 2024年12月31日")
+        )
+
+    def test_identical_and_unrelated_chunks(self):
+        self.assertEqual(estimate_similarity(chunk_sketch(FOOTER), chunk_sketch(FOOTER)), 1.0)
+        other = chunk_sketch("今週はAIエージェントの話題です。開発がどう変わるかを考えます。")
+        self.assertLess(estimate_similarity(chunk_sketch(FOOTER), other), 0.1)
+
+    def test_near_duplicate_scores_high(self):
+        edited = FOOTER.replace("毎週火曜日", "毎週水曜日")
+        similarity = estimate_similarity(chunk_sketch(FOOTER), chunk_sketch(edited))
+        self.assertGreater(similarity, 0.8)
+        self.assertLess(similarity, 1.0)
+
+
+class TestFingerprintIndex(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "fingerprint_index.json")
+        self.audio_file = os.path.join(self.test_dir, "chunk_9.wav")
+        with open(self.audio_file, "wb") as f:
+            f.write(b"RIFF")
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_find_near_duplicate_with_same_role(self):
+        index = FingerprintIndex(self.path)
+        index.add("job_a", Chunk(9, "END", FOOTER), "Minami: script", self.audio_file)
+
+        edited = Chunk(9, "END", FOOTER.replace("毎週火曜日", "毎週水曜日"))
+        entry, similarity = index.find(edited, threshold=0.8)
+        self.assertEqual(entry["job_id"], "job_a")
+        self.assertEqual(entry["script"], "Minami: script")
+        self.assertIsNone(index.find(edited, threshold=1.0))
+        # 位置づけが違うチャンク（ENDと途中）は再利用しない
+        self.assertIsNone(index.find(Chunk(3, "3", FOOTER), threshold=0.8))
+
+    def test_numbers_must_match(self):
+        """A chunk that differs only in dates or numbers scores 1.0 but is not reused."""
+        header = "# 週刊 Life is Beautiful 2025年6月3日号\n今週もよろしくお願いします。"
+        index = FingerprintIndex()
+        index.add("job_a", Chunk(0, "START", header), "script", self.audio_file)
+        next_issue = Chunk(0, "START", header.replace("6月3日", "6月10日"))
+        self.assertEqual(estimate_similarity(chunk_sketch(header), chunk_sketch(next_issue.content)), 1.0)
+        self.assertIsNone(index.find(next_issue, 0.9))
+        # 全角数字でも同じ数字なら再利用する
+        self.assertIsNotNone(index.find(Chunk(0, "START", header.replace("2025", "２０２５")), 0.9))
+
+    def test_unusable_entries_do_not_crowd_out_a_match(self):
+        """Exact copies from other roles or excluded jobs must not hide a valid, less similar entry."""
+        index = FingerprintIndex()
+        for i in range(MAX_CANDIDATES):
+            index.add("job_prev", Chunk(9, "END", FOOTER), "script", self.audio_file)
+            index.add(f"job_{i}", Chunk(0, "START", FOOTER), "script", self.audio_file)
+        index.add("job_a", Chunk(9, "END", FOOTER.replace("毎週火曜日", "毎週水曜日")), "script", self.audio_file)
+
+        entry, _ = index.find(Chunk(9, "END", FOOTER), threshold=0.8, exclude_job_ids=["job_prev"])
+        self.assertEqual(entry["job_id"], "job_a")
+
+    def test_save_is_atomic(self):
+        """Saving goes through a temporary file, so no partial index is left behind."""
+        index = FingerprintIndex(self.path)
+        index.add("job_a", Chunk(9, "END", FOOTER), "script", self.audio_file)
+        index.save()
+        index.save()
+        self.assertEqual(sorted(os.listdir(self.test_dir)), ["chunk_9.wav", "fingerprint_index.json"])
+        self.assertEqual(len(FingerprintIndex(self.path)), 1)
+
+    def test_excluded_jobs_are_skipped(self):
+        index = FingerprintIndex()
+        index.add("job_a", Chunk(9, "END", FOOTER), "script", self.audio_file)
+        self.assertIsNone(index.find(Chunk(9, "END", FOOTER), 0.9, exclude_job_ids=["job_a"]))
+
+    def test_index_persists_and_drops_missing_audio(self):
+        index = FingerprintIndex(self.path)
+        index.add("job_a", Chunk(9, "END", FOOTER), "script", self.audio_file)
+        index.add("job_b", Chunk(0, "START", "冒頭"), "script", os.path.join(self.test_dir, "gone.wav"))
+        index.save()
+
+        reloaded = FingerprintIndex(self.path)
+        self.assertEqual(len(reloaded), 1)
+        self.assertIsNotNone(reloaded.find(Chunk(9, "END", FOOTER), 0.9))
+
+    def test_oldest_entries_are_dropped(self):
+        index = FingerprintIndex(max_entries=2)
+        for i in range(3):
+            index.add(f"job_{i}", Chunk(9, "END", f"{FOOTER} {'あいうえお'[i] * 20}"), "script", self.audio_file)
+        self.assertEqual(len(index), 2)
+        entry, _ = index.find(Chunk(9, "END", FOOTER), 0.5)
+        self.assertNotEqual(entry["job_id"], "job_0")
+
+
+if __name__ == "__main__":
+    unittest.main()
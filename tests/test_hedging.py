@@ -0,0 +1,175 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from app.utils.hedging import CancelSignal, HedgeBudget, HedgePolicy
+
+
+def warmed_policy(seconds_per_unit=0.001, samples=10):
+    """Create a policy that has already observed enough fast calls to hedge."""
+    policy = HedgePolicy(percentile=95, min_samples=samples)
+    for _ in range(samples):
+        policy.record(seconds_per_unit * 10, 10)
+    return policy
+
+
+class TestHedgePolicy(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_threshold_requires_samples_and_scales_with_size(self):
+        """No threshold until min_samples calls were seen; then it is proportional to size."""
+        policy = HedgePolicy(percentile=50, min_samples=3)
+        policy.record(1.0, 100)
+        self.assertIsNone(policy.threshold(100))
+        policy.record(2.0, 100)
+        policy.record(3.0, 100)
+        self.assertAlmostEqual(policy.threshold(100), 2.0)
+        self.assertAlmostEqual(policy.threshold(200), 4.0)
+
+    def test_fast_call_is_not_hedged(self):
+        """Calls that finish before the threshold run once."""
+        policy = warmed_policy(seconds_per_unit=0.05)
+        budget = HedgeBudget(3)
+        attempts = []
+
+        def fn(signal, attempt):
+            attempts.append(attempt)
+            return "done"
+
+        self.assertEqual(policy.call(fn, 10, budget), "done")
+        self.assertEqual(attempts, ["primary"])
+        self.assertEqual(budget.issued, 0)
+
+    def test_slow_call_is_hedged_and_loser_cancelled(self):
+        """A straggler gets a duplicate; the first result wins and the loser is signalled."""
+        policy = warmed_policy()
+        budget = HedgeBudget(3)
+        primary_signal = []
+        primary_done = threading.Event()
+
+        def fn(signal, attempt):
+            if attempt == "primary":
+                primary_signal.append(signal)
+                while not signal.is_set():
+                    time.sleep(0.005)
+                primary_done.set()
+                return None
+            return "hedge result"
+
+        self.assertEqual(policy.call(fn, 10, budget), "hedge result")
+        self.assertTrue(primary_done.wait(1))
+        self.assertTrue(primary_signal[0].is_set())
+        self.assertEqual((budget.issued, budget.wins), (1, 1))
+
+    def test_budget_caps_hedges(self):
+        """No hedges are issued once the job's budget is spent."""
+        policy = warmed_policy()
+        budget = HedgeBudget(0)
+        attempts = []
+
+        def fn(signal, attempt):
+            attempts.append(attempt)
+            time.sleep(0.05)
+            return "slow"
+
+        self.assertEqual(policy.call(fn, 10, budget), "slow")
+        self.assertEqual(attempts, ["primary"])
+
+    def test_losing_file_is_removed(self):
+        """Output written by the losing attempt is deleted."""
+        policy = warmed_policy()
+        budget = HedgeBudget(1)
+        release = threading.Event()
+        written = threading.Event()
+        primary_file = os.path.join(self.test_dir, "chunk_0.wav")
+        hedge_file = os.path.join(self.test_dir, "chunk_0_hedge.wav")
+
+        def fn(signal, attempt):
+            if attempt == "primary":
+                release.wait(1)
+                open(primary_file, "wb").close()
+                written.set()
+                return primary_file
+            open(hedge_file, "wb").close()
+            return hedge_file
+
+        self.assertEqual(policy.call(fn, 10, budget), hedge_file)
+        release.set()
+        self.assertTrue(written.wait(1))
+        deadline = time.monotonic() + 1
+        while os.path.exists(primary_file) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(os.path.exists(primary_file))
+        self.assertTrue(os.path.exists(hedge_file))
+
+    def test_hedge_needs_an_idle_scheduler_slot(self):
+        """No hedge is fired while the scheduler has no idle slot, and a borrowed slot is returned."""
+        policy = warmed_policy()
+
+        class Slots:
+            def __init__(self, free):
+                self.free = free
+                self.returned = threading.Event()
+
+            def try_borrow(self):
+                return self.free
+
+            def give_back(self):
+                self.returned.set()
+
+        def fn(signal, attempt):
+            if attempt == "primary":
+                time.sleep(0.05)
+            return attempt
+
+        budget = HedgeBudget(3)
+        self.assertEqual(policy.call(fn, 10, budget, slots=Slots(False)), "primary")
+        self.assertEqual(budget.issued, 0)
+        slots = Slots(True)
+        self.assertEqual(policy.call(fn, 10, budget, slots=slots), "hedge")
+        self.assertTrue(slots.returned.wait(1))
+
+    def test_winner_duration_is_recorded(self):
+        """The recorded latency is the winning attempt's own, not the time since the primary started."""
+        policy = warmed_policy()
+
+        def fn(signal, attempt):
+            if attempt == "primary":
+                while not signal.is_set():
+                    time.sleep(0.005)
+                return None
+            return "hedge result"
+
+        policy.call(fn, 10, HedgeBudget(1))
+        # ヘッジは即座に返るので、記録される1単位あたりの時間は閾値（0.001秒）より十分短い
+        self.assertLess(policy._samples[-1], 0.001)
+
+    def test_error_is_raised_when_no_attempt_succeeds(self):
+        """If every attempt fails, the error is propagated."""
+        policy = HedgePolicy()
+
+        def fn(signal, attempt):
+            raise RuntimeError("quota")
+
+        with self.assertRaises(RuntimeError):
+            policy.call(fn, 10, HedgeBudget(1))
+
+    def test_cancel_signal_follows_parent(self):
+        """Setting the job cancel event cancels every attempt."""
+        parent = threading.Event()
+        signal = CancelSignal(parent)
+        self.assertFalse(signal.is_set())
+        parent.set()
+        self.assertTrue(signal.is_set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.utils.http_range import RangeNotSatisfiable, parse_range_header, ranged_blob_response
+from app.utils.storage import LocalStorage
+
+
+class TestParseRangeHeader(unittest.TestCase):
+    def test_closed_range(self):
+        self.assertEqual(parse_range_header("bytes=0-99", 1000), (0, 99))
+
+    def test_open_ended_range(self):
+        self.assertEqual(parse_range_header("bytes=500-", 1000), (500, 999))
+
+    def test_suffix_range(self):
+        self.assertEqual(parse_range_header("bytes=-100", 1000), (900, 999))
+        self.assertEqual(parse_range_header("bytes=-5000", 1000), (0, 999))
+
+    def test_end_is_clamped(self):
+        self.assertEqual(parse_range_header("bytes=900-5000", 1000), (900, 999))
+
+    def test_ignored_ranges(self):
+        """Malformed, multi-range and non-byte ranges fall back to the whole file."""
+        self.assertIsNone(parse_range_header("bytes=0-1,5-6", 1000))
+        self.assertIsNone(parse_range_header("items=0-1", 1000))
+        self.assertIsNone(parse_range_header("bytes=abc", 1000))
+        self.assertIsNone(parse_range_header("bytes=10-5", 1000))
+
+    def test_unsatisfiable_range(self):
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range_header("bytes=1000-", 1000)
+
+
+class TestRangedBlobResponse(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "podcast.wav")
+        self.content = bytes(range(256)) * 4
+        with open(self.path, "wb") as f:
+            f.write(self.content)
+
+        storage = LocalStorage(self.test_dir)
+        app = FastAPI()
+
+        @app.get("/file")
+        async def serve(request: Request):
+            return ranged_blob_response(request, storage, "podcast.wav", "podcast.wav")
+
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_full_download(self):
+        response = self.client.get("/file")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.content)
+        self.assertEqual(response.headers["accept-ranges"], "bytes")
+        self.assertEqual(response.headers["content-type"], "audio/wav")
+        self.assertIn("etag", response.headers)
+
+    def test_partial_download(self):
+        response = self.client.get("/file", headers={"Range": "bytes=100-199"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, self.content[100:200])
+        self.assertEqual(response.headers["content-range"], f"bytes 100-199/{len(self.content)}")
+
+    def test_if_range_matching_etag_resumes(self):
+        etag = self.client.get("/file").headers["etag"]
+        response = self.client.get("/file", headers={"Range": "bytes=1000-", "If-Range": etag})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, self.content[1000:])
+
+    def test_if_range_stale_etag_sends_whole_file(self):
+        response = self.client.get("/file", headers={"Range": "bytes=1000-", "If-Range": '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.content)
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get("/file", headers={"Range": "bytes=5000-"})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers["content-range"], f"bytes */{len(self.content)}")
+
+
+if __name__ == "__main__":
+    unittest.main()
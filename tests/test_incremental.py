@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from app.utils.incremental import chunk_content_hash, chunk_role, manifest_entry, plan_reuse
+from app.utils.records import Chunk
+
+
+class TestIncremental(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def make_manifest(self, chunks):
+        manifest = []
+        for i, chunk in enumerate(chunks):
+            audio_file = os.path.join(self.test_dir, f"chunk_{i}.wav")
+            with open(audio_file, "wb") as f:
+                f.write(b"RIFF")
+            manifest.append(manifest_entry(chunk, f"script {i}", audio_file))
+        return manifest
+
+    def test_chunk_role(self):
+        """Middle chunks share a role regardless of their number."""
+        self.assertEqual(chunk_role("START"), "START")
+        self.assertEqual(chunk_role("END"), "END")
+        self.assertEqual(chunk_role("1"), "MIDDLE")
+        self.assertEqual(chunk_role("12"), "MIDDLE")
+
+    def test_content_hash_ignores_line_endings(self):
+        """CRLF and trailing whitespace do not count as changes."""
+        self.assertEqual(chunk_content_hash("## A\r\nbody  \r\n"), chunk_content_hash("## A\nbody\n"))
+        self.assertNotEqual(chunk_content_hash("## A\nbody"), chunk_content_hash("## A\nbody!"))
+
+    def test_typo_fix_regenerates_only_changed_chunk(self):
+        """Only the edited chunk is regenerated."""
+        old = [
+            Chunk(0, "START", "intro"),
+            Chunk(1, "1", "article one"),
+            Chunk(2, "END", "article two"),
+        ]
+        new = [
+            Chunk(0, "START", "intro"),
+            Chunk(1, "1", "article one (fixed)"),
+            Chunk(2, "END", "article two"),
+        ]
+        plan = plan_reuse(self.make_manifest(old), new)
+        self.assertEqual(plan[0]["script"], "script 0")
+        self.assertIsNone(plan[1])
+        self.assertEqual(plan[2]["script"], "script 2")
+
+    def test_appended_article_shifts_end(self):
+        """When an article is appended, the old END chunk is regenerated as a middle chunk."""
+        old = [
+            Chunk(0, "START", "intro"),
+            Chunk(1, "1", "article one"),
+            Chunk(2, "END", "article two"),
+        ]
+        new = [
+            Chunk(0, "START", "intro"),
+            Chunk(1, "1", "article one"),
+            Chunk(2, "2", "article two"),
+            Chunk(3, "END", "article three"),
+        ]
+        plan = plan_reuse(self.make_manifest(old), new)
+        self.assertIsNotNone(plan[0])
+        self.assertIsNotNone(plan[1])
+        self.assertIsNone(plan[2])
+        self.assertIsNone(plan[3])
+
+    def test_inserted_article_keeps_shifted_middle_chunks(self):
+        """Middle chunks whose number changed are still reused."""
+        old = [
+            Chunk(0, "START", "intro"),
+            Chunk(1, "1", "article one"),
+            Chunk(2, "2", "article two"),
+            Chunk(3, "END", "outro"),
+        ]
+        new = [
+            Chunk(0, "START", "intro"),
+            Chunk(1, "1", "new article"),
+            Chunk(2, "2", "article one"),
+            Chunk(3, "3", "article two"),
+            Chunk(4, "END", "outro"),
+        ]
+        plan = plan_reuse(self.make_manifest(old), new)
+        self.assertEqual([p["script"] if p else None for p in plan], ["script 0", None, "script 1", "script 2", "script 3"])
+
+    def test_missing_audio_is_not_reused(self):
+        """Entries whose audio file is gone are regenerated."""
+        chunks = [Chunk(0, "START", "intro")]
+        manifest = self.make_manifest(chunks)
+        os.remove(manifest[0]["audio_file"])
+        self.assertEqual(plan_reuse(manifest, chunks), [None])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from unittest.mock import patch
+
+from app.utils.job_registry import JobCancelled, JobRegistry, content_hash, join_key
+
+
+class TestJobRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = JobRegistry(recent_ttl=60)
+
+    def test_content_hash_is_stable(self):
+        """Identical markdown produces the same hash, different markdown does not."""
+        self.assertEqual(content_hash("# 今週"), content_hash("# 今週"))
+        self.assertNotEqual(content_hash("# 今週"), content_hash("# 来週"))
+
+    def test_join_key_includes_options(self):
+        """Uploads of the same content only share a job when their options match."""
+        key = join_key("hash1", preview=False, priority=1, previous_job_id=None)
+        self.assertEqual(key, join_key("hash1", priority=1, previous_job_id=None, preview=False))
+        self.assertNotEqual(key, join_key("hash1", preview=True, priority=1, previous_job_id=None))
+        self.assertNotEqual(key, join_key("hash1", preview=False, priority=5, previous_job_id=None))
+        self.assertNotEqual(key, join_key("hash1", preview=False, priority=1, previous_job_id="job_a"))
+
+    def test_find_in_flight_job(self):
+        """A registered job is found by its content hash."""
+        self.registry.register("hash1", "job_a")
+        self.assertEqual(self.registry.find("hash1"), "job_a")
+        self.assertIsNone(self.registry.find("hash2"))
+
+    def test_successful_job_expires_after_ttl(self):
+        """Completed jobs stay joinable only for recent_ttl seconds."""
+        with patch("app.utils.job_registry.time.monotonic", return_value=1000.0):
+            self.registry.register("hash1", "job_a")
+            self.registry.finish("job_a", succeeded=True)
+            self.assertEqual(self.registry.find("hash1"), "job_a")
+        with patch("app.utils.job_registry.time.monotonic", return_value=1061.0):
+            self.assertIsNone(self.registry.find("hash1"))
+
+    def test_failed_job_is_forgotten(self):
+        """A failed job is not joined by a re-upload."""
+        self.registry.register("hash1", "job_a")
+        self.registry.finish("job_a", succeeded=False)
+        self.assertIsNone(self.registry.find("hash1"))
+
+    def test_cancel_running_job(self):
+        """Cancelling sets the cancel event and stops the job being joinable."""
+        event = self.registry.register("hash1", "job_a")
+        self.assertTrue(self.registry.cancel("job_a"))
+        self.assertTrue(event.is_set())
+        self.assertIsNone(self.registry.find("hash1"))
+        with self.assertRaises(JobCancelled):
+            self.registry.raise_if_cancelled("job_a")
+
+    def test_cancel_after_close_is_refused(self):
+        """A job about to complete cannot be cancelled any more."""
+        self.registry.register("hash1", "job_a")
+        self.registry.close("job_a")
+        self.assertFalse(self.registry.cancel("job_a"))
+        self.registry.raise_if_cancelled("job_a")
+
+    def test_close_cancelled_job(self):
+        """A cancel that landed before close makes the job stop."""
+        self.registry.register("hash1", "job_a")
+        self.registry.cancel("job_a")
+        with self.assertRaises(JobCancelled):
+            self.registry.close("job_a")
+
+    def test_cancel_unknown_or_finished_job(self):
+        """Only running jobs can be cancelled."""
+        self.assertFalse(self.registry.cancel("job_missing"))
+        self.registry.register("hash1", "job_a")
+        self.registry.finish("job_a", succeeded=True)
+        self.assertFalse(self.registry.cancel("job_a"))
+        self.registry.raise_if_cancelled("job_a")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import glob
+import os
+import unittest
+
+from loadtest.harness import ROOT_DIR, SCENARIO_DIR, check_thresholds, load_scenario, percentile, run_scenario
+
+
+def repo_tmp_files():
+    """Modification times of what a job writes under the repository's tmp/ (chunks and scripts)."""
+    paths = glob.glob(os.path.join(ROOT_DIR, "tmp", "chunks", "*")) + glob.glob(os.path.join(ROOT_DIR, "tmp", "scripts", "*"))
+    return {path: os.path.getmtime(path) for path in paths}
+
+
+def report(status_p95=10.0, error_rate=0.0, lag_p99=5.0, jobs=None):
+    return {
+        "endpoints": {
+            "GET /api/podcast-status/{job_id}": {"requests": 100, "error_rate": error_rate, "p95_ms": status_p95},
+        },
+        "event_loop_lag": {"p99_ms": lag_p99},
+        "jobs": jobs if jobs is not None else {"completed": 2},
+    }
+
+
+class TestThresholds(unittest.TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual((percentile(values, 50), percentile(values, 95), percentile(values, 99)), (50, 95, 99))
+        self.assertIsNone(percentile([], 50))
+
+    def test_violations(self):
+        thresholds = {
+            "endpoints": {"GET /api/podcast-status/{job_id}": {"p95_ms": 50, "max_error_rate": 0.0}},
+            "event_loop_lag": {"p99_ms": 20},
+            "max_unfinished_jobs": 0,
+        }
+        self.assertEqual(check_thresholds(report(), thresholds), [])
+        violations = check_thresholds(report(status_p95=80, error_rate=0.01, lag_p99=30, jobs={"timeout": 1}), thresholds)
+        self.assertEqual(len(violations), 4)
+
+    def test_missing_endpoint_is_a_violation(self):
+        thresholds = {"endpoints": {"POST /api/generate-podcast": {"p95_ms": 500}}}
+        self.assertEqual(check_thresholds(report(), thresholds), ["POST /api/generate-podcast: no requests were made"])
+
+    def test_checked_in_scenarios_load(self):
+        for path in glob.glob(os.path.join(SCENARIO_DIR, "*.json")):
+            with self.subTest(path=os.path.basename(path)):
+                scenario = load_scenario(path)
+                self.assertGreater(scenario["uploaders"], 0)
+                self.assertIn("endpoints", scenario["thresholds"])
+
+
+class TestSmokeScenario(unittest.TestCase):
+    def test_smoke_scenario_passes(self):
+        """Run the smoke scenario against a real uvicorn server with the fake Gemini client."""
+        before = repo_tmp_files()
+        result = run_scenario(load_scenario("smoke"))
+        self.assertEqual(result["violations"], [])
+        # サーバーは作業ディレクトリで動くので、リポジトリの tmp/ には書き込まない
+        self.assertEqual(repo_tmp_files(), before)
+        self.assertEqual(result["jobs"], {"completed": 2})
+        self.assertGreater(result["endpoints"]["GET /api/podcast-status/{job_id}"]["requests"], 0)
+        self.assertIsNotNone(result["event_loop_lag"]["p99_ms"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,6 @@
 import unittest
 
-from app.utils.markdown_processor import split_markdown_advanced, split_markdown_by_h2
+from app.utils.markdown_processor import chunk_title, split_markdown_advanced, split_markdown_by_h2
 
 
 class TestMarkdownProcessor(unittest.TestCase):
@@ -10,8 +10,8 @@ class TestMarkdownProcessor(unittest.TestCase):
         chunks = split_markdown_by_h2(markdown)
 
         self.assertEqual(len(chunks), 1)
-        self.assertEqual(chunks[0]["index"], "START")
-        self.assertEqual(chunks[0]["content"], markdown)
+        self.assertEqual(chunks[0].index, "START")
+        self.assertEqual(chunks[0].content, markdown)
 
     def test_split_markdown_one_h2(self):
         """Test splitting markdown with one h2 header."""
@@ -19,10 +19,10 @@ class TestMarkdownProcessor(unittest.TestCase):
         chunks = split_markdown_by_h2(markdown)
 
         self.assertEqual(len(chunks), 2)
-        self.assertEqual(chunks[0]["index"], "START")
-        self.assertEqual(chunks[0]["content"], "Intro text\n\n")
-        self.assertEqual(chunks[1]["index"], "END")
-        self.assertEqual(chunks[1]["content"], "## Header\n\nContent after header.")
+        self.assertEqual(chunks[0].index, "START")
+        self.assertEqual(chunks[0].content, "Intro text\n\n")
+        self.assertEqual(chunks[1].index, "END")
+        self.assertEqual(chunks[1].content, "## Header\n\nContent after header.")
 
     def test_split_markdown_multiple_h2(self):
         """Test splitting markdown with multiple h2 headers."""
@@ -30,12 +30,12 @@ class TestMarkdownProcessor(unittest.TestCase):
         chunks = split_markdown_by_h2(markdown)
 
         self.assertEqual(len(chunks), 3)
-        self.assertEqual(chunks[0]["index"], "START")
-        self.assertEqual(chunks[0]["content"], "Intro text\n\n## Header 1\n\nContent 1\n\n")
-        self.assertEqual(chunks[1]["index"], "1")
-        self.assertEqual(chunks[1]["content"], "## Header 2\n\nContent 2\n\n")
-        self.assertEqual(chunks[2]["index"], "END")
-        self.assertEqual(chunks[2]["content"], "## Header 3\n\nContent 3")
+        self.assertEqual(chunks[0].index, "START")
+        self.assertEqual(chunks[0].content, "Intro text\n\n## Header 1\n\nContent 1\n\n")
+        self.assertEqual(chunks[1].index, "1")
+        self.assertEqual(chunks[1].content, "## Header 2\n\nContent 2\n\n")
+        self.assertEqual(chunks[2].index, "END")
+        self.assertEqual(chunks[2].content, "## Header 3\n\nContent 3")
 
     def test_split_markdown_no_intro(self):
         """Test splitting markdown with no intro text before first h2."""
@@ -43,10 +43,10 @@ class TestMarkdownProcessor(unittest.TestCase):
         chunks = split_markdown_by_h2(markdown)
 
         self.assertEqual(len(chunks), 2)
-        self.assertEqual(chunks[0]["index"], "START")
-        self.assertEqual(chunks[0]["content"], "## Header 1\n\nContent 1\n\n")
-        self.assertEqual(chunks[1]["index"], "END")
-        self.assertEqual(chunks[1]["content"], "## Header 2\n\nContent 2")
+        self.assertEqual(chunks[0].index, "START")
+        self.assertEqual(chunks[0].content, "## Header 1\n\nContent 1\n\n")
+        self.assertEqual(chunks[1].index, "END")
+        self.assertEqual(chunks[1].content, "## Header 2\n\nContent 2")
 
     def test_split_markdown_advanced_zakkubaran_and_articles(self):
         markdown = (
@@ -66,23 +66,30 @@ class TestMarkdownProcessor(unittest.TestCase):
         )
         chunks = split_markdown_advanced(markdown)
         self.assertEqual(len(chunks), 4)
-        self.assertEqual(chunks[0]["index"], "START")
-        self.assertIn("トピック1", chunks[0]["content"])
-        self.assertEqual(chunks[1]["index"], "END")
-        self.assertIn("トピック2", chunks[1]["content"])
-        self.assertEqual(chunks[2]["index"], "ARTICLE_0")
-        self.assertIn("リンク1", chunks[2]["content"])
-        self.assertIn("コメント1", chunks[2]["content"])
-        self.assertEqual(chunks[3]["index"], "ARTICLE_1")
-        self.assertIn("リンク2", chunks[3]["content"])
-        self.assertIn("コメント2", chunks[3]["content"])
+        self.assertEqual(chunks[0].index, "START")
+        self.assertIn("トピック1", chunks[0].content)
+        self.assertEqual(chunks[1].index, "END")
+        self.assertIn("トピック2", chunks[1].content)
+        self.assertEqual(chunks[2].index, "ARTICLE_0")
+        self.assertIn("リンク1", chunks[2].content)
+        self.assertIn("コメント1", chunks[2].content)
+        self.assertEqual(chunks[3].index, "ARTICLE_1")
+        self.assertIn("リンク2", chunks[3].content)
+        self.assertIn("コメント2", chunks[3].content)
 
     def test_split_markdown_advanced_fallback(self):
         markdown = "# タイトル\n\n本文だけでh2も記事セクションもないよ"
         chunks = split_markdown_advanced(markdown)
         self.assertEqual(len(chunks), 1)
-        self.assertEqual(chunks[0]["index"], "START")
-        self.assertIn("本文だけ", chunks[0]["content"])
+        self.assertEqual(chunks[0].index, "START")
+        self.assertIn("本文だけ", chunks[0].content)
+
+    def test_chunk_title(self):
+        """Chapter titles come from the article link, then the h2 heading, then the first line."""
+        self.assertEqual(chunk_title("[リンク1](https://example.com/1)\nコメント1\n"), "リンク1")
+        self.assertEqual(chunk_title("# 今週のざっくばらん\n\n## トピック1\n内容1\n"), "トピック1")
+        self.assertEqual(chunk_title("# タイトル\n\n本文"), "タイトル")
+        self.assertEqual(chunk_title("\n本文だけ\n"), "本文だけ")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,102 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from app.utils.mp3 import (
+    _info_frame,
+    concatenate_mp3_files,
+    encode_pool,
+    parse_frame_header,
+    read_mp3_segment,
+)
+
+# MPEG2 Layer III, 24kHz, 64kbps, モノラル（Gemini TTSの出力を64kでエンコードしたときの形式）
+FRAME_HEADER = bytes([0xFF, 0xF3, 0x84, 0xC0])
+FRAME_SIZE = 192
+FRAME_SAMPLES = 576
+
+
+def audio_frame(value: int, header: bytes = FRAME_HEADER) -> bytes:
+    size = parse_frame_header(header).size
+    return header + bytes([value]) * (size - 4)
+
+
+class TestMp3(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def write_segment(self, name, values, delay=1105, padding=0, header=FRAME_HEADER):
+        """Write an MP3 file as an encoder would: ID3v2 tag, Info frame, audio frames and ID3v1 tag."""
+        info = _info_frame(header, parse_frame_header(header), len(values), len(values) * FRAME_SIZE, delay, padding)
+        path = os.path.join(self.test_dir, name)
+        with open(path, "wb") as f:
+            f.write(b"ID3\x04\x00\x00\x00\x00\x00\x05" + b"\x00" * 5)
+            f.write(info)
+            f.write(b"".join(audio_frame(v, header) for v in values))
+            f.write(b"TAG" + b"\x00" * 125)
+        return path
+
+    def test_parse_frame_header(self):
+        header = parse_frame_header(FRAME_HEADER)
+        self.assertEqual((header.sample_rate, header.bitrate, header.mono), (24000, 64000, True))
+        self.assertEqual((header.size, header.samples), (FRAME_SIZE, FRAME_SAMPLES))
+        self.assertIsNone(parse_frame_header(b"ID3\x03"))
+
+    def test_read_segment_skips_tags_and_info_frame(self):
+        path = self.write_segment("a.mp3", [1, 2, 3], delay=1105, padding=700)
+        segment = read_mp3_segment(path)
+        self.assertEqual(len(segment.frame_ends), 3)
+        self.assertEqual((segment.delay, segment.padding), (1105, 700))
+        self.assertEqual(segment.data[segment.start + 4], 1)
+
+    def test_concatenate_frames_drops_seam_padding(self):
+        """Padding-only frames at a seam are dropped and one Info frame covers the whole file."""
+        files = [
+            self.write_segment("a.mp3", list(range(1, 11)), padding=1000),
+            self.write_segment("b.mp3", list(range(11, 19)), padding=700),
+        ]
+        output = os.path.join(self.test_dir, "out.mp3")
+        chapters = concatenate_mp3_files(files, output, [{"index": "START", "title": "冒頭"}, {"index": "END", "title": "B"}])
+
+        # 1つ目の末尾パディング（1000サンプル）のうち1フレーム分を落とす。2つ目のエンコーダ遅延は継ぎ目に残る
+        self.assertEqual([(c["start_sample"], c["end_sample"]) for c in chapters], [(0, 3655), (5184, 7987)])
+        self.assertEqual([(c["start_ms"], c["end_ms"]) for c in chapters], [(0, 152), (216, 332)])
+
+        segment = read_mp3_segment(output)
+        self.assertEqual((segment.delay, segment.padding), (1105, 700))
+        values = [segment.data[end - 1] for end in segment.frame_ends]
+        self.assertEqual(values, list(range(1, 10)) + list(range(11, 19)))
+        info_offset = segment.start - FRAME_SIZE + 4 + 9
+        frame_count = struct.unpack(">I", segment.data[info_offset + 8 : info_offset + 12])[0]
+        self.assertEqual(frame_count, 17)
+
+    def test_encode_pool_spawns_workers(self):
+        """Encoder workers are spawned, not forked from the threaded API server."""
+        self.assertEqual(encode_pool()._mp_context.get_start_method(), "spawn")
+
+    def test_chapters_are_written_as_id3_chap_frames(self):
+        files = [self.write_segment("a.mp3", [1]), self.write_segment("b.mp3", [2])]
+        output = os.path.join(self.test_dir, "out.mp3")
+        concatenate_mp3_files(files, output, [{"index": "START", "title": "冒頭"}, {"index": "END", "title": "記事"}])
+        with open(output, "rb") as f:
+            data = f.read()
+        self.assertTrue(data.startswith(b"ID3\x03"))
+        self.assertEqual(data.count(b"CHAP"), 2)
+        self.assertIn(b"CTOC", data)
+        self.assertIn("END 記事".encode("utf-16-le"), data)
+
+    def test_mismatched_formats_are_not_concatenated(self):
+        # 同じMPEG2でも22.05kHzのフレーム
+        other = bytes([0xFF, 0xF3, 0x80, 0xC0])
+        files = [self.write_segment("a.mp3", [1]), self.write_segment("b.mp3", [2], header=other)]
+        self.assertIsNone(concatenate_mp3_files(files, os.path.join(self.test_dir, "out.mp3")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,204 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import wave
+from typing import ClassVar, List
+from unittest import mock
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import podcast
+from app.utils.estimator import StageEstimator
+from app.utils.job_registry import JobRegistry
+from app.utils.podcast_generator import PodcastGenerator
+from app.utils.scheduler import ChunkScheduler
+from app.utils.storage import LocalStorage
+
+ISSUE = "# 今週のざっくばらん\n\n## AIと仕事\n本文A\n## 日本の教育\n本文B\n# 私の目に止まった記事\n[記事1](http://a)\n感想1\n"
+
+
+class FakeGenerator(PodcastGenerator):
+    """PodcastGenerator with the Gemini calls replaced by canned scripts and silent audio."""
+
+    script_calls: ClassVar[List[str]] = []
+    # セットされるまで台本生成を止めておく（実行中のキャンセルのテスト用）
+    gate = None
+    started = None
+
+    def __init__(self, api_key: str):
+        pass
+
+    def generate_script(self, chunk):
+        FakeGenerator.script_calls.append(chunk.content)
+        if FakeGenerator.started is not None:
+            FakeGenerator.started.set()
+        if FakeGenerator.gate is not None:
+            FakeGenerator.gate.wait(5)
+        return "Minami: こんにちは\nNakajima: はい"
+
+    def generate_audio(self, script, output_file, cancel_event=None):
+        audio_file = output_file + ".wav"
+        with wave.open(audio_file, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(24000)
+            f.writeframes(b"\x00\x00" * 2400)
+        return audio_file
+
+
+def upload(client, markdown=ISSUE, **data):
+    return client.post("/api/generate-podcast", files={"file": ("issue.md", markdown.encode(), "text/markdown")}, data=data)
+
+
+class TestPodcastApi(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        # ジョブはカレントディレクトリの tmp/ にチャンクを書き出すので、リポジトリを汚さないように移動する
+        self.cwd = os.getcwd()
+        os.chdir(self.test_dir)
+        FakeGenerator.script_calls = []
+        FakeGenerator.gate = None
+        FakeGenerator.started = None
+        self.scheduler = ChunkScheduler(max_concurrency=2)
+        self.registry = JobRegistry()
+        patches = [
+            mock.patch.object(podcast, "storage", LocalStorage(os.path.join(self.test_dir, "storage"))),
+            mock.patch.object(podcast, "job_registry", self.registry),
+            mock.patch.object(podcast, "scheduler", self.scheduler),
+            mock.patch.object(podcast, "estimator", StageEstimator()),
+            mock.patch.object(podcast, "hedge_policy", None),
+            mock.patch.object(podcast, "BOILERPLATE_SIMILARITY", 0.0),
+            mock.patch.object(podcast, "OUTPUT_FORMAT", "wav"),
+            mock.patch.object(podcast, "PodcastGenerator", FakeGenerator),
+            mock.patch.object(podcast.tempfile, "gettempdir", return_value=os.path.join(self.test_dir, "jobs")),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.app = FastAPI()
+        self.app.include_router(podcast.router, prefix="/api")
+        self.app.dependency_overrides[podcast.get_gemini_api_key] = lambda: "test_api_key"
+        self.client = TestClient(self.app)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def status(self, job_id):
+        return self.client.get(f"/api/podcast-status/{job_id}").json()
+
+    def test_identical_upload_joins_completed_job(self):
+        """Re-uploading the same issue with the same options returns the finished job."""
+        first = upload(self.client).json()
+        self.assertEqual(self.status(first["job_id"])["status"], "completed")
+        calls = len(FakeGenerator.script_calls)
+
+        second = upload(self.client).json()
+        self.assertEqual(second["job_id"], first["job_id"])
+        self.assertEqual(second["status"], "completed")
+        self.assertEqual(len(FakeGenerator.script_calls), calls)
+
+    def test_different_options_start_a_new_job(self):
+        """The same issue uploaded with other options is not joined."""
+        first = upload(self.client).json()
+        for options in ({"preview": "true"}, {"priority": "5"}):
+            with self.subTest(options=options):
+                other = upload(self.client, **options).json()
+                self.assertNotEqual(other["job_id"], first["job_id"])
+                self.assertEqual(self.status(other["job_id"])["status"], "completed")
+
+    def test_cancel_after_completion_is_rejected(self):
+        """A finished job cannot be cancelled and keeps its completed status."""
+        job_id = upload(self.client).json()["job_id"]
+        response = self.client.post(f"/api/cancel-podcast/{job_id}")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.status(job_id)["status"], "completed")
+
+    def test_cancel_unknown_job(self):
+        self.assertEqual(self.client.post("/api/cancel-podcast/job_0000000000000000").status_code, 404)
+
+    def test_cancel_running_job(self):
+        """Cancelling mid-run stops the job, leaves it cancelled and releases the scheduler slots."""
+        FakeGenerator.gate = threading.Event()
+        FakeGenerator.started = threading.Event()
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=self.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                # アップロードのリクエストはバックグラウンドのジョブが終わるまで返らないので、並行して進める
+                job = asyncio.ensure_future(upload(client))
+                await asyncio.to_thread(FakeGenerator.started.wait, 5)
+                [job_id] = podcast.live_traces
+                cancelled = await client.post(f"/api/cancel-podcast/{job_id}")
+                FakeGenerator.gate.set()
+                await job
+                return job_id, cancelled
+
+        job_id, cancelled = asyncio.run(scenario())
+        self.assertEqual(cancelled.status_code, 200)
+        self.assertEqual(cancelled.json()["status"], "cancelled")
+        status = self.status(job_id)
+        self.assertEqual(status["status"], "cancelled")
+        self.assertIsNone(status["result_file"])
+        self.assertEqual(self.scheduler.running, 0)
+        # 止めたときに実行中だった台本生成のほかは呼ばれない
+        self.assertLessEqual(len(FakeGenerator.script_calls), self.scheduler.max_concurrency)
+        # キャンセルしたジョブには合流せず、新しいジョブになる
+        FakeGenerator.gate = None
+        self.assertNotEqual(upload(self.client).json()["job_id"], job_id)
+
+    def test_revised_upload_reuses_unchanged_chunks(self):
+        """Only the chunks changed since previous_job_id are generated again."""
+        first = upload(self.client).json()
+        chunk_count = self.status(first["job_id"])["chunk_count"]
+        calls = len(FakeGenerator.script_calls)
+
+        revised = upload(self.client, ISSUE.replace("本文B", "本文B（訂正）"), previous_job_id=first["job_id"]).json()
+        status = self.status(revised["job_id"])
+        self.assertEqual(status["status"], "completed")
+        self.assertEqual(status["previous_job_id"], first["job_id"])
+        self.assertEqual(status["reused_chunks"], chunk_count - 1)
+        # 見積もりも再生成するチャンクの分だけ（台本とTTSの2回）
+        self.assertEqual(first["estimate"]["api_calls"], 2 * chunk_count)
+        self.assertEqual(revised["estimate"]["api_calls"], 2)
+        [regenerated] = FakeGenerator.script_calls[calls:]
+        self.assertIn("本文B(訂正)", regenerated)
+        self.assertEqual(len(self.client.get(f"/api/podcast-chapters/{revised['job_id']}").json()), chunk_count)
+
+    def test_missing_reused_audio_is_regenerated(self):
+        """If a planned chunk's audio disappears before it is copied, that chunk is generated instead."""
+        first = upload(self.client).json()
+        chunk_count = self.status(first["job_id"])["chunk_count"]
+        calls = len(FakeGenerator.script_calls)
+        copyfile = shutil.copyfile
+
+        def copy_or_vanish(src, dst):
+            if os.path.basename(src).startswith("chunk_0."):
+                raise FileNotFoundError(src)
+            return copyfile(src, dst)
+
+        with mock.patch.object(podcast.shutil, "copyfile", side_effect=copy_or_vanish):
+            revised = upload(self.client, ISSUE.replace("本文B", "本文B（訂正）"), previous_job_id=first["job_id"]).json()
+        status = self.status(revised["job_id"])
+        self.assertEqual(status["status"], "completed")
+        self.assertEqual(status["reused_chunks"], chunk_count - 2)
+        self.assertEqual(len(FakeGenerator.script_calls) - calls, 2)
+        self.assertEqual(len(self.client.get(f"/api/podcast-chapters/{revised['job_id']}").json()), chunk_count)
+
+    def test_unknown_or_invalid_previous_job_is_rejected(self):
+        """previous_job_id must name a finished job of this service."""
+        for previous_job_id in ("job_0000000000000000", "../storage/job_0000000000000000", "other-service-job"):
+            with self.subTest(previous_job_id=previous_job_id):
+                response = upload(self.client, previous_job_id=previous_job_id)
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(FakeGenerator.script_calls, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
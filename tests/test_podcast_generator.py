@@ -5,6 +5,7 @@ import tempfile
 import shutil
 
 from app.utils.podcast_generator import PodcastGenerator
+from app.utils.records import Chunk
 
 
 class TestPodcastGenerator(unittest.TestCase):
@@ -92,6 +93,43 @@ class TestPodcastGenerator(unittest.TestCase):
         expected = script.replace('\n\n\n', '\n\n').replace('\n\n', '\n')
         self.assertEqual(reconstructed, expected)
 
+    def test_process_markdown_chunks_keeps_programme_order(self):
+        """Audio of more than 10 chunks (some with split scripts) is concatenated in programme order."""
+        chunks = [Chunk(i, str(i), f"chunk {i}") for i in range(12)]
+        # 文字列でソートすると "10" が "2" より前に来てしまう
+        self.generator.generate_script = lambda chunk: f"Minami: {chunk.ordinal}\nNakajima: {chunk.ordinal}"
+        self.generator.split_script = lambda script: script.split("\n") if script.endswith(" 2") else [script]
+        self.generator.generate_audio = lambda script, output_file, cancel_event=None: output_file + ".wav"
+        self.generator.concatenate_audio_files = Mock(side_effect=lambda files, output: output)
+
+        cwd = os.getcwd()
+        os.chdir(self.test_dir)
+        try:
+            self.generator.process_markdown_chunks(chunks)
+        finally:
+            os.chdir(cwd)
+
+        files = [os.path.basename(f) for f in self.generator.concatenate_audio_files.call_args[0][0]]
+        expected = ["chunk_0", "chunk_1", "chunk_2_1", "chunk_2_2"] + [f"chunk_{i}" for i in range(3, 12)]
+        self.assertEqual(files, [f"{name}.wav" for name in expected])
+
+    def test_process_markdown_chunks_skips_invalid_script(self):
+        """A chunk whose script never passes validation is skipped instead of failing the podcast."""
+        chunks = [Chunk(i, str(i), f"chunk {i}") for i in range(3)]
+        self.generator.generate_script = lambda chunk: "" if chunk.ordinal == 1 else f"Minami: {chunk.ordinal}"
+        self.generator.generate_audio = lambda script, output_file, cancel_event=None: output_file + ".wav"
+        self.generator.concatenate_audio_files = Mock(side_effect=lambda files, output: output)
+
+        cwd = os.getcwd()
+        os.chdir(self.test_dir)
+        try:
+            self.generator.process_markdown_chunks(chunks)
+        finally:
+            os.chdir(cwd)
+
+        files = [os.path.basename(f) for f in self.generator.concatenate_audio_files.call_args[0][0]]
+        self.assertEqual(files, ["chunk_0.wav", "chunk_2.wav"])
+
     @patch('app.utils.podcast_generator.genai.Client')
     def test_init_with_api_key(self, mock_client):
         """Test PodcastGenerator initialization with API key."""
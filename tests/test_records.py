@@ -0,0 +1,27 @@
+import unittest
+
+from app.utils.records import Chunk, Script, Segment
+
+
+class TestRecords(unittest.TestCase):
+    def test_chunk_fields(self):
+        chunk = Chunk(3, "3", "## 見出し")
+        self.assertEqual((chunk.index, chunk.content), ("3", "## 見出し"))
+        self.assertEqual(chunk.as_dict(), {"ordinal": 3, "index": "3", "content": "## 見出し"})
+        self.assertEqual(repr(chunk), "Chunk(ordinal=3, index='3', content='## 見出し')")
+        # 辞書のようなアクセスは廃止した
+        with self.assertRaises(TypeError):
+            chunk["index"]
+
+    def test_records_have_no_instance_dict(self):
+        with self.assertRaises(AttributeError):
+            Chunk(0, "START", "").extra = 1
+        self.assertFalse(hasattr(Segment(0, 0, None), "__dict__"))
+
+    def test_scripts_order_numerically(self):
+        scripts = [Script(10, 0, "c"), Script(2, 2, "b"), Script(2, 1, "a")]
+        self.assertEqual([s.name for s in sorted(scripts, key=lambda s: s.order)], ["chunk_2_1", "chunk_2_2", "chunk_10"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import asyncio
+import contextvars
+import threading
+import unittest
+
+from app.utils.job_registry import JobCancelled
+from app.utils.scheduler import ChunkScheduler
+
+
+class TestChunkScheduler(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.scheduler = ChunkScheduler(max_concurrency=1)
+        self.order = []
+        self.gate = threading.Event()
+
+    def record(self, label):
+        self.order.append(label)
+        return label
+
+    async def start_blocker(self):
+        """Occupy the single slot until the gate opens, so that the queues can be filled first."""
+        blocker = asyncio.ensure_future(self.scheduler.run("blocker", self.gate.wait))
+        await asyncio.sleep(0)
+        return blocker
+
+    async def test_returns_result(self):
+        """run() returns the value of the blocking call."""
+        self.assertEqual(await self.scheduler.run("job_a", self.record, "a0"), "a0")
+
+    async def test_concurrency_is_bounded(self):
+        """No more than max_concurrency calls run at once."""
+        scheduler = ChunkScheduler(max_concurrency=2)
+        lock = threading.Lock()
+        active = [0]
+        peak = [0]
+
+        def work():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            threading.Event().wait(0.02)
+            with lock:
+                active[0] -= 1
+
+        await asyncio.gather(*(scheduler.run(f"job_{i % 3}", work) for i in range(8)))
+        self.assertEqual(peak[0], 2)
+        self.assertEqual(scheduler.running, 0)
+
+    async def test_borrowed_slot_counts_against_the_limit(self):
+        """A slot lent to a hedge is not used by queued calls until it is given back."""
+        scheduler = ChunkScheduler(max_concurrency=2)
+        await scheduler.run("job_a", self.record, "warm")
+        self.assertTrue(scheduler.try_borrow())
+        blocker = asyncio.ensure_future(scheduler.run("blocker", self.gate.wait))
+        await asyncio.sleep(0)
+        self.assertFalse(scheduler.try_borrow())
+        queued = asyncio.ensure_future(scheduler.run("job_a", self.record, "a0"))
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.order, ["warm"])
+        await asyncio.to_thread(scheduler.give_back)
+        await queued
+        self.gate.set()
+        await blocker
+        self.assertEqual(self.order, ["warm", "a0"])
+        self.assertEqual(scheduler.running, 0)
+
+    async def test_jobs_are_interleaved(self):
+        """A large job does not starve a small one queued after it."""
+        blocker = await self.start_blocker()
+        calls = [self.scheduler.run("job_a", self.record, f"a{i}") for i in range(4)]
+        calls += [self.scheduler.run("job_b", self.record, f"b{i}") for i in range(2)]
+        pending = asyncio.gather(*calls)
+        await asyncio.sleep(0)
+        self.gate.set()
+        await asyncio.gather(blocker, pending)
+        self.assertEqual(self.order, ["a0", "b0", "a1", "b1", "a2", "a3"])
+
+    async def test_priority_is_weight(self):
+        """A job with priority 2 gets twice the slots of a priority 1 job."""
+        self.scheduler.set_priority("job_a", 2)
+        blocker = await self.start_blocker()
+        calls = [self.scheduler.run("job_a", self.record, f"a{i}") for i in range(4)]
+        calls += [self.scheduler.run("job_b", self.record, f"b{i}") for i in range(4)]
+        pending = asyncio.gather(*calls)
+        await asyncio.sleep(0)
+        self.gate.set()
+        await asyncio.gather(blocker, pending)
+        self.assertEqual(self.order[:6], ["a0", "b0", "a1", "a2", "b1", "a3"])
+
+    async def test_preview_lane_runs_first(self):
+        """Preview calls are served before queued regular calls."""
+        blocker = await self.start_blocker()
+        regular = asyncio.gather(*(self.scheduler.run("job_a", self.record, f"a{i}") for i in range(3)))
+        preview = self.scheduler.run("job_b", self.record, "preview", preview=True)
+        pending = asyncio.gather(regular, preview)
+        await asyncio.sleep(0)
+        self.gate.set()
+        await asyncio.gather(blocker, pending)
+        self.assertEqual(self.order[0], "preview")
+
+    async def test_cancel_job_drops_queued_calls(self):
+        """Cancelling a job fails its queued calls and rejects new ones."""
+        blocker = await self.start_blocker()
+        queued = asyncio.ensure_future(self.scheduler.run("job_a", self.record, "a0"))
+        other = asyncio.ensure_future(self.scheduler.run("job_b", self.record, "b0"))
+        await asyncio.sleep(0)
+
+        self.assertEqual(self.scheduler.cancel_job("job_a"), 1)
+        with self.assertRaises(JobCancelled):
+            await queued
+        with self.assertRaises(JobCancelled):
+            await self.scheduler.run("job_a", self.record, "a1")
+
+        self.gate.set()
+        await asyncio.gather(blocker, other)
+        self.assertEqual(self.order, ["b0"])
+
+        self.scheduler.remove_job("job_a")
+        self.assertEqual(await self.scheduler.run("job_a", self.record, "a2"), "a2")
+
+    async def test_context_is_propagated(self):
+        """Calls see the context variables of the coroutine that queued them."""
+        var = contextvars.ContextVar("var", default=None)
+
+        async def queue_with(value):
+            var.set(value)
+            return await self.scheduler.run("job_a", var.get)
+
+        self.assertEqual(await asyncio.gather(queue_with("x"), queue_with("y")), ["x", "y"])
+
+
+if __name__ == "__main__":
+    unittest.main()
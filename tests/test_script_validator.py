@@ -0,0 +1,95 @@
+import unittest
+
+from app.utils.script_validator import InvalidScript, ValidationStats, generate_valid_script, validate_script
+from app.utils.tracing import JobTrace, trace_span
+
+VALID_SCRIPT = "Minami: さあ、次のコーナーです。[pause 0.6sec]\n\nNakajima: はい。[pause 1.0sec]"
+
+
+class TestValidateScript(unittest.TestCase):
+    def test_valid_script_is_unchanged(self):
+        result = validate_script(VALID_SCRIPT)
+        self.assertTrue(result.ok)
+        self.assertEqual(result.repairs, [])
+        self.assertEqual(result.script, VALID_SCRIPT)
+
+    def test_speaker_labels_are_normalized(self):
+        script = "**Minami:** こんにちは\nナカジマ：はい\nminami (アナウンサー): 次です\n中島聡さん: どうも"
+        result = validate_script(script)
+        self.assertTrue(result.ok)
+        self.assertEqual(result.repairs, ["speaker_label"])
+        self.assertEqual(result.script, "Minami: こんにちは\nNakajima: はい\nMinami: 次です\nNakajima: どうも")
+
+    def test_fences_and_headings_are_stripped(self):
+        script = "```\n## オープニング\n" + VALID_SCRIPT + "\n```"
+        result = validate_script(script)
+        self.assertTrue(result.ok)
+        self.assertEqual(result.repairs, ["fence", "heading"])
+        self.assertEqual(result.script, VALID_SCRIPT)
+
+    def test_unknown_speaker_is_rejected(self):
+        result = validate_script(VALID_SCRIPT + "\nHost: welcome")
+        self.assertEqual(result.problems, ["unknown_speaker:Host"])
+
+    def test_japanese_colon_in_dialogue_is_not_a_speaker(self):
+        """Lines such as "ポイント：..." inside a turn are kept as they are."""
+        result = validate_script(VALID_SCRIPT + "\nポイント：三つあります\nhttps://example.com")
+        self.assertTrue(result.ok)
+
+    def test_empty_and_oversized_scripts_are_rejected(self):
+        self.assertEqual(validate_script(None).problems, ["empty"])
+        self.assertEqual(validate_script("```\n```").problems, ["empty"])
+        self.assertEqual(validate_script("今日は台本がありません").problems, ["empty"])
+        self.assertEqual(validate_script(VALID_SCRIPT, max_chars=10).problems, ["oversized"])
+
+
+class TestGenerateValidScript(unittest.TestCase):
+    def test_only_bad_scripts_are_re_requested(self):
+        responses = iter(["", "Host: hi", "```\n" + VALID_SCRIPT + "\n```"])
+        calls = []
+
+        def generate():
+            calls.append(1)
+            return next(responses)
+
+        stats = ValidationStats()
+        self.assertEqual(generate_valid_script(generate, stats), VALID_SCRIPT)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(stats.as_dict(), {"valid": 0, "repaired": 1, "rejected": 2, "failed": 0})
+
+    def test_valid_script_is_requested_once(self):
+        stats = ValidationStats()
+        generate_valid_script(lambda: VALID_SCRIPT, stats)
+        self.assertEqual(stats.as_dict(), {"valid": 1, "repaired": 0, "rejected": 0, "failed": 0})
+
+    def test_gives_up_after_max_attempts(self):
+        stats = ValidationStats()
+        with self.assertRaises(InvalidScript):
+            generate_valid_script(lambda: "", stats, max_attempts=2)
+        self.assertEqual(stats.as_dict(), {"valid": 0, "repaired": 0, "rejected": 1, "failed": 1})
+
+    def test_attempts_are_traced_with_retry_reason(self):
+        """Each request gets its own span, and re-requests carry the problems that caused them."""
+        responses = iter(["", "Host: hi", VALID_SCRIPT])
+        trace = JobTrace("job_test")
+
+        def generate():
+            with trace_span("generate_content", "api"):
+                return next(responses)
+
+        with trace.span("script", "stage"):
+            generate_valid_script(generate)
+
+        events = [e for e in trace.to_chrome_trace()["traceEvents"] if e["ph"] == "X"]
+        attempts = [e["args"] for e in events if e["name"] == "script_attempt"]
+        self.assertEqual([a["attempt"] for a in attempts], [1, 2, 3])
+        self.assertNotIn("retry_reason", attempts[0])
+        self.assertEqual(attempts[1]["retry_reason"], ["empty"])
+        self.assertIn("unknown_speaker:Host", attempts[2]["retry_reason"])
+        self.assertEqual(attempts[2]["problems"], [])
+        calls = [e["args"] for e in events if e["name"] == "generate_content"]
+        self.assertEqual([c["parent_id"] for c in calls], [a["span_id"] for a in attempts])
+
+
+if __name__ == "__main__":
+    unittest.main()
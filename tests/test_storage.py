@@ -0,0 +1,164 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.utils.http_range import ranged_blob_response
+from app.utils.storage import LocalStorage, S3Storage, storage_from_env
+
+
+class FakeClientError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class FakeS3Client:
+    """In-memory stand-in for a MinIO/S3 server implementing the calls S3Storage uses."""
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.calls = []
+
+    def put_object(self, Bucket, Key, Body):
+        self.calls.append("put_object")
+        self.objects[(Bucket, Key)] = (bytes(Body), datetime.now(timezone.utc))
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise FakeClientError("404")
+        data, modified = self.objects[(Bucket, Key)]
+        return {"ContentLength": len(data), "ETag": f'"{hash(data) & 0xFFFFFFFF:x}"', "LastModified": modified}
+
+    def get_object(self, Bucket, Key, Range=None):
+        if (Bucket, Key) not in self.objects:
+            raise FakeClientError("NoSuchKey")
+        data = self.objects[(Bucket, Key)][0]
+        if Range:
+            start, _, end = Range[len("bytes=") :].partition("-")
+            data = data[int(start) : int(end) + 1 if end else None]
+        return {"Body": io.BytesIO(data)}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = f"upload-{len(self.uploads)}"
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.calls.append(f"upload_part:{len(Body)}")
+        self.uploads[UploadId][PartNumber] = bytes(Body)
+        return {"ETag": f'"part{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        data = b"".join(parts[p["PartNumber"]] for p in MultipartUpload["Parts"])
+        self.objects[(Bucket, Key)] = (data, datetime.now(timezone.utc))
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.calls.append("abort")
+        self.uploads.pop(UploadId)
+
+
+class TestLocalStorage(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.storage = LocalStorage(self.test_dir)
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_write_and_read(self):
+        self.storage.write_bytes("job_1/final_podcast.wav", b"0123456789")
+        self.assertEqual(self.storage.read_bytes("job_1/final_podcast.wav"), b"0123456789")
+        self.assertEqual(b"".join(self.storage.iter_range("job_1/final_podcast.wav", 2, 4)), b"234")
+        self.assertEqual(self.storage.stat("job_1/final_podcast.wav").size, 10)
+        self.assertIsNone(self.storage.read_bytes("missing.json"))
+
+    def test_failed_write_leaves_no_blob(self):
+        with self.assertRaises(RuntimeError):
+            with self.storage.open_write("job_1_status.json") as f:
+                f.write(b"partial")
+                raise RuntimeError("boom")
+        self.assertFalse(self.storage.exists("job_1_status.json"))
+        self.assertEqual(os.listdir(self.test_dir), [])
+
+    def test_keys_cannot_escape_root(self):
+        with self.assertRaises(ValueError):
+            self.storage.write_bytes("../outside.json", b"x")
+        self.assertFalse(self.storage.exists("../../etc/passwd"))
+
+
+class TestS3Storage(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeS3Client()
+        self.storage = S3Storage("podcasts", prefix="prod/", client=self.client)
+        self.storage.part_size = 4  # テスト用にパートを小さくする
+
+    def test_small_blob_uses_single_put(self):
+        self.storage.write_bytes("job_1_status.json", b"{}")
+        self.assertEqual(self.client.calls, ["put_object"])
+        self.assertIn(("podcasts", "prod/job_1_status.json"), self.client.objects)
+        self.assertEqual(self.storage.read_bytes("job_1_status.json"), b"{}")
+
+    def test_large_blob_is_streamed_in_parts(self):
+        with self.storage.open_write("job_1/final_podcast.wav") as f:
+            for piece in (b"abc", b"defgh", b"ij"):
+                f.write(piece)
+        self.assertEqual(self.client.calls, ["upload_part:4", "upload_part:4", "upload_part:2"])
+        self.assertEqual(self.storage.read_bytes("job_1/final_podcast.wav"), b"abcdefghij")
+        self.assertEqual(b"".join(self.storage.iter_range("job_1/final_podcast.wav", 3, 5)), b"def")
+
+    def test_failed_upload_is_aborted(self):
+        with self.assertRaises(RuntimeError):
+            with self.storage.open_write("job_1/final_podcast.wav") as f:
+                f.write(b"abcdefgh")
+                raise RuntimeError("boom")
+        self.assertEqual(self.client.calls[-1], "abort")
+        self.assertFalse(self.storage.exists("job_1/final_podcast.wav"))
+
+    def test_stat_of_missing_blob(self):
+        self.assertIsNone(self.storage.stat("missing"))
+        self.assertFalse(self.storage.exists(None))
+
+    def test_ranged_download_from_s3(self):
+        content = bytes(range(256)) * 4
+        self.storage.write_bytes("job_1/final_podcast.wav", content)
+        app = FastAPI()
+
+        @app.get("/file")
+        async def serve(request: Request):
+            return ranged_blob_response(request, self.storage, "job_1/final_podcast.wav", "podcast.wav")
+
+        client = TestClient(app)
+        response = client.get("/file", headers={"Range": "bytes=1000-"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, content[1000:])
+        self.assertEqual(response.headers["content-type"], "audio/wav")
+
+
+class TestStorageFromEnv(unittest.TestCase):
+    def test_local_is_default(self):
+        storage = storage_from_env("/tmp/podcast-storage")
+        self.assertIsInstance(storage, LocalStorage)
+
+    def test_s3_requires_bucket(self):
+        os.environ["STORAGE_BACKEND"] = "s3"
+        try:
+            with self.assertRaises(ValueError):
+                storage_from_env("/tmp/podcast-storage")
+        finally:
+            del os.environ["STORAGE_BACKEND"]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import unittest
+
+from app.utils.tracing import JobTrace, trace_span
+
+
+class TestJobTrace(unittest.TestCase):
+    def test_nested_spans_record_parent(self):
+        """Spans opened inside another span are attached to it."""
+        trace = JobTrace("job_test")
+        with trace.span("job", "job"):
+            with trace.span("scripts", "stage"):
+                with trace_span("generate_content", "api", prompt_bytes=10) as span:
+                    span.set(response_bytes=20)
+
+        events = [e for e in trace.to_chrome_trace()["traceEvents"] if e["ph"] == "X"]
+        by_name = {e["name"]: e for e in events}
+        self.assertIsNone(by_name["job"]["args"]["parent_id"])
+        self.assertEqual(by_name["scripts"]["args"]["parent_id"], by_name["job"]["args"]["span_id"])
+        self.assertEqual(by_name["generate_content"]["args"]["parent_id"], by_name["scripts"]["args"]["span_id"])
+        self.assertEqual(by_name["generate_content"]["args"]["prompt_bytes"], 10)
+        self.assertEqual(by_name["generate_content"]["args"]["response_bytes"], 20)
+
+    def test_trace_span_without_active_trace(self):
+        """trace_span() is a no-op outside of a job trace."""
+        with trace_span("generate_content", "api") as span:
+            span.set(response_bytes=1)
+
+    def test_span_propagates_to_thread(self):
+        """Spans opened in asyncio.to_thread() keep the caller's parent and lane."""
+        trace = JobTrace("job_test")
+
+        def call_api():
+            with trace_span("generate_content", "api"):
+                pass
+
+        async def run():
+            with trace.span("chunk", "chunk", lane=3):
+                await asyncio.to_thread(call_api)
+
+        asyncio.run(run())
+        events = {e["name"]: e for e in trace.to_chrome_trace()["traceEvents"] if e["ph"] == "X"}
+        self.assertEqual(events["generate_content"]["tid"], 3)
+        self.assertEqual(events["generate_content"]["args"]["parent_id"], events["chunk"]["args"]["span_id"])
+
+    def test_error_and_in_progress_spans(self):
+        """Failed spans record the error and open spans are marked in progress."""
+        trace = JobTrace("job_test")
+        with self.assertRaises(ValueError):
+            with trace.span("tts", "chunk"):
+                raise ValueError("boom")
+
+        with trace.span("job", "job"):
+            exported = trace.to_chrome_trace()
+
+        events = {e["name"]: e for e in exported["traceEvents"] if e["ph"] == "X"}
+        self.assertIn("boom", events["tts"]["args"]["error"])
+        self.assertTrue(events["job"]["args"]["in_progress"])
+        self.assertGreaterEqual(events["job"]["dur"], 0)
+
+    def test_chrome_trace_is_json_serializable(self):
+        """The exported trace contains lane metadata and serializes to JSON."""
+        trace = JobTrace("job_test")
+        trace.name_lane(1, "chunk START")
+        with trace.span("script", "chunk", lane=1):
+            pass
+
+        exported = json.loads(json.dumps(trace.to_chrome_trace()))
+        thread_names = [e["args"]["name"] for e in exported["traceEvents"] if e["name"] == "thread_name"]
+        self.assertIn("chunk START", thread_names)
+        self.assertEqual(exported["otherData"]["job_id"], "job_test")
+
+
+if __name__ == "__main__":
+    unittest.main()
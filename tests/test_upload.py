@@ -0,0 +1,139 @@
+import asyncio
+import codecs
+import io
+import unittest
+from unittest import mock
+
+from fastapi import FastAPI, UploadFile
+from fastapi.testclient import TestClient
+
+from app.utils import upload
+from app.utils.job_registry import content_hash
+from app.utils.upload import (
+    MULTIPART_OVERHEAD_BYTES,
+    TextNormalizer,
+    UnsupportedEncoding,
+    UploadLimitMiddleware,
+    UploadTooLarge,
+    ingest_upload,
+)
+
+ISSUE = "# 週刊 Life is Beautiful\r\n\r\n## 今週のざっくばらん\r\nＡＩエージェントとｿﾌﾄｳｪｱ開発について考えます。\r\n"
+NORMALIZED = "# 週刊 Life is Beautiful\n\n## 今週のざっくばらん\nAIエージェントとソフトウェア開発について考えます。\n"
+
+
+class FakeUploadFile:
+    """Minimal async stand-in for FastAPI's UploadFile."""
+
+    def __init__(self, data: bytes, size=None):
+        self.file = io.BytesIO(data)
+        self.size = size
+
+    async def read(self, size: int = -1) -> bytes:
+        return self.file.read(size)
+
+
+def ingest(data: bytes, max_bytes: int = 1024 * 1024, size=None):
+    return asyncio.run(ingest_upload(FakeUploadFile(data, size), max_bytes))
+
+
+class TestTextNormalizer(unittest.TestCase):
+    def test_crlf_split_across_chunks(self):
+        normalizer = TextNormalizer()
+        for piece in ("一行目\r", "\n二行目\r", "三行目"):
+            normalizer.feed(piece)
+        text, digest = normalizer.finish()
+        self.assertEqual(text, "一行目\n二行目\n三行目")
+        self.assertEqual(digest, content_hash(text))
+
+
+class TestIngestUpload(unittest.TestCase):
+    def test_utf8_is_normalized_and_hashed(self):
+        result = ingest(ISSUE.encode("utf-8"))
+        self.assertEqual(result.text, NORMALIZED)
+        self.assertEqual(result.encoding, "utf-8")
+        self.assertEqual(result.digest, content_hash(NORMALIZED))
+
+    def test_same_issue_in_any_encoding_has_the_same_digest(self):
+        encodings = {
+            "utf-8-sig": codecs.BOM_UTF8 + ISSUE.encode("utf-8"),
+            "utf-16": ISSUE.encode("utf-16"),
+            "cp932": ISSUE.encode("cp932"),
+            "euc_jp": ISSUE.encode("euc_jp"),
+            "iso2022_jp": ISSUE.replace("ｿﾌﾄｳｪｱ", "ソフトウェア").encode("iso2022_jp"),
+        }
+        for encoding, data in encodings.items():
+            with self.subTest(encoding=encoding):
+                result = ingest(data)
+                self.assertEqual(result.encoding, encoding)
+                self.assertEqual(result.text, NORMALIZED)
+                self.assertEqual(result.digest, content_hash(NORMALIZED))
+
+    def test_multibyte_characters_split_across_reads(self):
+        with mock.patch.object(upload, "READ_CHUNK_SIZE", 5):
+            self.assertEqual(ingest(ISSUE.encode("utf-8")).text, NORMALIZED)
+            self.assertEqual(ingest(ISSUE.encode("cp932")).text, NORMALIZED)
+
+    def test_too_large(self):
+        with self.assertRaises(UploadTooLarge):
+            ingest(b"a" * 101, max_bytes=100)
+        # サイズが分かっているときは読む前に断る
+        with self.assertRaises(UploadTooLarge):
+            ingest(b"", max_bytes=100, size=101)
+
+    def test_undecodable(self):
+        with self.assertRaises(UnsupportedEncoding):
+            ingest(b"\x80\xff\xfe\x00\x81")
+        # cp932としてはデコードできるが日本語ではないバイト列
+        with self.assertRaises(UnsupportedEncoding):
+            ingest(b"\x80\xff\xfe")
+
+
+class TestUploadLimitMiddleware(unittest.TestCase):
+    def setUp(self):
+        self.received = []
+        self.semaphore = asyncio.Semaphore(1)
+        app = FastAPI()
+        app.add_middleware(UploadLimitMiddleware, path="/upload", max_bytes=1000, semaphore=self.semaphore)
+
+        @app.post("/upload")
+        async def receive_upload(file: UploadFile):
+            self.received.append(len(await file.read()))
+            return {"ok": True}
+
+        self.client = TestClient(app)
+
+    def multipart(self, size: int):
+        boundary = "limitboundary"
+        body = (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="a.md"\r\n\r\n'.encode()
+            + b"a" * size
+            + f"\r\n--{boundary}--\r\n".encode()
+        )
+        return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+    def test_small_upload_passes_and_releases_the_slot(self):
+        body, headers = self.multipart(1000)
+        response = self.client.post("/upload", content=body, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.received, [1000])
+        self.assertFalse(self.semaphore.locked())
+
+    def test_content_length_over_the_limit_is_refused_before_parsing(self):
+        body, headers = self.multipart(1000 + MULTIPART_OVERHEAD_BYTES)
+        response = self.client.post("/upload", content=body, headers=headers)
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.received, [])
+
+    def test_body_without_content_length_is_cut_off(self):
+        body, headers = self.multipart(1000 + MULTIPART_OVERHEAD_BYTES)
+        # ジェネレータを渡すとContent-Lengthなし（chunked）で送られる
+        pieces = iter([body[i : i + 4096] for i in range(0, len(body), 4096)])
+        response = self.client.post("/upload", content=pieces, headers=headers)
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.received, [])
+        self.assertFalse(self.semaphore.locked())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import io
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import wave
+
+from app.utils.podcast_generator import convert_to_wav
+from app.utils.wav import concatenate_wav_files, read_wav_info
+
+
+class TestWav(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def write_segment(self, name, frames, rate=24000, value=1):
+        path = os.path.join(self.test_dir, name)
+        with open(path, "wb") as f:
+            f.write(convert_to_wav(struct.pack("<h", value) * frames, f"audio/L16;rate={rate}"))
+        return path
+
+    def test_read_wav_info(self):
+        """The format and sample count are read from the header."""
+        path = self.write_segment("a.wav", 2400)
+        with open(path, "rb") as f:
+            info = read_wav_info(f)
+        self.assertEqual((info.channels, info.sample_rate, info.bits_per_sample), (1, 24000, 16))
+        self.assertEqual(info.data_offset, 44)
+        self.assertEqual(info.frames, 2400)
+
+    def test_read_wav_info_rejects_non_wav(self):
+        """Non-WAV data is reported as None."""
+        self.assertIsNone(read_wav_info(io.BytesIO(b"ID3\x03" + b"\x00" * 40)))
+
+    def test_concatenate_computes_chapters(self):
+        """Chapters are placed at the cumulative sample offsets of the inputs."""
+        files = [self.write_segment("a.wav", 2400, value=1), self.write_segment("b.wav", 4800, value=2)]
+        output = os.path.join(self.test_dir, "out.wav")
+        chapters = concatenate_wav_files(
+            files, output, [{"index": "START", "title": "オープニング"}, {"index": "END", "title": "記事"}]
+        )
+
+        self.assertEqual([(c["start_sample"], c["end_sample"]) for c in chapters], [(0, 2400), (2400, 7200)])
+        self.assertEqual([(c["start_ms"], c["end_ms"]) for c in chapters], [(0, 100), (100, 300)])
+        with wave.open(output, "rb") as w:
+            self.assertEqual(w.getnframes(), 7200)
+            data = w.readframes(7200)
+        self.assertEqual(data[:2], struct.pack("<h", 1))
+        self.assertEqual(data[-2:], struct.pack("<h", 2))
+
+    def test_chapters_are_embedded_as_cue_points(self):
+        """The output carries cue points and labels after the sample data."""
+        files = [self.write_segment("a.wav", 10), self.write_segment("b.wav", 10)]
+        output = os.path.join(self.test_dir, "out.wav")
+        concatenate_wav_files(files, output, [{"index": "START", "title": "A"}, {"index": "END", "title": "B"}])
+
+        with open(output, "rb") as f:
+            data = f.read()
+        self.assertEqual(struct.unpack("<I", data[4:8])[0], len(data) - 8)
+        cue = data.index(b"cue ")
+        self.assertEqual(struct.unpack("<I", data[cue + 8 : cue + 12])[0], 2)
+        self.assertIn("END B".encode("utf-8"), data)
+
+    def test_mismatched_formats_are_not_concatenated(self):
+        """Inputs with different sample rates need decoding, signalled by None."""
+        files = [self.write_segment("a.wav", 10, rate=24000), self.write_segment("b.wav", 10, rate=16000)]
+        self.assertIsNone(concatenate_wav_files(files, os.path.join(self.test_dir, "out.wav")))
+
+
+if __name__ == "__main__":
+    unittest.main()